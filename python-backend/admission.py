@@ -0,0 +1,190 @@
+import io
+import threading
+import time
+from contextlib import contextmanager
+from PIL import Image
+
+# Rough working set per decoded pixel across analyze_food: PIL RGB decode (3),
+# mode conversion (3), np.array copy (3), grayscale + Canny edges + edge mask
+# (3) and the model/fallback input copy (3), rounded up
+BYTES_PER_PIXEL = 16
+# PNG decode working set per pixel and band: the raster plus thumbnail()'s
+# premultiplied copy (alpha modes) or reduce() output, rounded up
+PNG_DECODE_BYTES_PER_BAND = 2.25
+# Fixed per-request overhead (request body, base64 text, PIL/numpy objects)
+BASE_REQUEST_BYTES = 4 * 1024 * 1024
+
+class ImageRejected(Exception):
+    """Raised when an upload cannot be admitted"""
+
+    def __init__(self, message, status_code=413, retry_after=None):
+        super().__init__(message)
+        self.status_code = status_code
+        self.retry_after = retry_after
+
+class WeightedSemaphore:
+    """Semaphore whose permits are bytes rather than slots"""
+
+    def __init__(self, capacity):
+        self.capacity = capacity
+        self.available = capacity
+        self.condition = threading.Condition()
+
+    def acquire(self, weight, timeout=None):
+        if weight > self.capacity:
+            return False
+        deadline = None if timeout is None else time.time() + timeout
+        with self.condition:
+            while self.available < weight:
+                remaining = None if deadline is None else deadline - time.time()
+                if remaining is not None and remaining <= 0:
+                    return False
+                self.condition.wait(remaining)
+            self.available -= weight
+            return True
+
+    def release(self, weight):
+        with self.condition:
+            self.available += weight
+            self.condition.notify_all()
+
+class ImageAdmission:
+    """
+    Admits image analyses against a per-process memory budget.
+
+    Dimensions are read from the image header (no pixel decode) to estimate
+    the request's working set. Images above max_pixels are downscaled at
+    decode time; images above hard_max_pixels are rejected outright.
+    """
+
+    def __init__(self, budget_bytes, max_pixels, hard_max_pixels, max_side, timeout=10):
+        self.budget_bytes = budget_bytes
+        self.max_pixels = max_pixels
+        self.hard_max_pixels = hard_max_pixels
+        self.max_side = max_side
+        self.timeout = timeout
+        self.semaphore = WeightedSemaphore(budget_bytes)
+        self.lock = threading.Lock()
+        self.counters = {'admitted': 0, 'downscaled': 0, 'rejected_too_large': 0, 'rejected_busy': 0}
+        self.inflight_bytes = 0
+        self.peak_inflight_bytes = 0
+
+    def plan(self, image_bytes):
+        """Read the header and decide how (and whether) to decode the image"""
+        try:
+            with Image.open(io.BytesIO(image_bytes)) as header:
+                width, height = header.size
+                image_format = header.format
+                pixels = width * height
+                decoded_pixels = pixels
+                decode_bytes = 0
+                if pixels > self.max_pixels and image_format == 'JPEG':
+                    # draft() only rewrites the decoder setup; the size it
+                    # leaves behind is what load_rgb_image will decode
+                    header.draft('RGB', (self.max_side, self.max_side))
+                    decoded_pixels = header.size[0] * header.size[1]
+                elif pixels > self.max_pixels and image_format == 'PNG':
+                    # PNG has no draft(): the full raster (plus thumbnail()'s
+                    # premultiplied copy for alpha modes) only lives while
+                    # decoding, the rest of the pipeline runs on the thumbnail
+                    decode_bytes = int(pixels * len(header.getbands()) * PNG_DECODE_BYTES_PER_BAND)
+                    scale = self.max_side / max(width, height)
+                    decoded_pixels = round(width * scale) * round(height * scale)
+        except Image.DecompressionBombError:
+            self._count('rejected_too_large')
+            raise ImageRejected('Görüntü çok büyük')
+        except Exception as e:
+            raise ImageRejected(f'Geçersiz görüntü: {e}', status_code=400)
+
+        if pixels > self.hard_max_pixels:
+            self._count('rejected_too_large')
+            raise ImageRejected(
+                f'Görüntü çok büyük ({width}x{height}); en fazla {self.hard_max_pixels} piksel'
+            )
+
+        # Other formats (WebP, GIF, TIFF, ...) are decoded at full size
+        # before thumbnail(), so they are charged for every pixel
+        max_side = self.max_side if pixels > self.max_pixels else None
+
+        estimated_bytes = (decode_bytes + decoded_pixels * BYTES_PER_PIXEL
+                           + len(image_bytes) * 2 + BASE_REQUEST_BYTES)
+        if estimated_bytes > self.budget_bytes:
+            self._count('rejected_too_large')
+            if image_format == 'JPEG':
+                raise ImageRejected('Görüntü bellek sınırını aşıyor')
+            raise ImageRejected(
+                f'Görüntü bellek sınırını aşıyor ({width}x{height}); {image_format} dosyaları '
+                f'küçültülmeden önce tam boyutta açılır, daha küçük bir görüntü ya da JPEG gönderin'
+            )
+
+        return {
+            'width': width,
+            'height': height,
+            'format': image_format,
+            'max_side': max_side,
+            'estimated_bytes': estimated_bytes,
+        }
+
+    @contextmanager
+    def admit(self, plan, block=False):
+        """Hold plan['estimated_bytes'] of the budget while the block runs
+
+        Request handlers give up after self.timeout seconds; queue workers
+        pass block=True and wait for memory to free up instead.
+        """
+        with self.admit_all([plan], block):
+            yield
+
+    @contextmanager
+    def admit_all(self, plans, block=False):
+        """Admit several images as one weight (a queue worker's batch)
+
+        Taking the summed estimate in a single acquire means two workers can
+        never each hold part of a batch while waiting for the rest.
+        """
+        weight = sum(plan['estimated_bytes'] for plan in plans)
+        if not self.semaphore.acquire(weight, None if block else self.timeout):
+            self._count('rejected_busy')
+            raise ImageRejected('Sunucu şu anda meşgul, lütfen tekrar deneyin',
+                                status_code=503, retry_after=max(1, int(self.timeout)))
+
+        with self.lock:
+            self.counters['admitted'] += len(plans)
+            self.counters['downscaled'] += sum(1 for plan in plans if plan['max_side'])
+            self.inflight_bytes += weight
+            self.peak_inflight_bytes = max(self.peak_inflight_bytes, self.inflight_bytes)
+        try:
+            yield
+        finally:
+            with self.lock:
+                self.inflight_bytes -= weight
+            self.semaphore.release(weight)
+
+    def batches(self, plans):
+        """Split plans, in order, into index groups that each fit the budget"""
+        groups, group, group_bytes = [], [], 0
+        for index, plan in enumerate(plans):
+            if group and group_bytes + plan['estimated_bytes'] > self.budget_bytes:
+                groups.append(group)
+                group, group_bytes = [], 0
+            group.append(index)
+            group_bytes += plan['estimated_bytes']
+        if group:
+            groups.append(group)
+        return groups
+
+    def _count(self, key):
+        with self.lock:
+            self.counters[key] += 1
+
+    def stats(self):
+        with self.lock:
+            return {
+                'budget_bytes': self.budget_bytes,
+                'inflight_bytes': self.inflight_bytes,
+                'peak_inflight_bytes': self.peak_inflight_bytes,
+                'max_pixels': self.max_pixels,
+                'hard_max_pixels': self.hard_max_pixels,
+                'max_side': self.max_side,
+                **self.counters,
+            }
@@ -1,16 +1,34 @@
 # -*- coding: utf-8 -*-
-from flask import Flask, request, jsonify
+import thread_planner
+if __name__ == '__main__':
+    # gunicorn.conf.py does this for served workers; BLAS/OMP pools read
+    # their size once, when numpy/torch/cv2 are first imported below
+    thread_planner.apply_env(thread_planner.get_current_plan())
+from flask import Flask, Response, request, jsonify, send_file, g, has_request_context
 from flask_cors import CORS
 import os
 import base64
-import io
-from PIL import Image
 import numpy as np
-import cv2
 from dotenv import load_dotenv
 import json
+import math
 import random
+import time
+from contextlib import contextmanager
 from food_model import get_food_model
+from image_analysis import detect_image_content, edge_map, load_rgb_image
+from plate_analysis import propose_regions, crop_regions
+from embedding_store import EmbeddingStore
+from rate_limit import RateLimiter, MemoryBucketBackend, SQLiteBucketBackend
+from fair_scheduler import FairScheduler, SchedulerTimeout
+from job_queue import JobQueue, JobWorkerPool
+from latency_router import LatencyRouter, TIER_ANALYSIS_METHODS
+from admission import ImageAdmission, ImageRejected
+from thread_planner import get_current_plan, apply_runtime
+from rewards_catalog import RewardsCatalog, SUPPORTED_LANGUAGES
+from nutrition_goals import calculate_profile_goals
+from user_export import export_user_data, decode_cursor
+from request_profiler import ProfileSession, ProfileStore, PROFILE_MODES, profile_stage, model_profiling
 # import torch
 try:
     from transformers import AutoModelForCausalLM, AutoTokenizer
@@ -43,6 +61,71 @@ def log_response(response):
     print(f"📤 {request.method} {request.path} - Status: {response.status_code}")
     return response
 
+# Endpoints that run the food model or call the LLM share the inference budget
+INFERENCE_ENDPOINTS = {'analyze_food', 'chat_with_nutritionist'}
+RATE_LIMIT_EXEMPT_ENDPOINTS = {'health_check', 'static'}
+
+rate_limiter = None
+
+def get_rate_limiter():
+    """Get or create the rate limiter on the configured backend"""
+    global rate_limiter
+    if rate_limiter is None:
+        if app.config['RATE_LIMIT_BACKEND'] == 'sqlite':
+            backend = SQLiteBucketBackend(app.config['RATE_LIMIT_DB'])
+        else:
+            backend = MemoryBucketBackend()
+        rate_limiter = RateLimiter(backend, {
+            'inference': (app.config['RATE_LIMIT_INFERENCE_BURST'], app.config['RATE_LIMIT_INFERENCE_PER_MINUTE']),
+            'default': (app.config['RATE_LIMIT_DEFAULT_BURST'], app.config['RATE_LIMIT_DEFAULT_PER_MINUTE']),
+        })
+    return rate_limiter
+
+@app.before_request
+def enforce_rate_limit():
+    if (not app.config['RATE_LIMIT_ENABLED'] or request.method == 'OPTIONS'
+            or request.endpoint is None or request.endpoint in RATE_LIMIT_EXEMPT_ENDPOINTS):
+        return None
+    
+    policy = 'inference' if request.endpoint in INFERENCE_ENDPOINTS else 'default'
+    limiter = get_rate_limiter()
+    allowed, remaining, retry_after = limiter.check(policy, fair_identity(get_current_user_id()))
+    g.rate_limit = (limiter.limit(policy), remaining)
+    if allowed:
+        return None
+    
+    retry_after = max(1, math.ceil(retry_after))
+    response = jsonify({
+        'error': 'Too many requests',
+        'message': 'Çok fazla istek gönderdiniz, lütfen biraz bekleyip tekrar deneyin.',
+        'retry_after': retry_after
+    })
+    response.status_code = 429
+    response.headers['Retry-After'] = str(retry_after)
+    return response
+
+@app.after_request
+def add_rate_limit_headers(response):
+    limit, remaining = g.get('rate_limit', (None, None))
+    if limit is not None and remaining is not None:
+        response.headers['X-RateLimit-Limit'] = str(limit)
+        response.headers['X-RateLimit-Remaining'] = str(int(remaining))
+    return response
+
+# Per-identity rate limits (user id from the JWT, else client IP): a tight
+# budget for model/LLM endpoints and a looser one for everything else. Off by
+# default: behind a proxy every anonymous caller shares the proxy's IP unless
+# RATE_LIMIT_TRUST_PROXY is set
+app.config['RATE_LIMIT_ENABLED'] = os.getenv('RATE_LIMIT_ENABLED', 'False').lower() == 'true'
+app.config['RATE_LIMIT_BACKEND'] = os.getenv('RATE_LIMIT_BACKEND', 'memory')
+app.config['RATE_LIMIT_DB'] = os.getenv('RATE_LIMIT_DB', os.path.join(os.path.dirname(os.path.abspath(__file__)), 'data', 'rate_limits.db'))
+app.config['RATE_LIMIT_INFERENCE_BURST'] = int(os.getenv('RATE_LIMIT_INFERENCE_BURST', 10))
+app.config['RATE_LIMIT_INFERENCE_PER_MINUTE'] = float(os.getenv('RATE_LIMIT_INFERENCE_PER_MINUTE', 30))
+app.config['RATE_LIMIT_DEFAULT_BURST'] = int(os.getenv('RATE_LIMIT_DEFAULT_BURST', 120))
+app.config['RATE_LIMIT_DEFAULT_PER_MINUTE'] = float(os.getenv('RATE_LIMIT_DEFAULT_PER_MINUTE', 600))
+# Only trust X-Forwarded-For behind a proxy that sets it
+app.config['RATE_LIMIT_TRUST_PROXY'] = os.getenv('RATE_LIMIT_TRUST_PROXY', 'False').lower() == 'true'
+
 # Database configuration
 app.config['MYSQL_HOST'] = os.getenv('DB_HOST', 'localhost')
 app.config['MYSQL_USER'] = os.getenv('DB_USER', 'root')
@@ -50,6 +133,52 @@ app.config['MYSQL_PASSWORD'] = os.getenv('DB_PASSWORD', 'root')
 app.config['MYSQL_DB'] = os.getenv('DB_NAME', 'caloria_db')
 app.config['SECRET_KEY'] = os.getenv('SECRET_KEY', 'caloria_super_secret_jwt_key_2024_change_in_production')
 
+# Async analysis queue configuration
+app.config['ANALYZE_QUEUE_DB'] = os.getenv('ANALYZE_QUEUE_DB', os.path.join(os.path.dirname(os.path.abspath(__file__)), 'data', 'analysis_jobs.db'))
+app.config['ANALYZE_QUEUE_DIR'] = os.getenv('ANALYZE_QUEUE_DIR', os.path.join(os.path.dirname(os.path.abspath(__file__)), 'data', 'analysis_jobs'))
+app.config['ANALYZE_WORKERS'] = int(os.getenv('ANALYZE_WORKERS', 2))
+app.config['ANALYZE_BATCH_SIZE'] = int(os.getenv('ANALYZE_BATCH_SIZE', 8))
+app.config['ANALYZE_MAX_WAIT'] = float(os.getenv('ANALYZE_MAX_WAIT', 30))
+# Claims after which a job stuck in processing is failed instead of requeued
+app.config['ANALYZE_MAX_ATTEMPTS'] = int(os.getenv('ANALYZE_MAX_ATTEMPTS', 3))
+# Seconds finished jobs (and their results) are kept before being purged
+app.config['ANALYZE_JOB_RETENTION'] = float(os.getenv('ANALYZE_JOB_RETENTION', 7 * 24 * 3600))
+
+# Latency budget for /api/analyze-food (0 = unbounded); clients may override
+# per request with the X-Latency-Budget-Ms header
+app.config['ANALYZE_LATENCY_BUDGET_MS'] = float(os.getenv('ANALYZE_LATENCY_BUDGET_MS', 0))
+app.config['MODEL_CONCURRENCY'] = int(os.getenv('MODEL_CONCURRENCY', 1))
+# Longest wait for a fair-share model slot before degrading to a fallback tier
+app.config['MODEL_QUEUE_TIMEOUT'] = float(os.getenv('MODEL_QUEUE_TIMEOUT', 30))
+
+# Plate mode: at most this many food regions are classified per photo
+app.config['PLATE_MAX_REGIONS'] = int(os.getenv('PLATE_MAX_REGIONS', 6))
+
+# Memory admission for image decoding: per-process budget, downscale above
+# ANALYZE_MAX_PIXELS, reject above ANALYZE_HARD_MAX_PIXELS
+app.config['ANALYZE_MEMORY_BUDGET_MB'] = int(os.getenv('ANALYZE_MEMORY_BUDGET_MB', 512))
+app.config['ANALYZE_MAX_PIXELS'] = int(os.getenv('ANALYZE_MAX_PIXELS', 12_000_000))
+app.config['ANALYZE_HARD_MAX_PIXELS'] = int(os.getenv('ANALYZE_HARD_MAX_PIXELS', 50_000_000))
+app.config['ANALYZE_MAX_SIDE'] = int(os.getenv('ANALYZE_MAX_SIDE', 2048))
+app.config['ANALYZE_ADMISSION_TIMEOUT'] = float(os.getenv('ANALYZE_ADMISSION_TIMEOUT', 10))
+
+# Embedding store for "similar past meal" lookups and label corrections
+app.config['EMBEDDING_DIR'] = os.getenv('EMBEDDING_DIR', os.path.join(os.path.dirname(os.path.abspath(__file__)), 'data', 'embeddings'))
+app.config['EMBEDDING_DTYPE'] = os.getenv('EMBEDDING_DTYPE', 'int8')
+app.config['EMBEDDING_SEGMENT_ROWS'] = int(os.getenv('EMBEDDING_SEGMENT_ROWS', 65536))
+app.config['EMBEDDING_MAX_SEGMENTS'] = int(os.getenv('EMBEDDING_MAX_SEGMENTS', 8))
+# Seconds before a worker's new rows are sealed and visible to other workers
+app.config['EMBEDDING_SEAL_INTERVAL'] = float(os.getenv('EMBEDDING_SEAL_INTERVAL', 2))
+app.config['SIMILAR_MEAL_MIN_SIMILARITY'] = float(os.getenv('SIMILAR_MEAL_MIN_SIMILARITY', 0.85))
+app.config['CORRECTION_MIN_SIMILARITY'] = float(os.getenv('CORRECTION_MIN_SIMILARITY', 0.95))
+
+# Request profiling: admins opt in with the X-Profile header, and a random
+# PROFILE_SAMPLE_RATE fraction of analyses is sampled in the background
+app.config['PROFILE_DIR'] = os.getenv('PROFILE_DIR', os.path.join(os.path.dirname(os.path.abspath(__file__)), 'data', 'profiles'))
+app.config['PROFILE_SAMPLE_RATE'] = float(os.getenv('PROFILE_SAMPLE_RATE', 0))
+app.config['PROFILE_INTERVAL_MS'] = float(os.getenv('PROFILE_INTERVAL_MS', 2))
+app.config['PROFILE_KEEP'] = int(os.getenv('PROFILE_KEEP', 50))
+
 # JWT Secret - Node.js backend ile aynı secret key kullanılıyor
 JWT_SECRET = app.config['SECRET_KEY']
 
@@ -78,146 +207,551 @@ except Exception as e:
     model = None
     tokenizer = None
 
-def detect_image_content(image_array):
+def get_funny_non_food_message(category):
     """
-    Advanced image analysis using OpenCV and basic computer vision
+    Return funny messages for non-food detections
     """
-    # Convert to grayscale for analysis
-    gray = cv2.cvtColor(image_array, cv2.COLOR_RGB2GRAY)
-    
-    # Calculate basic image statistics
-    brightness = np.mean(gray)
-    contrast = np.std(gray)
+    messages = {
+        'waterfall': 'Bu çok güzel bir şelale ama maalesef kalori yok! 💧 Yemek fotoğrafı çekmeyi dene.',
+        'landscape': 'Harika bir manzara! Ama manzara yemiyoruz 😄 Tabağındaki yemeği çek.',
+        'sky': 'Gökyüzü muhteşem ama tok tutmaz! ☁️ Yemek fotoğrafı çekmeyi dene.',
+        'ocean': 'Deniz çok güzel ama yenmez! 🌊 Yemeğinin fotoğrafını çek.',
+        'dark_scene': 'Fotoğraf çok karanlık! 🌙 Daha aydınlık bir yerde yemek fotoğrafı çek.',
+        'selfie': 'Çok güzel görünüyorsun! Ama sen yemek değilsin 😊 Tabağını göster.',
+        'person': 'İnsan eti menüde yok! 😅 Yemek fotoğrafı çekmeyi dene.',
+        'animal': 'Çok tatlı ama yemek değil! 🐱 Tabağındaki yemeği göster.',
+    }
     
-    # Edge detection to find object boundaries
-    edges = cv2.Canny(gray, 50, 150)
-    edge_density = np.sum(edges > 0) / edges.size
+    return messages.get(category, 'Bu yemek gibi görünmüyor. Lütfen yemeğinin fotoğrafını çek! 📸')
+
+@app.route('/health', methods=['GET'])
+@app.route('/api/health', methods=['GET'])
+def health_check():
+    return jsonify({
+        'status': 'healthy',
+        'message': 'Caloria AI Food Recognition Backend',
+        'version': '2.0.0',
+        'model': 'Hugging Face Transformers + OpenCV'
+    })
+
+def decode_image_payload(image_data):
+    """Strip an optional data URL prefix and decode the base64 image bytes"""
+    if image_data.startswith('data:image'):
+        image_data = image_data.split(',')[1]
+    return base64.b64decode(image_data)
+
+image_admission = ImageAdmission(
+    budget_bytes=app.config['ANALYZE_MEMORY_BUDGET_MB'] * 1024 * 1024,
+    max_pixels=app.config['ANALYZE_MAX_PIXELS'],
+    hard_max_pixels=app.config['ANALYZE_HARD_MAX_PIXELS'],
+    max_side=app.config['ANALYZE_MAX_SIDE'],
+    timeout=app.config['ANALYZE_ADMISSION_TIMEOUT']
+)
+
+def image_rejected_response(e):
+    response = jsonify({'error': 'Image rejected', 'message': str(e)})
+    response.status_code = e.status_code
+    if e.retry_after:
+        response.headers['Retry-After'] = str(e.retry_after)
+    return response
+
+latency_router = LatencyRouter(
+    default_budget_ms=app.config['ANALYZE_LATENCY_BUDGET_MS'],
+    model_concurrency=app.config['MODEL_CONCURRENCY']
+)
+
+# Model slots are handed out round-robin across users, not FIFO
+model_scheduler = FairScheduler(app.config['MODEL_CONCURRENCY'])
+
+def client_ip():
+    if app.config['RATE_LIMIT_TRUST_PROXY']:
+        forwarded = request.headers.get('X-Forwarded-For', '')
+        if forwarded:
+            return forwarded.split(',')[0].strip()
+    return request.remote_addr
+
+def fair_identity(user_id=None):
+    """Who a unit of work belongs to: the user, else the client IP"""
+    if user_id:
+        return f"user:{user_id}"
+    if has_request_context():
+        return f"ip:{client_ip()}"
+    return 'anonymous'
+
+@contextmanager
+def model_slot(tier, reason, user_id, deadline, images=1):
+    """
+    Hold a fair-share model slot around a prediction; yields (tier, reason) to run
+
+    Only 'ai' calls queue for a slot, and count as in flight for the router
+    while they wait. The wait ends early enough for smart_fallback to still
+    fit the deadline (or after MODEL_QUEUE_TIMEOUT); the call then degrades
+    to smart_fallback and the router's decision is moved there.
+    """
+    if tier != 'ai':
+        yield tier, reason
+        return
+    timeout = app.config['MODEL_QUEUE_TIMEOUT']
+    if deadline is not None:
+        fallback_s = latency_router.estimate_ms('smart_fallback', images) / 1000
+        timeout = max(0.0, min(timeout, deadline - time.time() - fallback_s))
+    try:
+        with latency_router.track('ai'):
+            model_scheduler.acquire(fair_identity(user_id), timeout)
+    except SchedulerTimeout:
+        yield latency_router.reroute(tier, reason, 'smart_fallback', 'queue_timeout')
+        return
+    try:
+        yield tier, reason
+    finally:
+        model_scheduler.release()
+
+def get_request_budget_ms():
+    """Latency budget from the X-Latency-Budget-Ms header, if any"""
+    header = request.headers.get('X-Latency-Budget-Ms')
+    if header is None:
+        return None
+    try:
+        return float(header)
+    except ValueError:
+        return None
+
+def recognised_description(tier, confidence, corrected=False):
+    """Say how the answer was produced; only the transformer tier is "AI" """
+    if corrected:
+        return f"Daha önce düzelttiğiniz bir öğüne {confidence:.0%} benzerlikle eşleşti"
+    if tier == 'ai':
+        return f"AI tarafından {confidence:.0%} güvenle tanındı"
+    return f"Renk analizine göre {confidence:.0%} olasılıkla tahmin edildi"
+
+def unrecognised_fields(tier, plate=False):
+    """name / description for an answer without a food, by serving tier"""
+    if tier == 'simple_fallback':
+        # No model or heuristic ran: say so instead of guessing
+        return 'Analiz Edilemedi', 'Görüntü zamanında analiz edilemedi. Lütfen tekrar deneyin! ⏱️'
+    if plate:
+        return 'Bilinmeyen Nesne', 'AI modeli tabakta yemek tanıyamadı. Lütfen daha net bir yemek fotoğrafı çekin! 🤖'
+    return 'Bilinmeyen Nesne', 'AI modeli bu görüntüyü yemek olarak tanıyamadı. Lütfen daha net bir yemek fotoğrafı çekin! 🤖'
+
+def non_food_response(cv_classification):
+    return {
+        'name': cv_classification['category'].title(),
+        'calories': 0,
+        'protein': 0,
+        'carbs': 0,
+        'fat': 0,
+        'confidence': cv_classification['confidence'],
+        'portions': 'N/A',
+        'description': get_funny_non_food_message(cv_classification['category']),
+        'isFood': False,
+        'category': 'Non-Food',
+        'analysis_method': 'OpenCV Computer Vision',
+        'debug_info': cv_classification['reason']
+    }
+
+def run_food_model(image_arrays, deadline=None, user_id=None):
+    """
+    Route and run the food model over one or more RGB arrays
+
+    The latency router is asked about, and fed, the cost of all the images;
+    the 'ai' tier runs them in one batched forward pass. Returns
+    (predictions, served_tier, routing_reason, inference_ms).
+    """
+    food_model = get_food_model()
+    images = len(image_arrays)
+    tier, routing_reason = latency_router.choose_tier(deadline, food_model.is_model_loaded(), images=images)
+    with model_slot(tier, routing_reason, user_id, deadline, images) as (tier, routing_reason), \
+            latency_router.track(tier), profile_stage(f"model_{tier}"), model_profiling():
+        predict_started = time.time()
+        if tier == 'ai':
+            predictions = food_model.predict_food_batch(image_arrays)
+        else:
+            predictions = [food_model.predict_food(image, tier=tier) for image in image_arrays]
+        inference_ms = (time.time() - predict_started) * 1000
+    served_tier = predictions[0].get('tier', tier)
+    latency_router.observe(served_tier, inference_ms, images=images)
+    return predictions, served_tier, routing_reason, inference_ms
+
+def analyze_image(image, deadline=None, user_id=None):
+    """
+    Run the OpenCV + AI pipeline on an RGB image and return the response payload
+
+    deadline is an absolute time.time() by which the answer is due; when the
+    model would miss it the request is served by a cheaper fallback tier.
+    With a user_id, the image embedding is matched against that user's past
+    meals (their label corrections win for near-identical photos) and stored.
+    """
+    # Convert to numpy array for OpenCV analysis
+    image_array = np.array(image)
     
-    # Color analysis
-    dominant_colors = analyze_dominant_colors(image_array)
+    # First, use OpenCV to detect non-food content
+    with profile_stage('opencv_screen'):
+        cv_classification = detect_image_content(image_array)
     
-    # Heuristic-based classification
-    classification = classify_image_content(brightness, contrast, edge_density, dominant_colors)
+    # If OpenCV says it's not food, trust it
+    if not cv_classification['is_food']:
+        return non_food_response(cv_classification)
     
-    return classification
+    # If OpenCV thinks it's food, use AI model for food classification
+    predictions, served_tier, routing_reason, _ = run_food_model([image_array], deadline, user_id)
+    return food_response(predictions[0], served_tier, routing_reason, user_id)
 
-def analyze_dominant_colors(image_array):
+def analyze_images(images, user_ids, deadline=None):
     """
-    Analyze dominant colors in the image
+    Batch form of analyze_image for queue workers; returns payloads in order
+
+    Every image is screened by OpenCV, then the ones that look like food go
+    through the model together in one run_food_model call.
     """
-    # Reshape image to be a list of pixels
-    pixels = image_array.reshape(-1, 3)
+    results = [None] * len(images)
+    food = []
+    for index, image in enumerate(images):
+        image_array = np.array(image)
+        with profile_stage('opencv_screen'):
+            cv_classification = detect_image_content(image_array)
+        if cv_classification['is_food']:
+            food.append((index, image_array))
+        else:
+            results[index] = non_food_response(cv_classification)
+    
+    if food:
+        predictions, served_tier, routing_reason, _ = run_food_model(
+            [image_array for _, image_array in food], deadline)
+        for (index, _), prediction in zip(food, predictions):
+            results[index] = food_response(prediction, served_tier, routing_reason, user_ids[index])
+    return results
+
+def food_response(ai_prediction, served_tier, routing_reason, user_id=None):
+    """Turn one model prediction into the response payload (corrections, nutrition, memory)"""
+    food_model = get_food_model()
+    analysis_method = TIER_ANALYSIS_METHODS[served_tier]
     
-    # Calculate color statistics
-    color_stats = {
-        'avg_red': np.mean(pixels[:, 0]),
-        'avg_green': np.mean(pixels[:, 1]),
-        'avg_blue': np.mean(pixels[:, 2]),
-        'brightness': np.mean(pixels)
+    embedding = ai_prediction.get('embedding')
+    # What the model itself said; a correction below only changes the answer
+    model_label = ai_prediction['food_name']
+    with profile_stage('past_meals'):
+        past_meals = find_past_meals(embedding, user_id)
+    corrected = next((meal for meal in past_meals if meal['corrected']
+                      and meal['similarity'] >= app.config['CORRECTION_MIN_SIMILARITY']), None)
+    if corrected:
+        # The user already told us what this (near-identical) meal is
+        ai_prediction = dict(ai_prediction, food_name=corrected['label'], is_food=True,
+                             confidence=max(ai_prediction['confidence'], corrected['similarity']))
+        analysis_method = f"{analysis_method} + User Correction"
+    
+    # If AI model has low confidence, it might not be food
+    if not ai_prediction['is_food'] or ai_prediction['confidence'] < 0.4:
+        name, description = unrecognised_fields(served_tier)
+        return {
+            'name': name,
+            'calories': 0,
+            'protein': 0,
+            'carbs': 0,
+            'fat': 0,
+            'confidence': ai_prediction['confidence'],
+            'portions': 'N/A',
+            'description': description,
+            'isFood': False,
+            'category': 'Non-Food',
+            'analysis_method': analysis_method,
+            'debug_info': f"AI confidence too low: {ai_prediction['confidence']} (tier: {served_tier}, {routing_reason})"
+        }
+    
+    # Get nutrition information
+    nutrition_info = food_model.get_nutrition_info(
+        ai_prediction['food_name'], 
+        ai_prediction['confidence']
+    )
+    
+    result = {
+        'name': nutrition_info['name'],
+        'calories': nutrition_info['calories'],
+        'protein': nutrition_info['protein'],
+        'carbs': nutrition_info['carbs'],
+        'fat': nutrition_info['fat'],
+        'confidence': nutrition_info['confidence'],
+        'portions': '1 porsiyon',
+        'description': recognised_description(served_tier, nutrition_info['confidence'], corrected is not None),
+        'isFood': True,
+        'category': 'Food',
+        'analysis_method': analysis_method,
+        'debug_info': f"Detected as: {ai_prediction['food_name']} (tier: {served_tier}, {routing_reason})"
     }
     
-    return color_stats
-
-def classify_image_content(brightness, contrast, edge_density, colors):
+    embedding_id = remember_meal(embedding, user_id, model_label)
+    if embedding_id:
+        result['embedding_id'] = embedding_id
+    similar = past_meals[0] if past_meals else None
+    if similar and similar['similarity'] >= app.config['SIMILAR_MEAL_MIN_SIMILARITY']:
+        result['similar_meal'] = past_meal_view(similar)
+    return result
+
+def analyze_plate(image, deadline=None, user_id=None):
     """
-    Classify image content based on visual features - IMPROVED for waterfall detection
+    Plate mode: split the photo into food regions and return each item plus totals
+
+    Regions come from the Canny edges of the OpenCV screening step and a
+    saturation mask; all crops go through the model in one batched forward
+    pass (benchmarks/plate_benchmark.py measures it against N single calls).
     """
-    # Enhanced waterfall/nature detection
-    blue_dominance = colors['avg_blue'] - max(colors['avg_red'], colors['avg_green'])
-    green_dominance = colors['avg_green'] - max(colors['avg_red'], colors['avg_blue'])
+    image_array = np.array(image)
     
-    # Waterfall detection (high blue, high brightness, high edge density)
-    if (blue_dominance > 20 and 
-        brightness > 100 and 
-        edge_density > 0.08 and
-        contrast > 40):
-        return {
-            'is_food': False,
-            'category': 'waterfall',
-            'confidence': 0.95,
-            'reason': 'Strong waterfall indicators: blue dominance + high contrast + edges'
-        }
+    with profile_stage('opencv_screen'):
+        features = edge_map(image_array)
+        cv_classification = detect_image_content(image_array, features)
     
-    # Nature scene detection (high green, outdoor lighting)
-    if (green_dominance > 15 and 
-        brightness > 120 and 
-        contrast < 60):
-        return {
-            'is_food': False,
-            'category': 'landscape',
-            'confidence': 0.90,
-            'reason': 'Detected natural landscape with green dominance'
-        }
+    if not cv_classification['is_food']:
+        return dict(non_food_response(cv_classification), mode='plate', items=[])
     
-    # Sky detection (very high blue, very high brightness)
-    if (blue_dominance > 30 and 
-        brightness > 140):
-        return {
-            'is_food': False,
-            'category': 'sky',
-            'confidence': 0.88,
-            'reason': 'Detected sky scene with high blue and brightness'
-        }
+    with profile_stage('plate_regions'):
+        regions = propose_regions(image_array, features[1], max_regions=app.config['PLATE_MAX_REGIONS'])
+        crops = crop_regions(image_array, regions)
     
-    # Ocean/water detection (blue dominant, medium brightness)
-    if (blue_dominance > 25 and 
-        brightness > 80 and brightness < 140 and
-        edge_density < 0.05):
-        return {
-            'is_food': False,
-            'category': 'ocean',
-            'confidence': 0.85,
-            'reason': 'Detected water/ocean scene'
-        }
+    predictions, served_tier, routing_reason, inference_ms = run_food_model(crops, deadline, user_id)
+    food_model = get_food_model()
+    
+    image_area = float(image_array.shape[0] * image_array.shape[1])
+    items = []
+    for (x, y, w, h), prediction in zip(regions, predictions):
+        if not prediction['is_food'] or prediction['confidence'] < 0.4:
+            continue
+        nutrition_info = food_model.get_nutrition_info(prediction['food_name'], prediction['confidence'])
+        items.append({
+            'name': nutrition_info['name'],
+            'calories': nutrition_info['calories'],
+            'protein': nutrition_info['protein'],
+            'carbs': nutrition_info['carbs'],
+            'fat': nutrition_info['fat'],
+            'confidence': nutrition_info['confidence'],
+            'box': {'x': x, 'y': y, 'width': w, 'height': h},
+            'area_fraction': round(w * h / image_area, 3),
+        })
     
-    # Dark scenes (low brightness)
-    if brightness < 50:
+    debug_info = (f"{len(items)}/{len(regions)} regions recognised in {inference_ms:.0f}ms "
+                  f"(tier: {served_tier}, {routing_reason})")
+    if not items:
+        name, description = unrecognised_fields(served_tier, plate=True)
         return {
-            'is_food': False,
-            'category': 'dark_scene',
-            'confidence': 0.80,
-            'reason': 'Image too dark to identify food'
+            'name': name,
+            'calories': 0,
+            'protein': 0,
+            'carbs': 0,
+            'fat': 0,
+            'confidence': max(p['confidence'] for p in predictions),
+            'portions': 'N/A',
+            'description': description,
+            'isFood': False,
+            'category': 'Non-Food',
+            'analysis_method': TIER_ANALYSIS_METHODS[served_tier],
+            'mode': 'plate',
+            'items': [],
+            'debug_info': debug_info
         }
     
-    # If it passes all non-food tests, it's likely food
     return {
-        'is_food': True,
-        'category': 'food',
-        'confidence': 0.70,
-        'reason': 'Passed non-food filters, likely contains food'
+        'name': ', '.join(item['name'] for item in items),
+        'calories': sum(item['calories'] for item in items),
+        'protein': round(sum(item['protein'] for item in items), 1),
+        'carbs': round(sum(item['carbs'] for item in items), 1),
+        'fat': round(sum(item['fat'] for item in items), 1),
+        'confidence': round(sum(item['confidence'] for item in items) / len(items), 4),
+        'portions': f"{len(items)} porsiyon",
+        'description': f"Tabakta {len(items)} yemek tanındı" + ('' if served_tier == 'ai' else ' (renk analizi ile tahmin)'),
+        'isFood': True,
+        'category': 'Food',
+        'analysis_method': TIER_ANALYSIS_METHODS[served_tier],
+        'mode': 'plate',
+        'items': items,
+        'debug_info': debug_info
     }
 
-def get_funny_non_food_message(category):
+# Embedding store - created lazily, one per process, shared directory
+embedding_store = None
+
+def get_embedding_store():
+    """Get or open the on-disk embedding store"""
+    global embedding_store
+    if embedding_store is None:
+        embedding_store = EmbeddingStore(
+            app.config['EMBEDDING_DIR'],
+            dtype=app.config['EMBEDDING_DTYPE'],
+            segment_rows=app.config['EMBEDDING_SEGMENT_ROWS'],
+            max_segments=app.config['EMBEDDING_MAX_SEGMENTS'],
+            seal_interval=app.config['EMBEDDING_SEAL_INTERVAL']
+        )
+    return embedding_store
+
+def find_past_meals(embedding, user_id, k=5):
+    """The user's most similar stored meals; empty when unavailable"""
+    if embedding is None or not user_id:
+        return []
+    try:
+        return get_embedding_store().search(embedding, k=k, user_id=user_id)
+    except Exception as e:
+        print(f"❌ Past meal search failed: {e}")
+        return []
+
+def remember_meal(embedding, user_id, label):
+    if embedding is None or not user_id:
+        return None
+    try:
+        return get_embedding_store().add(embedding, user_id=user_id, label=label)
+    except Exception as e:
+        print(f"❌ Storing meal embedding failed: {e}")
+        return None
+
+def past_meal_view(meal):
+    return {
+        'embedding_id': meal['embedding_id'],
+        'name': meal['label'].replace('_', ' ').title() if meal['label'] else None,
+        'label': meal['label'],
+        'similarity': meal['similarity'],
+        'corrected': meal['corrected'],
+        'analyzed_at': datetime.utcfromtimestamp(meal['created_at']).isoformat() + 'Z',
+    }
+
+# Asynchronous analysis queue - created lazily so importing app.py stays cheap
+job_queue = None
+job_workers = None
+
+def get_job_queue():
+    """Get or create the durable analysis job queue"""
+    global job_queue
+    if job_queue is None:
+        job_queue = JobQueue(app.config['ANALYZE_QUEUE_DB'], app.config['ANALYZE_QUEUE_DIR'])
+    return job_queue
+
+def get_job_workers():
+    """Get or start the in-process analysis worker pool"""
+    global job_workers
+    if job_workers is None:
+        job_workers = JobWorkerPool(
+            get_job_queue(),
+            process_analysis_jobs,
+            workers=app.config['ANALYZE_WORKERS'],
+            batch_size=app.config['ANALYZE_BATCH_SIZE'],
+            max_attempts=app.config['ANALYZE_MAX_ATTEMPTS'],
+            retention=app.config['ANALYZE_JOB_RETENTION']
+        )
+        if app.config['ANALYZE_WORKERS'] > 0:
+            job_workers.start()
+    return job_workers
+
+def process_analysis_jobs(jobs):
     """
-    Return funny messages for non-food detections
+    Worker handler: analyze a claimed batch of queued images
+
+    The batch is planned up front, admitted against the memory budget in as
+    few groups as fit, and each group goes through the model in one batched
+    call. The earliest deadline in a group decides its tier.
     """
-    messages = {
-        'waterfall': 'Bu çok güzel bir şelale ama maalesef kalori yok! 💧 Yemek fotoğrafı çekmeyi dene.',
-        'landscape': 'Harika bir manzara! Ama manzara yemiyoruz 😄 Tabağındaki yemeği çek.',
-        'sky': 'Gökyüzü muhteşem ama tok tutmaz! ☁️ Yemek fotoğrafı çekmeyi dene.',
-        'ocean': 'Deniz çok güzel ama yenmez! 🌊 Yemeğinin fotoğrafını çek.',
-        'dark_scene': 'Fotoğraf çok karanlık! 🌙 Daha aydınlık bir yerde yemek fotoğrafı çek.',
-        'selfie': 'Çok güzel görünüyorsun! Ama sen yemek değilsin 😊 Tabağını göster.',
-        'person': 'İnsan eti menüde yok! 😅 Yemek fotoğrafı çekmeyi dene.',
-        'animal': 'Çok tatlı ama yemek değil! 🐱 Tabağındaki yemeği göster.',
-    }
+    queue = get_job_queue()
+    planned = []
+    for job in jobs:
+        try:
+            started_at = queue.mark_started(job['id'])
+            with open(job['image_path'], 'rb') as f:
+                image_bytes = f.read()
+            planned.append((job, latency_router.deadline_for(job.get('budget_ms'), started_at),
+                            image_bytes, image_admission.plan(image_bytes)))
+        except ImageRejected as e:
+            queue.complete(job['id'], {'error': 'Image rejected', 'message': str(e)}, e.status_code)
+        except Exception as e:
+            print(f"❌ Analysis job {job['id']} failed: {e}")
+            queue.fail(job['id'], e)
     
-    return messages.get(category, 'Bu yemek gibi görünmüyor. Lütfen yemeğinin fotoğrafını çek! 📸')
-
-@app.route('/health', methods=['GET'])
-@app.route('/api/health', methods=['GET'])
-def health_check():
-    return jsonify({
-        'status': 'healthy',
-        'message': 'Caloria AI Food Recognition Backend',
-        'version': '2.0.0',
-        'model': 'Hugging Face Transformers + OpenCV'
-    })
+    for group in image_admission.batches([plan for *_, plan in planned]):
+        group = [planned[index] for index in group]
+        with image_admission.admit_all([plan for *_, plan in group], block=True):
+            decoded = []
+            for job, deadline, image_bytes, plan in group:
+                try:
+                    decoded.append((job, deadline, load_rgb_image(image_bytes, max_side=plan['max_side'])))
+                except Exception as e:
+                    print(f"❌ Analysis job {job['id']} failed: {e}")
+                    queue.fail(job['id'], e)
+            if not decoded:
+                continue
+            
+            deadlines = [deadline for _, deadline, _ in decoded if deadline is not None]
+            try:
+                results = analyze_images([image for *_, image in decoded],
+                                         [job.get('user_id') for job, *_ in decoded],
+                                         deadline=min(deadlines) if deadlines else None)
+            except Exception as e:
+                print(f"❌ Analysis batch failed: {e}")
+                for job, *_ in decoded:
+                    queue.fail(job['id'], e)
+                continue
+            for (job, *_), result in zip(decoded, results):
+                queue.complete(job['id'], result)
+
+def is_async_request(data):
+    flag = request.args.get('async', data.get('async', False))
+    return str(flag).lower() in ('1', 'true', 'yes')
+
+profile_store = None
+
+def get_profile_store():
+    global profile_store
+    if profile_store is None:
+        profile_store = ProfileStore(app.config['PROFILE_DIR'], keep=app.config['PROFILE_KEEP'])
+    return profile_store
+
+def is_admin_user(user_id):
+    if not user_id:
+        return False
+    try:
+        conn = get_db_connection()
+        cursor = conn.cursor()
+        cursor.execute("SELECT is_admin FROM users WHERE id = %s", (user_id,))
+        row = cursor.fetchone()
+        cursor.close()
+        conn.close()
+        return bool(row and row[0])
+    except Exception as e:
+        print(f"Admin check error: {e}")
+        return False
+
+def start_request_profile(name):
+    """Start a profile for this request if an admin asked for one or it was sampled"""
+    requested = request.headers.get('X-Profile', '').lower() in ('1', 'true')
+    if requested and is_admin_user(get_current_user_id()):
+        mode = request.headers.get('X-Profile-Mode', 'sample')
+        if mode not in PROFILE_MODES:
+            mode = 'sample'
+        return ProfileSession(name, mode=mode, interval=app.config['PROFILE_INTERVAL_MS'] / 1000,
+                              profile_model=True, requested=True).start()
+    if app.config['PROFILE_SAMPLE_RATE'] > 0 and random.random() < app.config['PROFILE_SAMPLE_RATE']:
+        # Background sampling stays cheap: stack sampler only, no torch.profiler
+        return ProfileSession(name, mode='sample', interval=app.config['PROFILE_INTERVAL_MS'] / 1000).start()
+    return None
 
 @app.route('/analyze-food', methods=['POST'])
 @app.route('/api/analyze-food', methods=['POST'])
 def analyze_food():
+    session = start_request_profile('analyze-food')
+    if session is None:
+        return handle_analyze_food()
+    
+    try:
+        response = app.make_response(handle_analyze_food())
+    finally:
+        session.finish()
+    try:
+        meta = get_profile_store().save(session, {'status_code': response.status_code})
+        if session.requested:
+            response.headers['X-Profile-Id'] = meta['id']
+        print(f"🔬 Profiled {session.name} in {meta['duration_ms']:.0f}ms -> {meta['id']}")
+    except Exception as e:
+        print(f"❌ Saving profile failed: {e}")
+    return response
+
+def handle_analyze_food():
     try:
+        request_started = time.time()
+        deadline = latency_router.deadline_for(get_request_budget_ms(), request_started)
+        
         # Get image data from request
         data = request.get_json()
         
@@ -225,89 +759,186 @@ def analyze_food():
             return jsonify({'error': 'No image provided'}), 400
         
         # Decode base64 image
-        image_data = data['image']
-        if image_data.startswith('data:image'):
-            image_data = image_data.split(',')[1]
-        
-        # Convert to PIL Image
-        image_bytes = base64.b64decode(image_data)
-        image = Image.open(io.BytesIO(image_bytes))
+        with profile_stage('base64_decode'):
+            image_bytes = decode_image_payload(data['image'])
         
-        # Convert to RGB if necessary
-        if image.mode != 'RGB':
-            image = image.convert('RGB')
+        # Read dimensions from the header before decoding any pixels
+        with profile_stage('header_plan'):
+            plan = image_admission.plan(image_bytes)
         
-        # Convert to numpy array for OpenCV analysis
-        image_array = np.array(image)
+        plate_mode = request.args.get('mode', data.get('mode')) == 'plate'
         
-        # First, use OpenCV to detect non-food content
-        cv_classification = detect_image_content(image_array)
-        
-        # If OpenCV says it's not food, trust it
-        if not cv_classification['is_food']:
+        # Async mode: persist the image, enqueue it and answer right away
+        if is_async_request(data):
+            if plate_mode:
+                return jsonify({'error': 'Plate mode is only available synchronously'}), 400
+            get_job_workers()
+            # The budget applies to processing, not to time spent queued
+            job_id = get_job_queue().enqueue(image_bytes, user_id=get_current_user_id(),
+                                             budget_ms=get_request_budget_ms())
             return jsonify({
-                'name': cv_classification['category'].title(),
-                'calories': 0,
-                'protein': 0,
-                'carbs': 0,
-                'fat': 0,
-                'confidence': cv_classification['confidence'],
-                'portions': 'N/A',
-                'description': get_funny_non_food_message(cv_classification['category']),
-                'isFood': False,
-                'category': 'Non-Food',
-                'analysis_method': 'OpenCV Computer Vision',
-                'debug_info': cv_classification['reason']
-            })
-        
-        # If OpenCV thinks it's food, use AI model for food classification
-        food_model = get_food_model()
-        ai_prediction = food_model.predict_food(image)
+                'job_id': job_id,
+                'status': 'pending',
+                'status_url': f"/api/analyze-food/jobs/{job_id}"
+            }), 202
         
-        # If AI model has low confidence, it might not be food
-        if not ai_prediction['is_food'] or ai_prediction['confidence'] < 0.4:
-            return jsonify({
-                'name': 'Bilinmeyen Nesne',
-                'calories': 0,
-                'protein': 0,
-                'carbs': 0,
-                'fat': 0,
-                'confidence': ai_prediction['confidence'],
-                'portions': 'N/A',
-                'description': 'AI modeli bu görüntüyü yemek olarak tanıyamadı. Lütfen daha net bir yemek fotoğrafı çekin! 🤖',
-                'isFood': False,
-                'category': 'Non-Food',
-                'analysis_method': 'AI Model',
-                'debug_info': f"AI confidence too low: {ai_prediction['confidence']}"
-            })
-        
-        # Get nutrition information
-        nutrition_info = food_model.get_nutrition_info(
-            ai_prediction['food_name'], 
-            ai_prediction['confidence']
-        )
-        
-        return jsonify({
-            'name': nutrition_info['name'],
-            'calories': nutrition_info['calories'],
-            'protein': nutrition_info['protein'],
-            'carbs': nutrition_info['carbs'],
-            'fat': nutrition_info['fat'],
-            'confidence': nutrition_info['confidence'],
-            'portions': '1 porsiyon',
-            'description': f"AI tarafından {nutrition_info['confidence']:.0%} güvenle tanındı",
-            'isFood': True,
-            'category': 'Food',
-            'analysis_method': 'OpenCV + Hugging Face AI',
-            'debug_info': f"Detected as: {ai_prediction['food_name']}"
-        })
+        with image_admission.admit(plan):
+            # Convert to PIL Image
+            with profile_stage('image_decode'):
+                image = load_rgb_image(image_bytes, max_side=plan['max_side'])
+            
+            if plate_mode:
+                return jsonify(analyze_plate(image, deadline=deadline, user_id=get_current_user_id()))
+            return jsonify(analyze_image(image, deadline=deadline, user_id=get_current_user_id()))
         
+    except ImageRejected as e:
+        return image_rejected_response(e)
     except Exception as e:
         return jsonify({
             'error': 'Image analysis failed',
             'message': str(e)
         }), 500
 
+@app.route('/analyze-food/jobs/<job_id>', methods=['GET'])
+@app.route('/api/analyze-food/jobs/<job_id>', methods=['GET'])
+def get_analysis_job(job_id):
+    """Poll an async analysis job; ?wait=N long-polls for up to N seconds"""
+    try:
+        get_job_workers()
+        wait = min(float(request.args.get('wait', 0)), app.config['ANALYZE_MAX_WAIT'])
+        queue = get_job_queue()
+        job = queue.get(job_id)
+        
+        # Jobs submitted while signed in are only visible to their owner;
+        # anonymous jobs are reachable only through their unguessable id
+        if job is None or (job['user_id'] is not None and job['user_id'] != get_current_user_id()):
+            return jsonify({'error': 'Job not found'}), 404
+        
+        if wait > 0 and job['status'] not in ('done', 'failed'):
+            job = queue.wait_for(job_id, wait)
+        job.pop('user_id', None)
+        return jsonify(job)
+        
+    except ValueError:
+        return jsonify({'error': 'wait must be a number'}), 400
+    except Exception as e:
+        return jsonify({'error': str(e)}), 500
+
+@app.route('/analyze-food/queue-stats', methods=['GET'])
+@app.route('/api/analyze-food/queue-stats', methods=['GET'])
+def analysis_queue_stats():
+    """Queue depth, wait time and processing time for capacity planning (admin only)"""
+    if not is_admin_user(get_current_user_id()):
+        return jsonify({'error': 'Forbidden'}), 403
+    try:
+        stats = get_job_queue().stats()
+        stats['workers'] = app.config['ANALYZE_WORKERS']
+        stats['batch_size'] = app.config['ANALYZE_BATCH_SIZE']
+        stats['admission'] = image_admission.stats()
+        return jsonify(stats)
+    except Exception as e:
+        return jsonify({'error': str(e)}), 500
+
+@app.route('/analyze-food/routing-stats', methods=['GET'])
+@app.route('/api/analyze-food/routing-stats', methods=['GET'])
+def analysis_routing_stats():
+    """Tier routing decisions and measured latencies for budget tuning"""
+    return jsonify(latency_router.stats())
+
+@app.route('/rate-limit-stats', methods=['GET'])
+@app.route('/api/rate-limit-stats', methods=['GET'])
+def rate_limit_stats():
+    """Throttled requests per policy / identity and model slot fairness (admin only)"""
+    if not is_admin_user(get_current_user_id()):
+        return jsonify({'error': 'Forbidden'}), 403
+    stats = get_rate_limiter().stats()
+    stats['enabled'] = app.config['RATE_LIMIT_ENABLED']
+    stats['model_scheduler'] = model_scheduler.stats()
+    return jsonify(stats)
+
+@app.route('/admin/profiles', methods=['GET'])
+@app.route('/api/admin/profiles', methods=['GET'])
+def list_profiles():
+    """Recent request profiles (admin only)"""
+    if not is_admin_user(get_current_user_id()):
+        return jsonify({'error': 'Forbidden'}), 403
+    limit = request.args.get('limit', 50, type=int)
+    return jsonify({'profiles': get_profile_store().list(limit)})
+
+@app.route('/admin/profiles/<profile_id>/<artifact>', methods=['GET'])
+@app.route('/api/admin/profiles/<profile_id>/<artifact>', methods=['GET'])
+def download_profile(profile_id, artifact):
+    """Download one profile artifact, e.g. stacks.collapsed (admin only)"""
+    if not is_admin_user(get_current_user_id()):
+        return jsonify({'error': 'Forbidden'}), 403
+    path = get_profile_store().artifact_path(profile_id, artifact)
+    if path is None:
+        return jsonify({'error': 'Profile not found'}), 404
+    return send_file(path, as_attachment=True, download_name=f"{profile_id}-{artifact}")
+
+@app.route('/meals/similar', methods=['GET'])
+@app.route('/api/meals/similar', methods=['GET'])
+def similar_meals():
+    """The user's past meals most similar to an analysed image (?embedding_id=&k=)"""
+    user_id = get_current_user_id()
+    if not user_id:
+        return jsonify({'error': 'Unauthorized'}), 401
+    
+    embedding_id = request.args.get('embedding_id')
+    if not embedding_id:
+        return jsonify({'error': 'embedding_id is required'}), 400
+    k = max(1, min(request.args.get('k', 5, type=int), 50))
+    
+    try:
+        store = get_embedding_store()
+        found = store.get(embedding_id)
+        if found is None or found[0]['user_id'] != user_id:
+            return jsonify({'error': 'Embedding not found'}), 404
+        matches = store.search(found[1], k=k, user_id=user_id, exclude_id=embedding_id)
+        return jsonify({'matches': [past_meal_view(meal) for meal in matches]})
+    except Exception as e:
+        return jsonify({'error': str(e)}), 500
+
+@app.route('/meals/corrections', methods=['POST'])
+@app.route('/api/meals/corrections', methods=['POST'])
+def correct_meal_label():
+    """Record the user's own label for an analysed image ({embedding_id, label})"""
+    user_id = get_current_user_id()
+    if not user_id:
+        return jsonify({'error': 'Unauthorized'}), 401
+    
+    data = request.get_json() or {}
+    embedding_id = data.get('embedding_id')
+    label = (data.get('label') or '').strip()
+    if not embedding_id or not label:
+        return jsonify({'error': 'embedding_id and label are required'}), 400
+    
+    try:
+        store = get_embedding_store()
+        found = store.get(embedding_id)
+        if found is None or found[0]['user_id'] != user_id:
+            return jsonify({'error': 'Embedding not found'}), 404
+        store.correct(embedding_id, label, user_id=user_id)
+        return jsonify({'success': True, 'embedding_id': embedding_id, 'label': label})
+    except Exception as e:
+        return jsonify({'error': str(e)}), 500
+
+@app.route('/meals/embeddings', methods=['DELETE'])
+@app.route('/api/meals/embeddings', methods=['DELETE'])
+def delete_meal_embeddings():
+    """Delete every stored meal embedding and label correction of the user"""
+    user_id = get_current_user_id()
+    if not user_id:
+        return jsonify({'error': 'Unauthorized'}), 401
+    
+    if not os.path.exists(app.config['EMBEDDING_DIR']):
+        return jsonify({'success': True, 'deleted': 0})
+    try:
+        deleted = get_embedding_store().delete_user(user_id)
+        return jsonify({'success': True, 'deleted': deleted})
+    except Exception as e:
+        return jsonify({'error': str(e)}), 500
+
 @app.route('/model-info', methods=['GET'])
 def model_info():
     """Get information about the loaded model"""
@@ -318,7 +949,10 @@ def model_info():
             'model_loaded': food_model.model is not None,
             'feature_extractor_loaded': food_model.feature_extractor is not None,
             'food_database_size': len(food_model.food_nutrition_db),
-            'status': 'ready' if food_model.model is not None else 'fallback_mode'
+            'status': 'ready' if food_model.model is not None else 'fallback_mode',
+            'routing': latency_router.stats(),
+            'thread_plan': get_current_plan(),
+            'embeddings': embedding_store.stats() if embedding_store is not None else None
         })
     except Exception as e:
         return jsonify({'error': str(e)}), 500
@@ -364,11 +998,15 @@ def login():
         conn = get_db_connection()
         cursor = conn.cursor(dictionary=True)
 
-        # Check if user exists by email or username
+        # Check if user exists by email or username - two point lookups on the
+        # unique indexes instead of an OR that MySQL may scan for
         cursor.execute("""
-            SELECT id, email, username, password, full_name
-            FROM users
-            WHERE email = %s OR username = %s
+            (SELECT id, email, username, password, full_name
+             FROM users WHERE email = %s)
+            UNION ALL
+            (SELECT id, email, username, password, full_name
+             FROM users WHERE username = %s)
+            LIMIT 1
         """, (data['emailOrUsername'], data['emailOrUsername']))
 
         user = cursor.fetchone()
@@ -423,7 +1061,10 @@ def register():
 
         # Check if user already exists
         cursor.execute("""
-            SELECT id FROM users WHERE email = %s OR username = %s
+            (SELECT id FROM users WHERE email = %s)
+            UNION ALL
+            (SELECT id FROM users WHERE username = %s)
+            LIMIT 1
         """, (data['email'], data['username']))
 
         if cursor.fetchone():
@@ -521,6 +1162,7 @@ def get_user_nutrition_profile():
         cursor.execute("""
             SELECT * FROM user_profiles 
             WHERE user_id = %s
+            LIMIT 1
         """, (user_id,))
 
         profile = cursor.fetchone()
@@ -549,11 +1191,29 @@ def update_user_nutrition_profile():
         if not data:
             return jsonify({'error': 'Veri gerekli'}), 400
 
+        # Fill in any goals the client didn't send with the server-side formula
+        goal_keys = {
+            'dailyCalorieGoal': 'daily_calorie_goal',
+            'dailyProteinGoal': 'daily_protein_goal',
+            'dailyCarbsGoal': 'daily_carbs_goal',
+            'dailyFatGoal': 'daily_fat_goal',
+        }
+        if any(data.get(key) is None for key in goal_keys):
+            goals = calculate_profile_goals(
+                data.get('age'), data.get('gender'), data.get('height'),
+                data.get('weight'), data.get('activityLevel'), data.get('goal')
+            )
+            if goals:
+                data = dict(data)
+                for key, column in goal_keys.items():
+                    if data.get(key) is None:
+                        data[key] = goals[column]
+
         conn = get_db_connection()
         cursor = conn.cursor()
 
         # Check if profile exists
-        cursor.execute("SELECT id FROM user_profiles WHERE user_id = %s", (user_id,))
+        cursor.execute("SELECT id FROM user_profiles WHERE user_id = %s LIMIT 1", (user_id,))
         existing = cursor.fetchone()
 
         if existing:
@@ -619,6 +1279,61 @@ def update_user_nutrition_profile():
         traceback.print_exc()
         return jsonify({'error': f'Profil kaydedilirken hata oluştu: {str(e)}'}), 500
 
+@app.route('/api/user/export', methods=['GET'])
+@app.route('/user/export', methods=['GET'])
+def export_user():
+    """
+    Stream everything tied to the current user as NDJSON (privacy / account
+    deletion flows). Pass ?cursor=<last cursor received> to resume.
+    """
+    user_id = get_current_user_id()
+    if not user_id:
+        return jsonify({'error': 'Unauthorized'}), 401
+
+    cursor_token = request.args.get('cursor')
+    try:
+        decode_cursor(cursor_token)
+    except ValueError as e:
+        return jsonify({'error': str(e)}), 400
+
+    # Only touch the analysis job and embedding stores if they exist already
+    queue = job_queue if job_queue is not None else (
+        get_job_queue() if os.path.exists(app.config['ANALYZE_QUEUE_DB']) else None
+    )
+    store = get_embedding_store() if os.path.exists(app.config['EMBEDDING_DIR']) else None
+    response = Response(
+        export_user_data(user_id, get_db_connection, queue, cursor_token, store),
+        mimetype='application/x-ndjson'
+    )
+    response.headers['Content-Disposition'] = f'attachment; filename="caloria-export-{user_id}.ndjson"'
+    response.headers['Cache-Control'] = 'no-store'
+    return response
+
+# Parsed, per-language rewards catalog; revalidated against the table every
+# REWARDS_CACHE_TTL seconds
+rewards_catalog = RewardsCatalog(get_db_connection, ttl=int(os.getenv('REWARDS_CACHE_TTL', 30)))
+
+@app.route('/api/rewards/shop', methods=['GET'])
+@app.route('/rewards/shop', methods=['GET'])
+def get_rewards_shop():
+    try:
+        lang = request.args.get('lang', 'all')
+        if lang != 'all' and lang not in SUPPORTED_LANGUAGES:
+            return jsonify({'error': f"Desteklenmeyen dil: {lang}"}), 400
+
+        body, etag, last_modified = rewards_catalog.get(lang)
+
+        response = app.response_class(body, mimetype='application/json')
+        response.set_etag(etag)
+        response.last_modified = last_modified
+        # Clients may keep the copy but must revalidate (cheap 304) each time
+        response.headers['Cache-Control'] = 'no-cache'
+        return response.make_conditional(request)
+
+    except Exception as e:
+        print(f"Get rewards shop error: {e}")
+        return jsonify({'error': 'Ödüller alınırken hata oluştu'}), 500
+
 @app.route('/api/user/features/check-nutritionist', methods=['GET'])
 @app.route('/user/features/check-nutritionist', methods=['GET'])
 def check_nutritionist_access():
@@ -631,9 +1346,10 @@ def check_nutritionist_access():
         conn = get_db_connection()
         cursor = conn.cursor(dictionary=True)
         cursor.execute("""
-            SELECT COUNT(*) as has_access
-            FROM user_rewards
-            WHERE user_id = %s AND reward_id = 3
+            SELECT EXISTS(
+                SELECT 1 FROM user_rewards
+                WHERE user_id = %s AND reward_id = 3
+            ) as has_access
         """, (user_id,))
         result = cursor.fetchone()
         cursor.close()
@@ -652,6 +1368,7 @@ if __name__ == '__main__':
     print("🍎 Starting Caloria AI Food Recognition Backend...")
     print(f"🔑 JWT_SECRET: {JWT_SECRET}")
     print(f"🔑 SECRET_KEY: {app.config['SECRET_KEY']}")
+    print(f"🧵 Thread plan: {apply_runtime(get_current_plan())}")
     print("🤖 Loading AI models...")
     
     # Pre-load the model
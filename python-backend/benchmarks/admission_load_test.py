@@ -0,0 +1,110 @@
+"""
+Mixed-size upload load test for memory admission control.
+
+Fires concurrent /api/analyze-food requests with a mix of small phone photos
+and very large images through Flask's test client, sampling the process RSS
+while they run.
+
+    python benchmarks/admission_load_test.py               # admission on
+    python benchmarks/admission_load_test.py --no-admission  # baseline
+
+--no-admission raises every limit so the run behaves like the server before
+admission control (every image fully decoded, no budget).
+"""
+import argparse
+import base64
+import io
+import os
+import random
+import resource
+import sys
+import threading
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+# (width, height, weight) - mostly phone photos plus a few huge uploads
+IMAGE_MIX = [
+    ((1280, 960), 6),
+    ((4032, 3024), 3),
+    ((8000, 6000), 1),
+]
+
+def current_rss_mb():
+    with open('/proc/self/status') as f:
+        for line in f:
+            if line.startswith('VmRSS:'):
+                return int(line.split()[1]) / 1024
+    return 0.0
+
+def make_payload(size):
+    from PIL import Image
+    import numpy as np
+    # Noise keeps JPEG from compressing the test image to nothing
+    pixels = np.random.randint(0, 255, (size[1], size[0], 3), dtype=np.uint8)
+    buffer = io.BytesIO()
+    Image.fromarray(pixels).save(buffer, format='JPEG', quality=85)
+    return base64.b64encode(buffer.getvalue()).decode('ascii')
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--requests', type=int, default=60)
+    parser.add_argument('--concurrency', type=int, default=8)
+    parser.add_argument('--no-admission', action='store_true')
+    args = parser.parse_args()
+
+    if args.no_admission:
+        os.environ['ANALYZE_MEMORY_BUDGET_MB'] = str(1024 * 1024)
+        os.environ['ANALYZE_MAX_PIXELS'] = str(10 ** 12)
+        os.environ['ANALYZE_HARD_MAX_PIXELS'] = str(10 ** 12)
+
+    # Every request comes from one client; keep the rate limiter out of the measurement
+    os.environ['RATE_LIMIT_ENABLED'] = 'False'
+    from app import app
+
+    print("🖼️ Generating test images...")
+    payloads = {size: make_payload(size) for size, _ in IMAGE_MIX}
+    sizes = [size for size, weight in IMAGE_MIX for _ in range(weight)]
+    plan = [random.choice(sizes) for _ in range(args.requests)]
+
+    peak_rss = current_rss_mb()
+    baseline_rss = peak_rss
+    statuses = {}
+    lock = threading.Lock()
+    done = threading.Event()
+
+    def sample_rss():
+        nonlocal peak_rss
+        while not done.is_set():
+            peak_rss = max(peak_rss, current_rss_mb())
+            time.sleep(0.01)
+
+    def worker(jobs):
+        client = app.test_client()
+        for size in jobs:
+            response = client.post('/api/analyze-food', json={'image': payloads[size]})
+            with lock:
+                statuses[response.status_code] = statuses.get(response.status_code, 0) + 1
+
+    sampler = threading.Thread(target=sample_rss, daemon=True)
+    sampler.start()
+    started = time.time()
+    threads = [threading.Thread(target=worker, args=(plan[i::args.concurrency],))
+               for i in range(args.concurrency)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    elapsed = time.time() - started
+    done.set()
+    sampler.join()
+
+    max_rss_mb = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024
+    print(f"\n📊 {'Baseline (no admission)' if args.no_admission else 'Admission control'}")
+    print(f"   Requests:      {args.requests} @ concurrency {args.concurrency} in {elapsed:.1f}s")
+    print(f"   Status codes:  {dict(sorted(statuses.items()))}")
+    print(f"   RSS at start:  {baseline_rss:.0f} MB")
+    print(f"   Peak RSS:      {max(peak_rss, max_rss_mb):.0f} MB")
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,117 @@
+"""
+Query latency of EmbeddingStore at 1M vectors on CPU.
+
+Bulk-loads synthetic clustered embeddings (768-d, the nateraw/food ViT
+width) into a temporary store for each dtype. It then times global and
+per-user top-k searches and reports recall@k against an exact float32
+scan over the same vectors.
+
+    python benchmarks/embedding_search.py [--vectors 1000000] [--dtype int8 float16] [--queries 50]
+"""
+import argparse
+import os
+import shutil
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import numpy as np
+from embedding_store import EmbeddingStore
+
+def chunks(total, dim, users, chunk_size, seed):
+    """Deterministic (vectors, user_ids) chunks: cluster centres plus noise"""
+    rng = np.random.default_rng(seed)
+    centres = rng.normal(size=(1000, dim)).astype(np.float32)
+    for start in range(0, total, chunk_size):
+        n = min(chunk_size, total - start)
+        vectors = centres[rng.integers(0, len(centres), n)] + rng.normal(0, 0.6, (n, dim)).astype(np.float32)
+        yield vectors, rng.integers(0, users, n)
+
+def exact_top_k(queries, args):
+    best = [[] for _ in queries]
+    normalized = queries / np.linalg.norm(queries, axis=1, keepdims=True)
+    offset = 0
+    for vectors, _ in chunks(args.vectors, args.dim, args.users, args.chunk, args.seed):
+        vectors /= np.linalg.norm(vectors, axis=1, keepdims=True)
+        scores = vectors @ normalized.T
+        for q in range(len(queries)):
+            top = np.argpartition(-scores[:, q], args.k)[:args.k]
+            best[q].extend(zip(scores[top, q], top + offset))
+        offset += len(vectors)
+    return [{index for _, index in sorted(candidates, reverse=True)[:args.k]} for candidates in best]
+
+def percentiles(samples):
+    samples = sorted(samples)
+    return samples[len(samples) // 2], samples[min(len(samples) - 1, int(len(samples) * 0.99))]
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--vectors', type=int, default=1_000_000)
+    parser.add_argument('--dim', type=int, default=768)
+    parser.add_argument('--users', type=int, default=1000)
+    parser.add_argument('--dtype', nargs='+', default=['int8', 'float16'])
+    parser.add_argument('--queries', type=int, default=50)
+    parser.add_argument('--k', type=int, default=5)
+    parser.add_argument('--block-rows', type=int, default=256)
+    parser.add_argument('--chunk', type=int, default=65536, help='rows per bulk-loaded segment')
+    parser.add_argument('--seed', type=int, default=0)
+    args = parser.parse_args()
+
+    rng = np.random.default_rng(args.seed + 1)
+    # Queries are noisy copies of stored vectors, like a re-photographed meal
+    sample, sample_users = next(chunks(args.chunk, args.dim, args.users, args.chunk, args.seed))
+    picks = rng.integers(0, len(sample), args.queries)
+    queries = sample[picks] + rng.normal(0, 0.2, (args.queries, args.dim)).astype(np.float32)
+    query_users = sample_users[picks]
+
+    print(f"🔎 Exact float32 scan for recall@{args.k}...")
+    exact = exact_top_k(queries[:10], args)
+
+    for dtype in args.dtype:
+        directory = tempfile.mkdtemp(prefix=f"embeddings-{dtype}-")
+        try:
+            store = EmbeddingStore(directory, dtype=dtype, block_rows=args.block_rows)
+            started = time.perf_counter()
+            loaded = 0
+            for vectors, user_ids in chunks(args.vectors, args.dim, args.users, args.chunk, args.seed):
+                store.add_many(vectors, user_ids=user_ids.tolist())
+                loaded += len(vectors)
+            load_s = time.perf_counter() - started
+            stats = store.stats()
+
+            global_ms, user_ms, recall = [], [], []
+            for i, (query, user_id) in enumerate(zip(queries, query_users)):
+                started = time.perf_counter()
+                results = store.search(query, k=args.k)
+                global_ms.append((time.perf_counter() - started) * 1000)
+                started = time.perf_counter()
+                store.search(query, k=args.k, user_id=int(user_id))
+                user_ms.append((time.perf_counter() - started) * 1000)
+                if i < len(exact):
+                    found = {store_position(store, row['embedding_id']) for row in results}
+                    recall.append(len(found & exact[i]) / args.k)
+
+            g50, g99 = percentiles(global_ms)
+            u50, u99 = percentiles(user_ms)
+            print(f"{dtype:>8}: {stats['vectors']} vectors, {stats['bytes'] / 1024 ** 2:.0f} MB, "
+                  f"loaded in {load_s:.1f}s")
+            print(f"          global top-{args.k}: p50 {g50:.1f} ms, p99 {g99:.1f} ms | "
+                  f"per-user: p50 {u50:.2f} ms, p99 {u99:.2f} ms | recall@{args.k} {np.mean(recall):.3f}")
+        finally:
+            shutil.rmtree(directory, ignore_errors=True)
+
+def store_position(store, embedding_id):
+    """Global insertion position of an id (segments are loaded in manifest order)"""
+    offset = 0
+    key = embedding_id.encode()
+    for segment in store.segments.values():
+        matches = np.flatnonzero(segment.ids == key)
+        if len(matches):
+            return offset + int(matches[0])
+        offset += len(segment)
+    return None
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,217 @@
+"""
+EXPLAIN plans and latency for the login / register / profile / reward lookups.
+
+Seeds scratch tables (bench_users, bench_user_profiles, bench_user_rewards)
+in the configured database with --users rows. It then runs the old queries
+on the old indexes, applies the indexes from migrations/add_lookup_indexes.sql,
+and runs the rewritten queries. The real tables are never touched.
+
+    python benchmarks/lookup_queries.py --users 1000000 --iterations 2000
+    python benchmarks/lookup_queries.py --drop     # remove the scratch tables
+"""
+import argparse
+import math
+import os
+import random
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import mysql.connector
+from dotenv import load_dotenv
+
+load_dotenv()
+
+TABLES = ('bench_user_rewards', 'bench_user_profiles', 'bench_users')
+
+# (label, old query, new query, argument builder)
+QUERIES = [
+    ('login by email',
+     "SELECT id, email, username, password, full_name FROM bench_users WHERE email = %s OR username = %s",
+     "(SELECT id, email, username, password, full_name FROM bench_users WHERE email = %s) UNION ALL "
+     "(SELECT id, email, username, password, full_name FROM bench_users WHERE username = %s) LIMIT 1",
+     lambda n: (f"user{n}@example.com",) * 2),
+    ('login by username',
+     "SELECT id, email, username, password, full_name FROM bench_users WHERE email = %s OR username = %s",
+     "(SELECT id, email, username, password, full_name FROM bench_users WHERE email = %s) UNION ALL "
+     "(SELECT id, email, username, password, full_name FROM bench_users WHERE username = %s) LIMIT 1",
+     lambda n: (f"user{n}",) * 2),
+    ('register check',
+     "SELECT id FROM bench_users WHERE email = %s OR username = %s",
+     "(SELECT id FROM bench_users WHERE email = %s) UNION ALL "
+     "(SELECT id FROM bench_users WHERE username = %s) LIMIT 1",
+     lambda n: (f"user{n}@example.com", f"user{n}")),
+    ('profile lookup',
+     "SELECT * FROM bench_user_profiles WHERE user_id = %s",
+     "SELECT * FROM bench_user_profiles WHERE user_id = %s LIMIT 1",
+     lambda n: (n,)),
+    ('nutritionist check',
+     "SELECT COUNT(*) AS has_access FROM bench_user_rewards WHERE user_id = %s AND reward_id = 3",
+     "SELECT EXISTS(SELECT 1 FROM bench_user_rewards WHERE user_id = %s AND reward_id = 3) AS has_access",
+     lambda n: (n,)),
+]
+
+def connect():
+    return mysql.connector.connect(
+        host=os.getenv('DB_HOST', 'localhost'),
+        user=os.getenv('DB_USER', 'root'),
+        password=os.getenv('DB_PASSWORD', 'root'),
+        database=os.getenv('DB_NAME', 'caloria_db'),
+    )
+
+def drop_tables(cursor):
+    for table in TABLES:
+        cursor.execute(f"DROP TABLE IF EXISTS {table}")
+
+def seed(conn, users):
+    """Create the scratch tables with the pre-migration indexes and fill them"""
+    cursor = conn.cursor()
+    drop_tables(cursor)
+    # Same indexes as backend/database.sql (user_rewards: database-setup.sql)
+    # before the migration, including the implicit FK indexes
+    cursor.execute("""
+        CREATE TABLE bench_users (
+            id INT PRIMARY KEY AUTO_INCREMENT,
+            email VARCHAR(255) UNIQUE NOT NULL,
+            username VARCHAR(100) UNIQUE NOT NULL,
+            password VARCHAR(255) NOT NULL,
+            full_name VARCHAR(255) NOT NULL,
+            INDEX idx_users_email (email),
+            INDEX idx_users_username (username)
+        )
+    """)
+    cursor.execute("""
+        CREATE TABLE bench_user_profiles (
+            id INT PRIMARY KEY AUTO_INCREMENT,
+            user_id INT NOT NULL,
+            name VARCHAR(255) NOT NULL,
+            daily_calorie_goal INT NOT NULL,
+            FOREIGN KEY (user_id) REFERENCES bench_users(id) ON DELETE CASCADE
+        )
+    """)
+    # reward_id's FK points at rewards, which is not copied; keep its index
+    cursor.execute("""
+        CREATE TABLE bench_user_rewards (
+            id INT PRIMARY KEY AUTO_INCREMENT,
+            user_id INT NOT NULL,
+            reward_id INT NOT NULL,
+            INDEX reward_id (reward_id),
+            FOREIGN KEY (user_id) REFERENCES bench_users(id) ON DELETE CASCADE,
+            UNIQUE KEY unique_user_reward (user_id, reward_id)
+        )
+    """)
+
+    # 1..users from a cross join of digits, no client round trips per row
+    places = max(1, math.ceil(math.log10(users)))
+    digits = "(SELECT 0 d UNION ALL SELECT 1 UNION ALL SELECT 2 UNION ALL SELECT 3 UNION ALL SELECT 4 " \
+             "UNION ALL SELECT 5 UNION ALL SELECT 6 UNION ALL SELECT 7 UNION ALL SELECT 8 UNION ALL SELECT 9)"
+    sequence = " CROSS JOIN ".join(f"{digits} d{i}" for i in range(places))
+    number = " + ".join(f"d{i}.d * {10 ** i}" for i in range(places))
+
+    print(f"🌱 Seeding {users} users...")
+    started = time.time()
+    cursor.execute(f"""
+        INSERT INTO bench_users (id, email, username, password, full_name)
+        SELECT n, CONCAT('user', n, '@example.com'), CONCAT('user', n), 'x', CONCAT('User ', n)
+        FROM (SELECT {number} + 1 AS n FROM {sequence}) seq
+        WHERE n <= %s
+    """, (users,))
+    cursor.execute("""
+        INSERT INTO bench_user_profiles (user_id, name, daily_calorie_goal)
+        SELECT id, full_name, 2000 FROM bench_users
+    """)
+    # A few rewards per user; reward 3 for every 10th user
+    cursor.execute("""
+        INSERT INTO bench_user_rewards (user_id, reward_id)
+        SELECT id, 1 FROM bench_users
+        UNION ALL SELECT id, 2 FROM bench_users WHERE id % 2 = 0
+        UNION ALL SELECT id, 3 FROM bench_users WHERE id % 10 = 0
+    """)
+    conn.commit()
+    cursor.execute("ANALYZE TABLE bench_users, bench_user_profiles, bench_user_rewards")
+    cursor.fetchall()
+    cursor.close()
+    print(f"   done in {time.time() - started:.0f}s")
+
+def index_exists(cursor, table, index):
+    cursor.execute("""
+        SELECT 1 FROM information_schema.STATISTICS
+        WHERE TABLE_SCHEMA = DATABASE() AND TABLE_NAME = %s AND INDEX_NAME = %s
+        LIMIT 1
+    """, (table, index))
+    return bool(cursor.fetchall())
+
+def apply_indexes(conn):
+    """migrations/add_lookup_indexes.sql, on the scratch tables
+
+    user_rewards already has unique_user_reward, so the migration leaves it
+    alone; only users and user_profiles change.
+    """
+    cursor = conn.cursor()
+    cursor.execute("ALTER TABLE bench_users DROP INDEX idx_users_email, DROP INDEX idx_users_username")
+    cursor.execute("ALTER TABLE bench_user_profiles ADD UNIQUE INDEX uq_user_profiles_user_id (user_id)")
+    # MySQL may already have dropped the implicit FK index on its own
+    if index_exists(cursor, 'bench_user_profiles', 'user_id'):
+        cursor.execute("ALTER TABLE bench_user_profiles DROP INDEX user_id")
+    cursor.execute("ANALYZE TABLE bench_users, bench_user_profiles")
+    cursor.fetchall()
+    cursor.close()
+
+def explain(conn, query, args):
+    cursor = conn.cursor(dictionary=True)
+    cursor.execute("EXPLAIN " + query, args)
+    rows = cursor.fetchall()
+    cursor.close()
+    return [f"{row['table']}: type={row['type']} key={row['key']} rows={row['rows']} extra={row['Extra']}"
+            for row in rows]
+
+def time_query(conn, query, make_args, users, iterations):
+    cursor = conn.cursor()
+    latencies = []
+    for _ in range(iterations):
+        args = make_args(random.randint(1, users))
+        started = time.perf_counter()
+        cursor.execute(query, args)
+        cursor.fetchall()
+        latencies.append((time.perf_counter() - started) * 1000)
+    cursor.close()
+    latencies.sort()
+    return latencies[len(latencies) // 2], latencies[int(len(latencies) * 0.95)]
+
+def report(conn, phase, column, users, iterations):
+    print(f"\n=== {phase} ===")
+    for label, old, new, make_args in QUERIES:
+        query = old if column == 'old' else new
+        p50, p95 = time_query(conn, query, make_args, users, iterations)
+        print(f"{label:<20} p50 {p50:7.3f} ms  p95 {p95:7.3f} ms")
+        for line in explain(conn, query, make_args(users // 2)):
+            print(f"    {line}")
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--users', type=int, default=1_000_000)
+    parser.add_argument('--iterations', type=int, default=2000)
+    parser.add_argument('--skip-seed', action='store_true', help='reuse existing scratch tables')
+    parser.add_argument('--drop', action='store_true', help='drop the scratch tables and exit')
+    args = parser.parse_args()
+
+    conn = connect()
+    if args.drop:
+        cursor = conn.cursor()
+        drop_tables(cursor)
+        cursor.close()
+        conn.close()
+        print("🧹 Scratch tables dropped")
+        return
+
+    if not args.skip_seed:
+        seed(conn, args.users)
+    report(conn, 'Before: OR / COUNT(*) queries, original indexes', 'old', args.users, args.iterations)
+    if not args.skip_seed:
+        apply_indexes(conn)
+    report(conn, 'After: UNION ALL / EXISTS queries, migrated indexes', 'new', args.users, args.iterations)
+    conn.close()
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,130 @@
+"""
+Plate mode latency: one batched forward pass over N region crops versus a
+single-image inference and versus N sequential inferences.
+
+Uses a synthetic plate (several coloured, textured blobs on a white plate)
+so region proposal has something to find. Times region proposal and model
+inference separately and reports the batch/single ratio per region count.
+
+--count-calls needs no model: it runs app.analyze_plate with a stand-in
+model that records its calls, to check that every region of a plate goes
+through one predict_food_batch call when the router picks the 'ai' tier.
+
+    python benchmarks/plate_benchmark.py [--iterations 20] [--regions 1 2 4 6 8]
+    python benchmarks/plate_benchmark.py --count-calls
+"""
+import argparse
+import os
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import numpy as np
+import cv2
+import food_model
+from food_model import FoodRecognitionModel
+from image_analysis import edge_map
+from plate_analysis import propose_regions, crop_regions
+
+COLORS = [(235, 215, 160), (130, 65, 35), (70, 160, 55), (200, 90, 40), (240, 200, 60), (90, 50, 90),
+          (180, 140, 100), (220, 60, 60)]
+
+def make_plate(items, width=1600, height=1200, seed=0):
+    rng = np.random.default_rng(seed)
+    image = np.full((height, width, 3), 225, np.uint8)
+    cv2.circle(image, (width // 2, height // 2), int(min(width, height) * 0.47), (248, 248, 248), -1)
+    radius = int(min(width, height) * 0.09)
+    for i in range(items):
+        angle = 2 * np.pi * i / max(items, 1)
+        cx = int(width / 2 + np.cos(angle) * min(width, height) * 0.28 * (items > 1))
+        cy = int(height / 2 + np.sin(angle) * min(width, height) * 0.28 * (items > 1))
+        cv2.circle(image, (cx, cy), radius, COLORS[i % len(COLORS)], -1)
+    noise = rng.normal(0, 10, image.shape)
+    return np.clip(image + noise, 0, 255).astype(np.uint8)
+
+def timed(fn, iterations):
+    fn()  # warm up
+    started = time.perf_counter()
+    for _ in range(iterations):
+        result = fn()
+    return (time.perf_counter() - started) / iterations * 1000, result
+
+class CountingModel:
+    """Stand-in for a loaded FoodRecognitionModel that records its calls"""
+
+    def __init__(self, nutrition_source):
+        self.nutrition_source = nutrition_source
+        self.calls = []
+
+    def is_model_loaded(self):
+        return True
+
+    def _prediction(self):
+        return {'food_name': 'pizza', 'confidence': 0.9, 'is_food': True, 'tier': 'ai',
+                'top_predictions': [], 'embedding': None}
+
+    def predict_food_batch(self, images):
+        self.calls.append(('predict_food_batch', len(images)))
+        return [self._prediction() for _ in images]
+
+    def predict_food(self, image, tier='ai'):
+        self.calls.append(('predict_food', 1))
+        return self._prediction()
+
+    def get_nutrition_info(self, food_name, confidence):
+        return self.nutrition_source.get_nutrition_info(food_name, confidence)
+
+def count_calls(region_counts):
+    import app
+    model = CountingModel(food_model.get_food_model())
+    food_model.food_model = model
+
+    print(f"{'items':>5} {'found':>5} | {'tier':>4} | model calls")
+    failures = 0
+    for items in region_counts:
+        model.calls = []
+        result = app.analyze_plate(make_plate(items, seed=items))
+        found = len(result['items'])
+        tier = 'ai' if 'AI' in result['analysis_method'] else result['analysis_method']
+        calls = ', '.join(f"{name}({n})" for name, n in model.calls)
+        ok = found == 0 or model.calls == [('predict_food_batch', found)]
+        failures += not ok
+        print(f"{items:>5} {found:>5} | {tier:>4} | {calls}{'' if ok else '  ❌'}")
+    if failures:
+        sys.exit(f"❌ {failures} plate(s) did not use exactly one batched call")
+    print("✅ Every plate used exactly one batched model call")
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--iterations', type=int, default=20)
+    parser.add_argument('--regions', type=int, nargs='+', default=[1, 2, 4, 6, 8])
+    parser.add_argument('--count-calls', action='store_true',
+                        help='check the call pattern with a stand-in model instead of timing')
+    args = parser.parse_args()
+
+    if args.count_calls:
+        count_calls(args.regions)
+        return
+
+    model = FoodRecognitionModel()
+    if not model.is_model_loaded():
+        sys.exit("❌ Model could not be loaded (--count-calls runs without it)")
+
+    print(f"{'items':>5} {'found':>5} | {'regions ms':>10} | {'single ms':>9} | {'batch ms':>8} "
+          f"{'x single':>8} | {'sequential ms':>13}")
+    for items in args.regions:
+        image = make_plate(items, seed=items)
+        proposal_ms, regions = timed(
+            lambda: propose_regions(image, edge_map(image)[1], max_regions=max(args.regions)), args.iterations)
+        crops = crop_regions(image, regions)
+
+        single_ms, _ = timed(lambda: model.predict_food_batch(crops[:1]), args.iterations)
+        batch_ms, _ = timed(lambda: model.predict_food_batch(crops), args.iterations)
+        sequential_ms, _ = timed(lambda: [model.predict_food_batch([crop]) for crop in crops], args.iterations)
+
+        print(f"{items:>5} {len(regions):>5} | {proposal_ms:10.1f} | {single_ms:9.1f} | {batch_ms:8.1f} "
+              f"{batch_ms / single_ms:7.2f}x | {sequential_ms:13.1f}")
+
+if __name__ == '__main__':
+    main()
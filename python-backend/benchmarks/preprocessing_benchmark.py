@@ -0,0 +1,87 @@
+"""
+Compare the HF image processor with FastImagePreprocessor for nateraw/food.
+
+Checks that both produce the same pixel_values within tolerance and that
+the model's top-1 label agrees. Also reports per-image preprocessing time
+and Python-visible allocations (tracemalloc, which tracks numpy buffers).
+
+    python benchmarks/preprocessing_benchmark.py [--iterations 50] [--atol 0.05]
+"""
+import argparse
+import os
+import sys
+import time
+import tracemalloc
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import numpy as np
+import torch
+from transformers import AutoImageProcessor, AutoModelForImageClassification
+from preprocessing import FastImagePreprocessor
+
+MODEL_NAME = "nateraw/food"
+SIZES = [(640, 480), (1280, 960), (2048, 1536), (4032, 3024)]
+
+def make_image(width, height, seed):
+    # Smooth gradients plus noise: closer to photo statistics than pure noise,
+    # which exaggerates resampling differences
+    rng = np.random.default_rng(seed)
+    y, x = np.mgrid[0:height, 0:width]
+    base = np.stack([x / width, y / height, (x + y) / (width + height)], axis=-1) * 200
+    noise = rng.normal(0, 12, (height, width, 3))
+    return np.clip(base + noise, 0, 255).astype(np.uint8)
+
+def measure(fn, image, iterations):
+    fn(image)  # warm up
+    tracemalloc.start()
+    started = time.perf_counter()
+    for _ in range(iterations):
+        fn(image)
+    elapsed = time.perf_counter() - started
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    return elapsed / iterations * 1000, peak / 1024 / 1024
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--iterations', type=int, default=50)
+    parser.add_argument('--atol', type=float, default=0.05,
+                        help='max mean absolute difference in normalized pixel space')
+    args = parser.parse_args()
+
+    processor = AutoImageProcessor.from_pretrained(MODEL_NAME)
+    model = AutoModelForImageClassification.from_pretrained(MODEL_NAME).eval()
+    fast = FastImagePreprocessor.from_hf_processor(processor)
+    if fast is None:
+        sys.exit(f"FastImagePreprocessor does not support the {MODEL_NAME} processor config")
+
+    hf_fn = lambda image: processor(images=image, return_tensors="pt")['pixel_values']
+    fast_fn = lambda image: fast([image])
+
+    print(f"{'size':>11} | {'HF ms':>7} {'HF MB':>7} | {'fast ms':>7} {'fast MB':>7} | "
+          f"{'mean|Δ|':>8} {'max|Δ|':>7} | top-1")
+    failures = 0
+    for i, (width, height) in enumerate(SIZES):
+        image = make_image(width, height, seed=i)
+
+        hf_values = hf_fn(image)
+        fast_values = fast_fn(image).clone()
+        diff = (hf_values - fast_values).abs()
+        with torch.no_grad():
+            hf_label = model(pixel_values=hf_values).logits.argmax(-1).item()
+            fast_label = model(pixel_values=fast_values).logits.argmax(-1).item()
+
+        hf_ms, hf_mb = measure(hf_fn, image, args.iterations)
+        fast_ms, fast_mb = measure(fast_fn, image, args.iterations)
+
+        ok = diff.mean().item() <= args.atol and hf_label == fast_label
+        failures += not ok
+        print(f"{width:>5}x{height:<5} | {hf_ms:7.2f} {hf_mb:7.2f} | {fast_ms:7.2f} {fast_mb:7.2f} | "
+              f"{diff.mean().item():8.4f} {diff.max().item():7.3f} | "
+              f"{'same' if hf_label == fast_label else 'DIFFERENT'} {'✅' if ok else '❌'}")
+
+    sys.exit(1 if failures else 0)
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,125 @@
+"""
+Sweep gunicorn workers x torch threads for /api/analyze-food.
+
+For every (workers, threads) pair, starts gunicorn with that plan and
+fires --requests analyses from --clients concurrent clients. Reports
+throughput and p50/p99 latency. threads=0 means the planner's default:
+the usable cores divided by the workers.
+
+    python benchmarks/thread_sweep.py --workers 1 2 4 8 --threads 0 1 2 4
+"""
+import argparse
+import base64
+import io
+import json
+import os
+import signal
+import subprocess
+import sys
+import threading
+import time
+import urllib.error
+import urllib.request
+
+from worker_memory import BACKEND_DIR, READY_LINE
+
+def make_payload():
+    import numpy as np
+    from PIL import Image
+    # Warm food-like colours so OpenCV passes the image on to the model
+    rng = np.random.default_rng(0)
+    pixels = np.clip(rng.normal((180, 120, 70), 30, (960, 1280, 3)), 0, 255).astype(np.uint8)
+    buffer = io.BytesIO()
+    Image.fromarray(pixels).save(buffer, format='JPEG', quality=85)
+    return json.dumps({'image': base64.b64encode(buffer.getvalue()).decode('ascii')}).encode()
+
+def start_server(workers, threads, port, timeout):
+    env = dict(os.environ,
+               GUNICORN_WORKERS=str(workers),
+               TORCH_NUM_THREADS=str(threads),
+               GUNICORN_BIND=f'127.0.0.1:{port}',
+               # One client address sends every request; measure the model, not the limiter
+               RATE_LIMIT_ENABLED='False',
+               PYTHONUNBUFFERED='1')
+    proc = subprocess.Popen([sys.executable, '-m', 'gunicorn', 'app:app'], cwd=BACKEND_DIR, env=env,
+                            stdout=subprocess.PIPE, stderr=subprocess.STDOUT, text=True)
+    ready = 0
+    started = time.time()
+    while ready < workers:
+        if time.time() - started > timeout:
+            proc.kill()
+            raise TimeoutError('workers did not start')
+        line = proc.stdout.readline()
+        if not line:
+            raise RuntimeError('gunicorn exited early')
+        ready += bool(READY_LINE.search(line))
+    # Keep draining output so gunicorn never blocks on a full pipe
+    threading.Thread(target=proc.stdout.read, daemon=True).start()
+    return proc
+
+def load(url, payload, requests, clients):
+    latencies = []
+    errors = {}
+    lock = threading.Lock()
+
+    def client(count):
+        for _ in range(count):
+            req = urllib.request.Request(url, data=payload, headers={'Content-Type': 'application/json'})
+            started = time.perf_counter()
+            try:
+                with urllib.request.urlopen(req, timeout=120) as response:
+                    response.read()
+            except urllib.error.HTTPError as e:
+                with lock:
+                    errors[e.code] = errors.get(e.code, 0) + 1
+                continue
+            with lock:
+                latencies.append(time.perf_counter() - started)
+
+    per_client = [requests // clients + (i < requests % clients) for i in range(clients)]
+    threads = [threading.Thread(target=client, args=(n,)) for n in per_client]
+    started = time.perf_counter()
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    elapsed = time.perf_counter() - started
+
+    if not latencies:
+        raise RuntimeError(f"every request failed: {errors}")
+    latencies.sort()
+    return {
+        'errors': errors,
+        'rps': len(latencies) / elapsed,
+        'p50': latencies[len(latencies) // 2] * 1000,
+        'p99': latencies[min(len(latencies) - 1, int(len(latencies) * 0.99))] * 1000,
+    }
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--workers', type=int, nargs='+', default=[1, 2, 4, 8])
+    parser.add_argument('--threads', type=int, nargs='+', default=[0, 1, 2, 4])
+    parser.add_argument('--requests', type=int, default=200)
+    parser.add_argument('--clients', type=int, default=16)
+    parser.add_argument('--port', type=int, default=5098)
+    parser.add_argument('--timeout', type=float, default=600)
+    args = parser.parse_args()
+
+    payload = make_payload()
+    url = f'http://127.0.0.1:{args.port}/api/analyze-food'
+    print(f"{'workers':>7} {'threads':>7} | {'req/s':>7} | {'p50 ms':>8} | {'p99 ms':>8}")
+    for workers in args.workers:
+        for threads in args.threads:
+            proc = start_server(workers, threads, args.port, args.timeout)
+            try:
+                load(url, payload, min(args.requests, args.clients * 2), args.clients)  # warm up
+                result = load(url, payload, args.requests, args.clients)
+            finally:
+                proc.send_signal(signal.SIGTERM)
+                proc.wait(30)
+            label = threads or 'auto'
+            print(f"{workers:>7} {label:>7} | {result['rps']:7.1f} | {result['p50']:8.0f} | {result['p99']:8.0f}"
+                  + (f" | errors {result['errors']}" if result['errors'] else ''))
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,93 @@
+"""
+Per-worker memory and startup time under gunicorn, with and without preload.
+
+Starts gunicorn with 1, 4 and 8 workers in each mode. It waits until every
+worker prints its ready line, then reads /proc/<pid>/smaps_rollup for the
+master and each worker:
+
+  USS  private pages only (what the worker really costs)
+  PSS  private pages plus its share of the pages shared with the others
+
+    python benchmarks/worker_memory.py [--workers 1 4 8] [--timeout 600]
+"""
+import argparse
+import os
+import re
+import signal
+import subprocess
+import sys
+import time
+
+BACKEND_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+READY_LINE = re.compile(r'Worker (\d+) ready in ([\d.]+)s')
+
+def smaps_kb(pid):
+    values = {}
+    with open(f'/proc/{pid}/smaps_rollup') as f:
+        for line in f:
+            parts = line.split()
+            if len(parts) >= 2 and parts[0].endswith(':') and parts[1].isdigit():
+                values[parts[0][:-1]] = int(parts[1])
+    return {
+        'uss': values.get('Private_Clean', 0) + values.get('Private_Dirty', 0),
+        'pss': values.get('Pss', 0),
+        'rss': values.get('Rss', 0),
+    }
+
+def run(workers, preload, timeout, port):
+    env = dict(os.environ,
+               GUNICORN_WORKERS=str(workers),
+               GUNICORN_PRELOAD=str(preload),
+               GUNICORN_BIND=f'127.0.0.1:{port}',
+               PYTHONUNBUFFERED='1')
+    started = time.time()
+    proc = subprocess.Popen([sys.executable, '-m', 'gunicorn', 'app:app'], cwd=BACKEND_DIR, env=env,
+                            stdout=subprocess.PIPE, stderr=subprocess.STDOUT, text=True)
+    ready = {}
+    try:
+        while len(ready) < workers:
+            if time.time() - started > timeout:
+                raise TimeoutError(f'only {len(ready)}/{workers} workers ready')
+            line = proc.stdout.readline()
+            if not line:
+                raise RuntimeError('gunicorn exited early')
+            match = READY_LINE.search(line)
+            if match:
+                ready[int(match.group(1))] = float(match.group(2))
+        startup = time.time() - started
+        # Let import-time allocations settle before sampling
+        time.sleep(2)
+
+        master = smaps_kb(proc.pid)
+        per_worker = [smaps_kb(pid) for pid in ready]
+        return {
+            'startup': startup,
+            'master_uss_mb': master['uss'] / 1024,
+            'worker_uss_mb': sum(w['uss'] for w in per_worker) / len(per_worker) / 1024,
+            'total_pss_mb': (master['pss'] + sum(w['pss'] for w in per_worker)) / 1024,
+        }
+    finally:
+        proc.send_signal(signal.SIGTERM)
+        try:
+            proc.wait(30)
+        except subprocess.TimeoutExpired:
+            proc.kill()
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--workers', type=int, nargs='+', default=[1, 4, 8])
+    parser.add_argument('--timeout', type=float, default=600)
+    parser.add_argument('--port', type=int, default=5099)
+    args = parser.parse_args()
+
+    print(f"{'mode':>10} {'workers':>7} | {'startup s':>9} | {'master USS':>10} | "
+          f"{'USS/worker':>10} | {'total PSS':>9}")
+    for preload in (False, True):
+        for workers in args.workers:
+            result = run(workers, preload, args.timeout, args.port)
+            print(f"{'preload' if preload else 'per-worker':>10} {workers:>7} | "
+                  f"{result['startup']:9.1f} | {result['master_uss_mb']:8.0f}MB | "
+                  f"{result['worker_uss_mb']:8.0f}MB | {result['total_pss_mb']:7.0f}MB")
+
+if __name__ == '__main__':
+    main()
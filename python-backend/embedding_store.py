@@ -0,0 +1,715 @@
+"""
+Append-only on-disk store of image embeddings with blocked cosine search.
+
+Layout under the store directory:
+
+    store.json                      dim and dtype, fixed when the first vector arrives
+    manifest.json                   names of the sealed segments currently live
+    seg-<id>.vec / .meta.jsonl      a sealed segment: raw rows + one JSON line per row
+    active-<pid>-<n>.vec / ...      the segment a process is appending to
+    corrections.jsonl               user label corrections, newest line wins
+    deletions.jsonl                 per-user deletions: rows up to "at" are gone
+
+Vectors are L2-normalised, so cosine similarity is a dot product. Rows are
+stored as int8 with a per-row float32 scale (default) or as float16. Sealed
+segments are memory-mapped read-only and searched in cache-sized blocks of
+block_rows, converted into one reused float32 buffer before a BLAS matvec.
+int8 is 2x smaller than float16 and several times faster to convert on CPUs
+where numpy has no hardware half-float path.
+Each process appends to its own active segment and seals it after
+seal_interval seconds or segment_rows rows, whichever comes first, so other
+processes see a new row within seal_interval. Sealing, compaction and
+deletion rewrite manifest.json under an exclusive file lock, so several
+gunicorn workers can share one directory.
+"""
+import fcntl
+import json
+import os
+import threading
+import time
+import uuid
+from contextlib import contextmanager
+
+import numpy as np
+
+DTYPES = ('int8', 'float16')
+# Rows per read/write when compaction copies segments
+COPY_ROWS = 65536
+
+class Segment:
+    """Vectors plus per-row metadata for one segment"""
+
+    FIELDS = ('vectors', 'ids', 'user_ids', 'labels', 'created_at', 'corrected')
+
+    def __init__(self, name, vectors, ids, user_ids, labels, created_at, corrected):
+        self.name = name
+        self.vectors = vectors
+        self.ids = ids
+        self.user_ids = user_ids
+        self.labels = labels
+        self.created_at = created_at
+        # Labels that came from a user correction folded in by compaction
+        self.corrected = corrected
+
+    def head(self, n):
+        """The first n rows as a segment view"""
+        return Segment(self.name, *(getattr(self, field)[:n] for field in self.FIELDS))
+
+    def __len__(self):
+        return len(self.ids)
+
+class EmbeddingStore:
+
+    def __init__(self, directory, dtype='int8', segment_rows=65536, max_segments=8, block_rows=256,
+                 seal_interval=2.0):
+        self.directory = directory
+        self.segment_rows = segment_rows
+        self.seal_interval = seal_interval
+        self.max_segments = max(2, max_segments)
+        self.block_rows = block_rows
+        self.lock = threading.RLock()
+        self.local = threading.local()
+        os.makedirs(directory, exist_ok=True)
+
+        self.dim = None
+        self.dtype = dtype
+        config_path = self._path('store.json')
+        if os.path.exists(config_path):
+            with open(config_path) as f:
+                config = json.load(f)
+            self.dim, self.dtype = config['dim'], config['dtype']
+        if self.dtype not in DTYPES:
+            raise ValueError(f"Unsupported embedding dtype: {self.dtype}")
+
+        self.segments = {}
+        self.manifest_version = None
+        self.corrections = {}
+        self.corrections_log = {'inode': None, 'offset': 0, 'lines': 0}
+        self.deleted = {}
+        self.deletions_log = {'inode': None, 'offset': 0, 'lines': 0}
+        self.active = None
+        self.active_files = None
+        self.active_count = 0
+        self.active_serial = 0
+        self.compacting = False
+
+        self._seal_orphans()
+        self.refresh()
+
+    # -- files -----------------------------------------------------------
+
+    def _path(self, name):
+        return os.path.join(self.directory, name)
+
+    @contextmanager
+    def _file_lock(self, name='.lock'):
+        """
+        Exclusive lock across processes for manifest changes.
+
+        Never take self.lock while holding it: threads of one process take
+        self.lock first, then the file lock.
+        """
+        with open(self._path(name), 'w') as lock_file:
+            fcntl.flock(lock_file, fcntl.LOCK_EX)
+            try:
+                yield
+            finally:
+                fcntl.flock(lock_file, fcntl.LOCK_UN)
+
+    def _read_manifest(self):
+        try:
+            with open(self._path('manifest.json')) as f:
+                return json.load(f)['segments']
+        except FileNotFoundError:
+            return []
+
+    def _write_manifest(self, names):
+        tmp_path = self._path('manifest.json.tmp')
+        with open(tmp_path, 'w') as f:
+            json.dump({'segments': names}, f)
+            f.flush()
+            os.fsync(f.fileno())
+        os.replace(tmp_path, self._path('manifest.json'))
+
+    def _ensure_config(self, dim):
+        if self.dim is None:
+            with self._file_lock():
+                config_path = self._path('store.json')
+                if os.path.exists(config_path):
+                    with open(config_path) as f:
+                        self.dim = json.load(f)['dim']
+                else:
+                    with open(config_path, 'w') as f:
+                        json.dump({'dim': dim, 'dtype': self.dtype}, f)
+                    self.dim = dim
+        if dim != self.dim:
+            raise ValueError(f"Embedding has {dim} dimensions, store expects {self.dim}")
+
+    @property
+    def row_dtype(self):
+        """On-disk record: int8 values plus their scale, or plain float16 values"""
+        if self.dtype == 'int8':
+            return np.dtype([('scale', '<f4'), ('v', 'i1', (self.dim,))])
+        return np.dtype([('v', '<f2', (self.dim,))])
+
+    @property
+    def row_bytes(self):
+        return self.row_dtype.itemsize
+
+    def _encode(self, vectors):
+        vectors = np.atleast_2d(np.asarray(vectors, dtype=np.float32))
+        norms = np.linalg.norm(vectors, axis=-1, keepdims=True)
+        vectors = vectors / np.maximum(norms, 1e-12)
+        rows = np.empty(len(vectors), dtype=self.row_dtype)
+        if self.dtype == 'int8':
+            # Per-row scale: transformer embeddings have a few large components,
+            # so a fixed scale would waste most of the 8 bits
+            scale = np.maximum(np.abs(vectors).max(axis=-1), 1e-12) / 127.0
+            rows['scale'] = scale
+            rows['v'] = np.rint(vectors / scale[:, None])
+        else:
+            rows['v'] = vectors
+        return rows
+
+    def _decode(self, rows):
+        vectors = rows['v'].astype(np.float32)
+        if self.dtype == 'int8':
+            vectors *= rows['scale'][:, None]
+        return vectors
+
+    def _scores(self, rows, query):
+        """Dot products of query with a block of rows, via a reused float32 buffer"""
+        buffer = getattr(self.local, 'buffer', None)
+        if buffer is None or buffer.shape != (self.block_rows, self.dim):
+            buffer = self.local.buffer = np.empty((self.block_rows, self.dim), dtype=np.float32)
+        work = buffer[:len(rows)]
+        np.copyto(work, rows['v'], casting='unsafe')
+        scores = work @ query
+        if self.dtype == 'int8':
+            scores *= rows['scale']
+        return scores
+
+    def _load_segment(self, name):
+        rows = []
+        with open(self._path(f"{name}.meta.jsonl")) as f:
+            for line in f:
+                try:
+                    rows.append(json.loads(line))
+                except ValueError:
+                    break  # torn last line after a crash
+        count = min(len(rows), os.path.getsize(self._path(f"{name}.vec")) // self.row_bytes) if self.dim else 0
+        rows = rows[:count]
+        if count:
+            vectors = np.memmap(self._path(f"{name}.vec"), dtype=self.row_dtype, mode='r', shape=(count,))
+        else:
+            vectors = np.empty(0, dtype=self.row_dtype) if self.dim else None
+        return Segment(
+            name,
+            vectors,
+            np.array([row['id'] for row in rows], dtype='S32'),
+            np.array([row['user_id'] if row['user_id'] is not None else -1 for row in rows], dtype=np.int64),
+            np.array([row['label'] for row in rows], dtype=object),
+            np.array([row['created_at'] for row in rows], dtype=np.float64),
+            np.array([row.get('corrected', False) for row in rows], dtype=bool),
+        )
+
+    def _write_segment(self, parts):
+        """Write the given (segment, row indexes) parts as a new sealed segment; returns its name"""
+        name = f"seg-{time.time_ns()}-{uuid.uuid4().hex[:6]}"
+        with open(self._path(f"{name}.vec.tmp"), 'wb') as vec_file, \
+                open(self._path(f"{name}.meta.jsonl.tmp"), 'w') as meta_file:
+            for segment, indexes in parts:
+                for start in range(0, len(indexes), COPY_ROWS):
+                    chunk = indexes[start:start + COPY_ROWS]
+                    vec_file.write(np.ascontiguousarray(segment.vectors[chunk]).tobytes())
+                for index in indexes:
+                    row = self._row(segment, index)
+                    meta_file.write(json.dumps({'id': row['embedding_id'], 'user_id': row['user_id'],
+                                                'label': row['label'], 'created_at': row['created_at'],
+                                                'corrected': row['corrected']},
+                                               ensure_ascii=False) + '\n')
+            vec_file.flush()
+            os.fsync(vec_file.fileno())
+            meta_file.flush()
+            os.fsync(meta_file.fileno())
+        os.replace(self._path(f"{name}.meta.jsonl.tmp"), self._path(f"{name}.meta.jsonl"))
+        os.replace(self._path(f"{name}.vec.tmp"), self._path(f"{name}.vec"))
+        return name
+
+    def _remove_segment_files(self, name):
+        # Other processes may still have the old files mapped; unlinking is safe
+        for suffix in ('.vec', '.meta.jsonl'):
+            try:
+                os.remove(self._path(name + suffix))
+            except OSError:
+                pass
+
+    def _seal_orphans(self):
+        """Seal active segments left behind by processes that are gone"""
+        with self._file_lock():
+            self._read_deletions()
+            names = self._read_manifest()
+            changed = False
+            for filename in sorted(os.listdir(self.directory)):
+                if not (filename.startswith('active-') and filename.endswith('.vec')):
+                    continue
+                pid = int(filename.split('-')[1])
+                if pid != os.getpid() and _pid_alive(pid):
+                    continue
+                active_name = filename[:-len('.vec')]
+                name = self._seal_files(active_name, self._load_segment(active_name))
+                if name:
+                    names.append(name)
+                changed = True
+            if changed:
+                self._write_manifest(names)
+
+    def _seal_files(self, active_name, segment):
+        """
+        Turn an active segment's files into a sealed segment; returns its name.
+
+        Rows of deleted users are dropped on the way, so nothing a deletion
+        covered survives into a sealed segment. Returns None if no row is left.
+        """
+        deleted = self._deleted_mask(segment)
+        if deleted.any():
+            keep = np.flatnonzero(~deleted)
+            name = self._write_segment([(segment, keep)]) if len(keep) else None
+            self._remove_segment_files(active_name)
+            return name
+        name = f"seg-{time.time_ns()}-{uuid.uuid4().hex[:6]}"
+        os.replace(self._path(f"{active_name}.meta.jsonl"), self._path(f"{name}.meta.jsonl"))
+        os.replace(self._path(f"{active_name}.vec"), self._path(f"{name}.vec"))
+        return name
+
+    # -- reading ---------------------------------------------------------
+
+    def refresh(self):
+        """Pick up segments sealed, compacted or rewritten by other processes, corrections and deletions"""
+        try:
+            # A rewrite is an os.replace, so the inode changes even within one mtime tick
+            stat = os.stat(self._path('manifest.json'))
+            version = (stat.st_ino, stat.st_mtime_ns)
+        except FileNotFoundError:
+            version = None
+        with self.lock:
+            if version != self.manifest_version:
+                names = self._read_manifest()
+                self.segments = {name: self.segments[name] if name in self.segments else self._load_segment(name)
+                                 for name in names}
+                self.manifest_version = version
+            self._read_corrections()
+            self._read_deletions()
+            if self.deleted and self.active_count and self._deleted_mask(self._active_view()).any():
+                # Another process deleted a user with rows in our active segment;
+                # sealing drops them
+                self._seal_active()
+
+    def _read_log(self, name, state):
+        """
+        (rewritten, new records) from an append-only JSONL log.
+
+        Only complete lines are consumed. A log compacted by another process
+        is replaced with os.replace, so a new inode means read it again from
+        the start.
+        """
+        try:
+            stat = os.stat(self._path(name))
+        except FileNotFoundError:
+            return False, []
+        rewritten = stat.st_ino != state['inode']
+        if rewritten:
+            state.update(inode=stat.st_ino, offset=0, lines=0)
+        if stat.st_size <= state['offset']:
+            return rewritten, []
+        records = []
+        with open(self._path(name), 'rb') as f:
+            f.seek(state['offset'])
+            for line in f:
+                if not line.endswith(b'\n'):
+                    break
+                records.append(json.loads(line))
+                state['offset'] += len(line)
+                state['lines'] += 1
+        return rewritten, records
+
+    def _read_corrections(self):
+        rewritten, records = self._read_log('corrections.jsonl', self.corrections_log)
+        # Searches read the dict without the lock, so a re-read builds a new one
+        corrections = {} if rewritten else self.corrections
+        for correction in records:
+            corrections[correction['id']] = correction['label']
+        self.corrections = corrections
+
+    def _read_deletions(self):
+        _, records = self._read_log('deletions.jsonl', self.deletions_log)
+        for deletion in records:
+            self.deleted[deletion['user_id']] = max(deletion['at'], self.deleted.get(deletion['user_id'], 0))
+
+    def _deleted_mask(self, segment):
+        """Rows of a segment that a user deletion covers"""
+        deleted = list(self.deleted.items())
+        if not deleted or not len(segment):
+            return np.zeros(len(segment), dtype=bool)
+        users = np.array([user_id for user_id, _ in deleted], dtype=np.int64)
+        ats = np.array([at for _, at in deleted], dtype=np.float64)
+        order = np.argsort(users)
+        users, ats = users[order], ats[order]
+        position = np.searchsorted(users, segment.user_ids).clip(max=len(users) - 1)
+        return (users[position] == segment.user_ids) & (segment.created_at <= ats[position])
+
+    def _active_view(self):
+        return self.active.head(self.active_count)
+
+    def _snapshot(self):
+        with self.lock:
+            segments = list(self.segments.values())
+            if self.active_count:
+                segments.append(self._active_view())
+            return segments
+
+    def _row(self, segment, index, similarity=None):
+        embedding_id = segment.ids[index].decode()
+        user_id = int(segment.user_ids[index])
+        row = {
+            'embedding_id': embedding_id,
+            'user_id': user_id if user_id >= 0 else None,
+            'label': self.corrections.get(embedding_id, segment.labels[index]),
+            'corrected': embedding_id in self.corrections or bool(segment.corrected[index]),
+            'created_at': float(segment.created_at[index]),
+        }
+        if similarity is not None:
+            # Quantisation can push an exact match a hair above 1
+            row['similarity'] = round(min(float(similarity), 1.0), 4)
+        return row
+
+    def get(self, embedding_id):
+        """(metadata, float32 vector) for an embedding id, or None"""
+        self.refresh()
+        key = embedding_id.encode()
+        for segment in self._snapshot():
+            matches = np.flatnonzero(segment.ids == key)
+            if len(matches):
+                index = matches[0]
+                return self._row(segment, index), self._decode(segment.vectors[index:index + 1])[0]
+        return None
+
+    def search(self, vector, k=5, user_id=None, exclude_id=None):
+        """
+        The k most similar stored embeddings, best first.
+
+        user_id restricts the search to that user's rows, which are gathered
+        first so a per-user query only touches that user's vectors.
+        """
+        if self.dim is None:
+            return []
+        self.refresh()
+        query = np.asarray(vector, dtype=np.float32)
+        query = query / max(float(np.linalg.norm(query)), 1e-12)
+        wanted = k + (1 if exclude_id else 0)
+
+        candidates = []
+        for segment in self._snapshot():
+            rows = np.flatnonzero(segment.user_ids == user_id) if user_id is not None else None
+            total = len(segment) if rows is None else len(rows)
+            for start in range(0, total, self.block_rows):
+                if rows is None:
+                    block = segment.vectors[start:start + self.block_rows]
+                else:
+                    block = segment.vectors[rows[start:start + self.block_rows]]
+                scores = self._scores(block, query)
+                take = min(wanted, len(scores))
+                top = np.argpartition(-scores, take - 1)[:take]
+                for i in top:
+                    index = start + i if rows is None else rows[start + i]
+                    candidates.append((scores[i], segment, index))
+
+        candidates.sort(key=lambda candidate: candidate[0], reverse=True)
+        results = []
+        for score, segment, index in candidates:
+            row = self._row(segment, index, score)
+            if row['embedding_id'] == exclude_id:
+                continue
+            results.append(row)
+            if len(results) == k:
+                break
+        return results
+
+    # -- writing ---------------------------------------------------------
+
+    def add(self, vector, user_id=None, label=None):
+        """Append one embedding to this process's active segment, returning its id"""
+        self._ensure_config(np.shape(vector)[-1])
+        encoded = self._encode(vector)
+        embedding_id = uuid.uuid4().hex
+        created_at = time.time()
+
+        with self.lock:
+            if self.active is None:
+                self._open_active()
+                if self.seal_interval:
+                    timer = threading.Timer(self.seal_interval, self._seal_after_interval, args=(self.active.name,))
+                    timer.daemon = True
+                    timer.start()
+            vec_file, meta_file = self.active_files
+            n = self.active_count
+            vec_file.write(encoded.tobytes())
+            meta_file.write(json.dumps({'id': embedding_id, 'user_id': user_id, 'label': label,
+                                        'created_at': created_at}, ensure_ascii=False) + '\n')
+            vec_file.flush()
+            meta_file.flush()
+
+            if n == len(self.active):
+                self._grow_active()
+            active = self.active
+            active.vectors[n] = encoded[0]
+            active.ids[n] = embedding_id
+            active.user_ids[n] = user_id if user_id is not None else -1
+            active.labels[n] = label
+            active.created_at[n] = created_at
+            active.corrected[n] = False
+            self.active_count = n + 1
+
+            sealed_count = self._seal_active() if self.active_count >= self.segment_rows else 0
+        if sealed_count > self.max_segments:
+            self._compact_in_background()
+        return embedding_id
+
+    def _seal_after_interval(self, name):
+        """Timer callback: publish the active segment to other processes"""
+        with self.lock:
+            if self.active is None or self.active.name != name or not self.active_count:
+                return
+            sealed_count = self._seal_active()
+        if sealed_count > self.max_segments:
+            self._compact_in_background()
+
+    def add_many(self, vectors, user_ids=None, labels=None):
+        """Write a batch straight into a new sealed segment (bulk loads)"""
+        self._ensure_config(np.shape(vectors)[-1])
+        encoded = self._encode(vectors)
+        count = len(encoded)
+        user_ids = user_ids if user_ids is not None else [None] * count
+        labels = labels if labels is not None else [None] * count
+        now = time.time()
+
+        name = f"seg-{time.time_ns()}-{uuid.uuid4().hex[:6]}"
+        with open(self._path(f"{name}.vec"), 'wb') as f:
+            f.write(encoded.tobytes())
+        ids = [uuid.uuid4().hex for _ in range(count)]
+        with open(self._path(f"{name}.meta.jsonl"), 'w') as f:
+            for embedding_id, user_id, label in zip(ids, user_ids, labels):
+                f.write(json.dumps({'id': embedding_id, 'user_id': None if user_id is None else int(user_id),
+                                    'label': label, 'created_at': now}, ensure_ascii=False) + '\n')
+        with self._file_lock():
+            self._write_manifest(self._read_manifest() + [name])
+        self.refresh()
+        return ids
+
+    def _open_active(self):
+        self.active_serial += 1
+        name = f"active-{os.getpid()}-{self.active_serial}"
+        self.active_files = (open(self._path(f"{name}.vec"), 'ab'),
+                             open(self._path(f"{name}.meta.jsonl"), 'a'))
+        self.active = Segment(name, np.empty(0, dtype=self.row_dtype), np.empty(0, dtype='S32'),
+                              np.empty(0, dtype=np.int64), np.empty(0, dtype=object), np.empty(0, dtype=np.float64),
+                              np.empty(0, dtype=bool))
+        self.active_count = 0
+
+    def _grow_active(self):
+        """Double the in-memory copy of the active segment (capped at segment_rows)"""
+        active = self.active
+        capacity = min(self.segment_rows, max(1024, 2 * len(active)))
+        for field in Segment.FIELDS:
+            old = getattr(active, field)
+            new = np.empty((capacity,) + old.shape[1:], dtype=old.dtype)
+            new[:len(old)] = old
+            setattr(active, field, new)
+
+    def _seal_active(self):
+        for f in self.active_files:
+            f.close()
+        with self._file_lock():
+            self._read_deletions()
+            name = self._seal_files(self.active.name, self._active_view())
+            names = self._read_manifest() + ([name] if name else [])
+            self._write_manifest(names)
+        self.active = None
+        self.active_files = None
+        self.active_count = 0
+        self.refresh()
+        return len(names)
+
+    def _compact_in_background(self):
+        with self.lock:
+            if self.compacting:
+                return
+            self.compacting = True
+
+        def run():
+            try:
+                self.compact()
+            except Exception as e:
+                print(f"❌ Embedding compaction failed: {e}")
+            finally:
+                self.compacting = False
+
+        threading.Thread(target=run, name='embedding-compaction', daemon=True).start()
+
+    def correct(self, embedding_id, label, user_id=None):
+        """Record a user's label for an embedding; later searches report it"""
+        with self.lock, self._file_lock():
+            with open(self._path('corrections.jsonl'), 'a') as f:
+                f.write(json.dumps({'id': embedding_id, 'user_id': user_id, 'label': label, 'at': time.time()},
+                                   ensure_ascii=False) + '\n')
+            # Repeated corrections of the same rows only grow the log
+            if self.corrections_log['lines'] > max(1000, 2 * len(self.corrections)):
+                self._compact_corrections()
+            self._read_corrections()
+
+    def _compact_corrections(self, folded=None, dropped=()):
+        """
+        Rewrite corrections.jsonl with the newest line per embedding only.
+
+        Also drops corrections of deleted users or of the dropped ids, and
+        those in folded ({id: label}) whose newest label a sealed segment
+        already carries. Caller holds the file lock; every process (this
+        one included) re-reads the log when it sees the new inode.
+        """
+        deletions = {}
+        for deletion in self._read_log('deletions.jsonl', {'inode': None, 'offset': 0, 'lines': 0})[1]:
+            deletions[deletion['user_id']] = max(deletion['at'], deletions.get(deletion['user_id'], 0))
+        _, records = self._read_log('corrections.jsonl', {'inode': None, 'offset': 0, 'lines': 0})
+        latest = {}
+        for correction in records:
+            latest[correction['id']] = correction
+        latest = {embedding_id: correction for embedding_id, correction in latest.items()
+                  if embedding_id not in dropped
+                  and correction['at'] > deletions.get(correction.get('user_id'), -1)
+                  and (folded or {}).get(embedding_id) != correction['label']}
+
+        tmp_path = self._path('corrections.jsonl.tmp')
+        with open(tmp_path, 'w') as f:
+            for correction in latest.values():
+                f.write(json.dumps(correction, ensure_ascii=False) + '\n')
+            f.flush()
+            os.fsync(f.fileno())
+        os.replace(tmp_path, self._path('corrections.jsonl'))
+        return len(records) - len(latest)
+
+    def delete_user(self, user_id):
+        """
+        Remove every stored embedding and label correction of a user.
+
+        Sealed segments holding the user's rows are rewritten without them
+        right away. A line in deletions.jsonl makes every process drop the
+        user's rows from its active segment on its next refresh or seal.
+        Returns the number of rows removed from sealed segments.
+        """
+        with self.lock:
+            if self.active_count:
+                self._seal_active()
+            with self._file_lock():
+                with open(self._path('deletions.jsonl'), 'a') as f:
+                    f.write(json.dumps({'user_id': user_id, 'at': time.time()}) + '\n')
+                self._read_deletions()
+
+                names = self._read_manifest()
+                replaced = {}
+                dropped = set()
+                for name in names:
+                    segment = self.segments.get(name) or self._load_segment(name)
+                    deleted = self._deleted_mask(segment)
+                    if not deleted.any():
+                        continue
+                    dropped.update(embedding_id.decode() for embedding_id in segment.ids[deleted])
+                    keep = np.flatnonzero(~deleted)
+                    replaced[name] = self._write_segment([(segment, keep)]) if len(keep) else None
+                if replaced:
+                    self._write_manifest([replaced.get(name, name) for name in names
+                                          if replaced.get(name, name)])
+                self._compact_corrections(dropped=dropped)
+
+        for old in replaced:
+            self._remove_segment_files(old)
+        self.refresh()
+        return len(dropped)
+
+    def user_rows(self, user_id):
+        """A user's stored rows with their vectors, oldest first (data export)"""
+        self.refresh()
+        rows = []
+        for segment in self._snapshot():
+            for index in np.flatnonzero(segment.user_ids == user_id):
+                row = self._row(segment, index)
+                row['model_label'] = segment.labels[index] if not segment.corrected[index] else None
+                row['embedding'] = self._decode(segment.vectors[index:index + 1])[0]
+                rows.append(row)
+        rows.sort(key=lambda row: (row['created_at'], row['embedding_id']))
+        return rows
+
+    def compact(self):
+        """
+        Merge the smallest sealed segments into one, folding in label corrections.
+
+        Leaves at most max_segments // 2 + 1 segments. Returns the number of
+        segments merged (0 if there was nothing to do). The merged segment is
+        written under a separate compaction lock, so sealing and searches in
+        other processes are not held up while it is copied.
+        """
+        with self._file_lock('.compact.lock'):
+            self.refresh()
+            loaded = self.segments
+            merge_count = len(loaded) - self.max_segments // 2
+            if merge_count < 2:
+                return 0
+            sources = sorted(loaded.values(), key=len)[:merge_count]
+
+            parts = [(segment, np.flatnonzero(~self._deleted_mask(segment))) for segment in sources]
+            name = self._write_segment(parts)
+            merged = {segment.name for segment in sources}
+            corrections = self.corrections
+            folded = {}
+            for segment, indexes in parts:
+                for index in indexes:
+                    embedding_id = segment.ids[index].decode()
+                    if embedding_id in corrections:
+                        folded[embedding_id] = corrections[embedding_id]
+
+            with self._file_lock():
+                names = self._read_manifest()
+                if not merged <= set(names):
+                    # A user deletion rewrote a source meanwhile; the next run retries
+                    self._remove_segment_files(name)
+                    return 0
+                self._write_manifest([n for n in names if n not in merged] + [name])
+                if folded:
+                    self._compact_corrections(folded)
+
+        for old in merged:
+            self._remove_segment_files(old)
+        self.refresh()
+        print(f"🗜️ Compacted {len(merged)} embedding segments into {name}")
+        return len(merged)
+
+    def stats(self):
+        segments = self._snapshot()
+        return {
+            'dim': self.dim,
+            'dtype': self.dtype,
+            'vectors': sum(len(segment) for segment in segments),
+            'sealed_segments': len(self.segments),
+            'active_rows': self.active_count,
+            'corrections': len(self.corrections),
+            'deleted_users': len(self.deleted),
+            'bytes': sum(len(segment) for segment in segments) * self.row_bytes if self.dim else 0,
+        }
+
+def _pid_alive(pid):
+    try:
+        os.kill(pid, 0)
+    except ProcessLookupError:
+        return False
+    except PermissionError:
+        return True
+    return True
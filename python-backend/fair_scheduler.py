@@ -0,0 +1,104 @@
+import threading
+import time
+from collections import deque
+from contextlib import contextmanager
+
+class SchedulerTimeout(Exception):
+    """Raised when a caller waited longer than its timeout for a model slot"""
+
+class FairScheduler:
+    """
+    Hands out model slots round-robin across identities instead of FIFO.
+
+    Each identity has its own FIFO of waiters; when a slot frees up it goes
+    to the next identity in the rotation, so a user with 50 queued images
+    gets every Nth slot rather than the next 50.
+    """
+
+    def __init__(self, slots=1):
+        self.slots = max(1, slots)
+        self.free = self.slots
+        self.lock = threading.Lock()
+        self.queues = {}
+        self.rotation = deque()
+        self.granted = 0
+        self.queued = 0
+        self.timeouts = 0
+        self.max_wait_ms = 0.0
+        self.total_wait_ms = 0.0
+
+    def acquire(self, identity, timeout=None):
+        """Wait for a slot; returns the seconds spent waiting"""
+        started = time.time()
+        with self.lock:
+            if self.free > 0 and not self.rotation:
+                self.free -= 1
+                self.granted += 1
+                return 0.0
+            ticket = threading.Event()
+            if identity not in self.queues:
+                self.queues[identity] = deque()
+                self.rotation.append(identity)
+            self.queues[identity].append(ticket)
+            self.queued += 1
+
+        if not ticket.wait(timeout):
+            with self.lock:
+                # The slot may have been handed over just as we timed out
+                if not ticket.is_set():
+                    self._remove(identity, ticket)
+                    self.timeouts += 1
+                    raise SchedulerTimeout(f"No model slot within {timeout:g}s")
+
+        waited = time.time() - started
+        with self.lock:
+            self.total_wait_ms += waited * 1000
+            self.max_wait_ms = max(self.max_wait_ms, waited * 1000)
+        return waited
+
+    def release(self):
+        with self.lock:
+            if not self.rotation:
+                self.free = min(self.slots, self.free + 1)
+                return
+            identity = self.rotation.popleft()
+            queue = self.queues[identity]
+            ticket = queue.popleft()
+            if queue:
+                self.rotation.append(identity)
+            else:
+                del self.queues[identity]
+            self.granted += 1
+            ticket.set()
+
+    def _remove(self, identity, ticket):
+        queue = self.queues.get(identity)
+        if queue is None:
+            return
+        queue.remove(ticket)
+        if not queue:
+            del self.queues[identity]
+            self.rotation.remove(identity)
+
+    @contextmanager
+    def slot(self, identity, timeout=None):
+        self.acquire(identity, timeout)
+        try:
+            yield
+        finally:
+            self.release()
+
+    def stats(self):
+        with self.lock:
+            waiting = {identity: len(queue) for identity, queue in self.queues.items()}
+            return {
+                'slots': self.slots,
+                'free': self.free,
+                'waiting': sum(waiting.values()),
+                'waiting_identities': len(waiting),
+                'granted': self.granted,
+                'queued': self.queued,
+                'timeouts': self.timeouts,
+                'avg_wait_ms': round(self.total_wait_ms / self.queued, 2) if self.queued else 0,
+                'max_wait_ms': round(self.max_wait_ms, 2),
+            }
@@ -2,7 +2,9 @@ from PIL import Image
 import numpy as np
 import requests
 from io import BytesIO
+import os
 import random
+import threading
 
 # Try to import transformers for real AI model
 try:
@@ -14,11 +16,23 @@ except ImportError:
     TRANSFORMERS_AVAILABLE = False
     print("⚠️ Transformers not available, using fallback mode")
 
+# Fast OpenCV/numpy preprocessing instead of the generic HF image processor.
+# Off by default: its cv2 resize is not bit-identical to HF's PIL resize, so
+# check benchmarks/preprocessing_benchmark.py agreement before enabling it
+FAST_PREPROCESSING = os.getenv('FAST_PREPROCESSING', 'False').lower() == 'true'
+try:
+    from preprocessing import FastImagePreprocessor
+except ImportError:
+    FastImagePreprocessor = None
+
 class FoodRecognitionModel:
     def __init__(self):
         self.model_name = "nateraw/food"  # Food classification model
         self.feature_extractor = None
+        self.preprocessor = None
         self.model = None
+        # Classifier input of the last forward pass on each thread
+        self.embedding_local = threading.local()
         self.food_nutrition_db = {
             # Common foods with nutrition info (per 100g)
             'pizza': {'calories': 266, 'protein': 11, 'carbs': 33, 'fat': 10},
@@ -93,6 +107,18 @@ class FoodRecognitionModel:
             # Set to evaluation mode
             self.model.eval()
             
+            # Keep the penultimate embedding (what the classifier head sees)
+            classifier = getattr(self.model, 'classifier', None)
+            if classifier is not None:
+                classifier.register_forward_hook(self._capture_embedding)
+            
+            if FAST_PREPROCESSING and FastImagePreprocessor is not None:
+                self.preprocessor = FastImagePreprocessor.from_hf_processor(self.feature_extractor)
+                if self.preprocessor is not None:
+                    print("⚡ Fast preprocessing enabled")
+                else:
+                    print("⚠️ Fast preprocessing does not support this processor config, using HF")
+            
             print("✅ AI food recognition model loaded successfully!")
             print(f"📊 Model can recognize {len(self.model.config.id2label)} food categories")
             
@@ -101,9 +127,29 @@ class FoodRecognitionModel:
             print("⚠️ Using smart fallback mode instead")
             self.model = None
             self.feature_extractor = None
+            self.preprocessor = None
     
-    def predict_food(self, image):
-        """Predict food class from image"""
+    def is_model_loaded(self):
+        return self.model is not None and self.feature_extractor is not None
+    
+    def preprocess(self, images):
+        """Turn RGB images (PIL or uint8 arrays) into model pixel_values"""
+        if self.preprocessor is not None:
+            return self.preprocessor(images)
+        return self.feature_extractor(images=images, return_tensors="pt")['pixel_values']
+    
+    def predict_food(self, image, tier='ai'):
+        """Predict food class from image (PIL image or RGB uint8 array)
+        
+        tier selects the cheapest acceptable path: 'ai', 'smart_fallback'
+        or 'simple_fallback'. The returned dict's 'tier' says which one
+        actually served the prediction.
+        """
+        if tier == 'simple_fallback':
+            return self.simple_fallback_prediction()
+        if tier == 'smart_fallback':
+            return self.smart_fallback_prediction(image)
+        
         # Use fallback if model is not loaded
         if self.model is None or self.feature_extractor is None:
             print("⚠️ Using smart fallback (model not loaded)")
@@ -112,19 +158,53 @@ class FoodRecognitionModel:
         try:
             print("🤖 Using AI model for prediction...")
             
-            # Preprocess image
-            inputs = self.feature_extractor(images=image, return_tensors="pt")
+            prediction = self._predict_batch([image])[0]
+            top_predictions = prediction['top_predictions']
             
-            # Make prediction
-            with torch.no_grad():
-                outputs = self.model(**inputs)
-                predictions = torch.nn.functional.softmax(outputs.logits, dim=-1)
+            print(f"✅ AI Prediction: {prediction['food_name']} ({prediction['confidence']:.2%})")
+            top_3_str = ', '.join([f"{p['name']} ({p['confidence']:.1%})" for p in top_predictions])
+            print(f"   Top 3: {top_3_str}")
             
-            # Get top 3 predictions
-            top_k = torch.topk(predictions, k=3)
-            top_confidences = top_k.values[0].tolist()
-            top_indices = top_k.indices[0].tolist()
+            return prediction
             
+        except Exception as e:
+            print(f"❌ AI Prediction error: {e}")
+            return self.smart_fallback_prediction(image)
+    
+    def predict_food_batch(self, images):
+        """Predict food classes for several images in one forward pass"""
+        if not images:
+            return []
+        if not self.is_model_loaded():
+            return [self.smart_fallback_prediction(image) for image in images]
+        
+        try:
+            return self._predict_batch(images)
+        except Exception as e:
+            print(f"❌ AI batch prediction error: {e}")
+            return [self.smart_fallback_prediction(image) for image in images]
+    
+    def _capture_embedding(self, module, inputs, output):
+        self.embedding_local.value = inputs[0]
+    
+    def _predict_batch(self, images):
+        # Preprocess images
+        pixel_values = self.preprocess(images)
+        
+        # Make prediction
+        self.embedding_local.value = None
+        with torch.no_grad():
+            outputs = self.model(pixel_values=pixel_values)
+            predictions = torch.nn.functional.softmax(outputs.logits, dim=-1)
+            embeddings = self.embedding_local.value
+            if embeddings is not None:
+                # L2-normalised so cosine similarity is a dot product
+                embeddings = torch.nn.functional.normalize(embeddings.float(), dim=-1).numpy()
+        
+        # Get top 3 predictions per image
+        top_k = torch.topk(predictions, k=3)
+        results = []
+        for i, (top_confidences, top_indices) in enumerate(zip(top_k.values.tolist(), top_k.indices.tolist())):
             # Get class names
             top_predictions = []
             for idx, conf in zip(top_indices, top_confidences):
@@ -132,23 +212,16 @@ class FoodRecognitionModel:
                 top_predictions.append({'name': class_name, 'confidence': conf})
             
             # Use top prediction
-            predicted_class = top_predictions[0]['name']
             confidence = top_predictions[0]['confidence']
-            
-            print(f"✅ AI Prediction: {predicted_class} ({confidence:.2%})")
-            top_3_str = ', '.join([f"{p['name']} ({p['confidence']:.1%})" for p in top_predictions])
-            print(f"   Top 3: {top_3_str}")
-            
-            return {
-                'food_name': predicted_class,
+            results.append({
+                'food_name': top_predictions[0]['name'],
                 'confidence': confidence,
                 'is_food': confidence > 0.2,  # Lower threshold for AI model
-                'top_predictions': top_predictions
-            }
-            
-        except Exception as e:
-            print(f"❌ AI Prediction error: {e}")
-            return self.smart_fallback_prediction(image)
+                'top_predictions': top_predictions,
+                'embedding': embeddings[i] if embeddings is not None else None,
+                'tier': 'ai'
+            })
+        return results
     
     def smart_fallback_prediction(self, image):
         """Smart fallback using color analysis"""
@@ -195,21 +268,20 @@ class FoodRecognitionModel:
             return {
                 'food_name': food,
                 'confidence': confidence,
-                'is_food': True
+                'is_food': True,
+                'tier': 'smart_fallback'
             }
         except Exception as e:
             print(f"Smart fallback error: {e}")
             return self.simple_fallback_prediction()
     
     def simple_fallback_prediction(self):
-        """Simple fallback when everything fails"""
-        import random
-        foods = list(self.food_nutrition_db.keys())
-        food = random.choice(foods)
+        """Explicit "not analysed" result when no model or heuristic could run in time"""
         return {
-            'food_name': food,
-            'confidence': 0.75,
-            'is_food': True
+            'food_name': 'unknown',
+            'confidence': 0.0,
+            'is_food': False,
+            'tier': 'simple_fallback'
         }
     
     def get_nutrition_info(self, food_name, confidence=1.0):
@@ -0,0 +1,42 @@
+# Gunicorn settings for the Caloria Python backend
+#
+#   gunicorn app:app            # picks up this file from the working directory
+#
+# With GUNICORN_PRELOAD=True (default) the master imports app.py and loads the
+# food model once before forking, so workers share the weights copy-on-write.
+# With GUNICORN_PRELOAD=False every worker loads its own copy after fork.
+import os
+import time
+
+from thread_planner import plan_threads, apply_env
+
+bind = os.getenv('GUNICORN_BIND', f"{os.getenv('HOST', '0.0.0.0')}:{os.getenv('PORT', 5001)}")
+workers = int(os.getenv('GUNICORN_WORKERS', 4))
+threads = int(os.getenv('GUNICORN_THREADS', 1))
+timeout = int(os.getenv('GUNICORN_TIMEOUT', 120))
+preload_app = os.getenv('GUNICORN_PRELOAD', 'True').lower() == 'true'
+
+# Split the usable cores (affinity + cgroup quota) between the workers and
+# export BLAS/OMP limits now, before the master imports numpy/torch/cv2
+thread_plan = plan_threads(workers, threads, int(os.getenv('ANALYZE_WORKERS', 2)),
+                           int(os.getenv('TORCH_NUM_THREADS', 0)) or None)
+apply_env(thread_plan)
+
+boot_started = time.time()
+
+def on_starting(server):
+    print(f"🧵 Thread plan: {thread_plan}", flush=True)
+    if preload_app:
+        from preload import preload_model
+        preload_model()
+
+def post_fork(server, worker):
+    from thread_planner import apply_runtime
+    apply_runtime(thread_plan)
+
+def post_worker_init(worker):
+    if not preload_app:
+        from food_model import get_food_model
+        get_food_model()
+    print(f"✅ Worker {worker.pid} ready in {time.time() - boot_started:.2f}s "
+          f"(preload={preload_app}, torch_threads={thread_plan['torch_intraop_threads']})", flush=True)
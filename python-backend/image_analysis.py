@@ -0,0 +1,134 @@
+import io
+from PIL import Image
+import numpy as np
+import cv2
+
+def load_rgb_image(image_bytes, max_side=None):
+    """Open raw image bytes as an RGB PIL image, optionally capped to max_side"""
+    image = Image.open(io.BytesIO(image_bytes))
+    
+    if max_side and max(image.size) > max_side:
+        # draft() lets JPEG decode straight at a reduced scale
+        image.draft('RGB', (max_side, max_side))
+        image.thumbnail((max_side, max_side))
+    
+    # Convert to RGB if necessary
+    if image.mode != 'RGB':
+        image = image.convert('RGB')
+    return image
+
+def edge_map(image_array):
+    """Grayscale copy and Canny edges, shared by screening and plate regions"""
+    gray = cv2.cvtColor(image_array, cv2.COLOR_RGB2GRAY)
+    edges = cv2.Canny(gray, 50, 150)
+    return gray, edges
+
+def detect_image_content(image_array, features=None):
+    """
+    Advanced image analysis using OpenCV and basic computer vision
+
+    features is an optional (gray, edges) pair from edge_map(), so callers that
+    need the edges afterwards do not run Canny twice.
+    """
+    # Convert to grayscale and find object boundaries
+    gray, edges = features if features is not None else edge_map(image_array)
+    
+    # Calculate basic image statistics
+    brightness = np.mean(gray)
+    contrast = np.std(gray)
+    
+    edge_density = np.sum(edges > 0) / edges.size
+    
+    # Color analysis
+    dominant_colors = analyze_dominant_colors(image_array)
+    
+    # Heuristic-based classification
+    classification = classify_image_content(brightness, contrast, edge_density, dominant_colors)
+    
+    return classification
+
+def analyze_dominant_colors(image_array):
+    """
+    Analyze dominant colors in the image
+    """
+    # Reshape image to be a list of pixels
+    pixels = image_array.reshape(-1, 3)
+    
+    # Calculate color statistics
+    color_stats = {
+        'avg_red': np.mean(pixels[:, 0]),
+        'avg_green': np.mean(pixels[:, 1]),
+        'avg_blue': np.mean(pixels[:, 2]),
+        'brightness': np.mean(pixels)
+    }
+    
+    return color_stats
+
+def classify_image_content(brightness, contrast, edge_density, colors):
+    """
+    Classify image content based on visual features - IMPROVED for waterfall detection
+    """
+    # Enhanced waterfall/nature detection
+    blue_dominance = colors['avg_blue'] - max(colors['avg_red'], colors['avg_green'])
+    green_dominance = colors['avg_green'] - max(colors['avg_red'], colors['avg_blue'])
+    
+    # Waterfall detection (high blue, high brightness, high edge density)
+    if (blue_dominance > 20 and 
+        brightness > 100 and 
+        edge_density > 0.08 and
+        contrast > 40):
+        return {
+            'is_food': False,
+            'category': 'waterfall',
+            'confidence': 0.95,
+            'reason': 'Strong waterfall indicators: blue dominance + high contrast + edges'
+        }
+    
+    # Nature scene detection (high green, outdoor lighting)
+    if (green_dominance > 15 and 
+        brightness > 120 and 
+        contrast < 60):
+        return {
+            'is_food': False,
+            'category': 'landscape',
+            'confidence': 0.90,
+            'reason': 'Detected natural landscape with green dominance'
+        }
+    
+    # Sky detection (very high blue, very high brightness)
+    if (blue_dominance > 30 and 
+        brightness > 140):
+        return {
+            'is_food': False,
+            'category': 'sky',
+            'confidence': 0.88,
+            'reason': 'Detected sky scene with high blue and brightness'
+        }
+    
+    # Ocean/water detection (blue dominant, medium brightness)
+    if (blue_dominance > 25 and 
+        brightness > 80 and brightness < 140 and
+        edge_density < 0.05):
+        return {
+            'is_food': False,
+            'category': 'ocean',
+            'confidence': 0.85,
+            'reason': 'Detected water/ocean scene'
+        }
+    
+    # Dark scenes (low brightness)
+    if brightness < 50:
+        return {
+            'is_food': False,
+            'category': 'dark_scene',
+            'confidence': 0.80,
+            'reason': 'Image too dark to identify food'
+        }
+    
+    # If it passes all non-food tests, it's likely food
+    return {
+        'is_food': True,
+        'category': 'food',
+        'confidence': 0.70,
+        'reason': 'Passed non-food filters, likely contains food'
+    }
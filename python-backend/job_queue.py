@@ -0,0 +1,377 @@
+import json
+import os
+import sqlite3
+import threading
+import time
+import uuid
+
+class JobQueue:
+    """Durable SQLite-backed queue for asynchronous food analysis jobs"""
+
+    def __init__(self, db_path, storage_dir):
+        self.db_path = db_path
+        self.storage_dir = storage_dir
+        self.lock = threading.Lock()
+        self.finished = threading.Condition(self.lock)
+        os.makedirs(self.storage_dir, exist_ok=True)
+        db_dir = os.path.dirname(os.path.abspath(self.db_path))
+        os.makedirs(db_dir, exist_ok=True)
+
+        # One connection shared by the threads of this process; SQLite
+        # serialises writers across processes (e.g. gunicorn workers)
+        self.conn = sqlite3.connect(self.db_path, timeout=30, check_same_thread=False,
+                                    isolation_level=None)
+        self.conn.row_factory = sqlite3.Row
+        self.conn.execute("PRAGMA journal_mode=WAL")
+        self.conn.execute("PRAGMA synchronous=NORMAL")
+        self.conn.execute("""
+            CREATE TABLE IF NOT EXISTS analysis_jobs (
+                id TEXT PRIMARY KEY,
+                status TEXT NOT NULL,
+                user_id INTEGER,
+                image_path TEXT NOT NULL,
+                result TEXT,
+                status_code INTEGER,
+                error TEXT,
+                attempts INTEGER DEFAULT 0,
+                created_at REAL NOT NULL,
+                started_at REAL,
+                finished_at REAL,
+                budget_ms REAL
+            )
+        """)
+        columns = {row['name'] for row in self.conn.execute("PRAGMA table_info(analysis_jobs)")}
+        if 'budget_ms' not in columns:
+            self.conn.execute("ALTER TABLE analysis_jobs ADD COLUMN budget_ms REAL")
+        self.conn.execute("""
+            CREATE INDEX IF NOT EXISTS idx_analysis_jobs_status_created
+            ON analysis_jobs(status, created_at)
+        """)
+        self.conn.execute("""
+            CREATE INDEX IF NOT EXISTS idx_analysis_jobs_status_user_created
+            ON analysis_jobs(status, user_id, created_at)
+        """)
+
+    def enqueue(self, image_bytes, user_id=None, budget_ms=None):
+        """Store the image on disk and add a pending job, returning its id"""
+        job_id = uuid.uuid4().hex
+        image_path = os.path.join(self.storage_dir, f"{job_id}.img")
+        tmp_path = image_path + '.tmp'
+        with open(tmp_path, 'wb') as f:
+            f.write(image_bytes)
+            f.flush()
+            os.fsync(f.fileno())
+        os.replace(tmp_path, image_path)
+
+        with self.lock:
+            self.conn.execute("""
+                INSERT INTO analysis_jobs (id, status, user_id, image_path, created_at, budget_ms)
+                VALUES (?, 'pending', ?, ?, ?, ?)
+            """, (job_id, user_id, image_path, time.time(), budget_ms))
+        return job_id
+
+    def claim_batch(self, max_jobs):
+        """Atomically move up to max_jobs pending jobs to processing
+
+        Jobs are taken round-robin across users (each user's oldest job,
+        then each user's second oldest, ...) so one user's backlog cannot
+        delay everyone else's uploads.
+        """
+        now = time.time()
+        with self.lock:
+            self.conn.execute("BEGIN IMMEDIATE")
+            try:
+                rows = self.conn.execute("""
+                    SELECT id, user_id, image_path, created_at, budget_ms FROM (
+                        SELECT id, user_id, image_path, created_at, budget_ms,
+                               ROW_NUMBER() OVER (PARTITION BY user_id ORDER BY created_at) AS turn
+                        FROM analysis_jobs
+                        WHERE status = 'pending'
+                    )
+                    ORDER BY turn, created_at
+                    LIMIT ?
+                """, (max_jobs,)).fetchall()
+                self.conn.executemany("""
+                    UPDATE analysis_jobs
+                    SET status = 'processing', started_at = ?, attempts = attempts + 1
+                    WHERE id = ?
+                """, [(now, row['id']) for row in rows])
+                self.conn.execute("COMMIT")
+            except Exception:
+                self.conn.execute("ROLLBACK")
+                raise
+        return [dict(row) for row in rows]
+
+    def mark_started(self, job_id):
+        """Stamp the moment the handler actually starts this job
+
+        claim_batch stamps the whole batch at once; jobs later in a batch
+        would otherwise count their wait as processing time.
+        """
+        now = time.time()
+        with self.lock:
+            self.conn.execute("""
+                UPDATE analysis_jobs SET started_at = ?
+                WHERE id = ? AND status = 'processing'
+            """, (now, job_id))
+        return now
+
+    def complete(self, job_id, result, status_code=200):
+        self._finish(job_id, 'done', json.dumps(result, ensure_ascii=False), status_code, None)
+
+    def fail(self, job_id, error):
+        self._finish(job_id, 'failed', None, 500, str(error))
+
+    def _finish(self, job_id, status, result, status_code, error):
+        with self.lock:
+            row = self.conn.execute(
+                "SELECT image_path FROM analysis_jobs WHERE id = ?", (job_id,)
+            ).fetchone()
+            cursor = self.conn.execute("""
+                UPDATE analysis_jobs
+                SET status = ?, result = ?, status_code = ?, error = ?, finished_at = ?
+                WHERE id = ? AND status = 'processing'
+            """, (status, result, status_code, error, time.time(), job_id))
+            self.finished.notify_all()
+
+        # A job that was requeued or already finished elsewhere keeps its image
+        if row is not None and cursor.rowcount == 1:
+            try:
+                os.remove(row['image_path'])
+            except OSError:
+                pass
+
+    def get(self, job_id):
+        """Return the public view of a job, or None if it does not exist"""
+        with self.lock:
+            row = self.conn.execute(
+                "SELECT * FROM analysis_jobs WHERE id = ?", (job_id,)
+            ).fetchone()
+        if row is None:
+            return None
+
+        job = {
+            'job_id': row['id'],
+            'user_id': row['user_id'],
+            'status': row['status'],
+            'created_at': row['created_at'],
+            'started_at': row['started_at'],
+            'finished_at': row['finished_at'],
+        }
+        if row['status'] == 'done':
+            job['result'] = json.loads(row['result'])
+            job['status_code'] = row['status_code']
+        elif row['status'] == 'failed':
+            job['error'] = row['error']
+        return job
+
+    def wait_for(self, job_id, timeout):
+        """Long-poll until the job finishes or timeout seconds pass"""
+        deadline = time.time() + timeout
+        while True:
+            job = self.get(job_id)
+            if job is None or job['status'] in ('done', 'failed'):
+                return job
+            remaining = deadline - time.time()
+            if remaining <= 0:
+                return job
+            # Local workers notify directly; the short cap also picks up
+            # jobs finished by workers in other processes
+            with self.lock:
+                self.finished.wait(min(remaining, 0.5))
+
+    def iter_user_jobs(self, user_id, after_rowid=0, page_size=500):
+        """Yield a user's jobs in insertion order, one page under the lock at a time"""
+        while True:
+            with self.lock:
+                rows = self.conn.execute("""
+                    SELECT rowid, id, status, result, status_code, error,
+                           created_at, started_at, finished_at
+                    FROM analysis_jobs
+                    WHERE user_id = ? AND rowid > ?
+                    ORDER BY rowid
+                    LIMIT ?
+                """, (user_id, after_rowid, page_size)).fetchall()
+            if not rows:
+                return
+            for row in rows:
+                job = dict(row)
+                job['_cursor_id'] = job.pop('rowid')
+                job['result'] = json.loads(job['result']) if job['result'] else None
+                yield job
+            after_rowid = rows[-1]['rowid']
+
+    def requeue_stale(self, older_than, max_attempts=None):
+        """Return jobs stuck in processing (e.g. after a crash) to the queue
+
+        Jobs already claimed max_attempts times are failed instead, so an
+        image that keeps killing its worker is not retried forever. Returns
+        (requeued, given_up).
+        """
+        now = time.time()
+        cutoff = now - older_than
+        given_up = []
+        with self.lock:
+            self.conn.execute("BEGIN IMMEDIATE")
+            try:
+                if max_attempts:
+                    given_up = self.conn.execute("""
+                        SELECT id, image_path FROM analysis_jobs
+                        WHERE status = 'processing' AND started_at < ? AND attempts >= ?
+                    """, (cutoff, max_attempts)).fetchall()
+                    self.conn.executemany("""
+                        UPDATE analysis_jobs
+                        SET status = 'failed', status_code = 500, error = ?, finished_at = ?
+                        WHERE id = ?
+                    """, [(f"Gave up after {max_attempts} attempts", now, row['id'])
+                          for row in given_up])
+                cursor = self.conn.execute("""
+                    UPDATE analysis_jobs SET status = 'pending', started_at = NULL
+                    WHERE status = 'processing' AND started_at < ?
+                """, (cutoff,))
+                self.conn.execute("COMMIT")
+            except Exception:
+                self.conn.execute("ROLLBACK")
+                raise
+            if given_up:
+                self.finished.notify_all()
+
+        for row in given_up:
+            try:
+                os.remove(row['image_path'])
+            except OSError:
+                pass
+        return cursor.rowcount, len(given_up)
+
+    def purge_finished(self, older_than):
+        """Delete finished jobs whose results are older than older_than seconds"""
+        cutoff = time.time() - older_than
+        with self.lock:
+            cursor = self.conn.execute("""
+                DELETE FROM analysis_jobs
+                WHERE status IN ('done', 'failed') AND finished_at < ?
+            """, (cutoff,))
+        return cursor.rowcount
+
+    def stats(self, window=1000):
+        """Queue depth plus wait/processing times over the last finished jobs"""
+        with self.lock:
+            counts = {row['status']: row['n'] for row in self.conn.execute(
+                "SELECT status, COUNT(*) AS n FROM analysis_jobs GROUP BY status"
+            )}
+            oldest = self.conn.execute(
+                "SELECT MIN(created_at) AS t FROM analysis_jobs WHERE status = 'pending'"
+            ).fetchone()['t']
+            recent = self.conn.execute("""
+                SELECT started_at - created_at AS wait, finished_at - started_at AS run
+                FROM analysis_jobs
+                WHERE status IN ('done', 'failed') AND started_at IS NOT NULL
+                ORDER BY finished_at DESC
+                LIMIT ?
+            """, (window,)).fetchall()
+
+        waits = sorted(row['wait'] for row in recent)
+        runs = sorted(row['run'] for row in recent)
+        return {
+            'depth': counts.get('pending', 0),
+            'processing': counts.get('processing', 0),
+            'done': counts.get('done', 0),
+            'failed': counts.get('failed', 0),
+            'oldest_pending_age_seconds': round(time.time() - oldest, 3) if oldest else 0,
+            'wait_seconds': _summarize(waits),
+            'processing_seconds': _summarize(runs),
+        }
+
+def _summarize(sorted_values):
+    if not sorted_values:
+        return {'count': 0, 'avg': 0, 'p50': 0, 'p95': 0, 'max': 0}
+    n = len(sorted_values)
+    return {
+        'count': n,
+        'avg': round(sum(sorted_values) / n, 4),
+        'p50': round(sorted_values[n // 2], 4),
+        'p95': round(sorted_values[min(n - 1, int(n * 0.95))], 4),
+        'max': round(sorted_values[-1], 4),
+    }
+
+class JobWorkerPool:
+    """Background threads that drain the queue in batches"""
+
+    def __init__(self, queue, handler, workers=2, batch_size=8, poll_interval=0.2,
+                 stale_after=300, max_attempts=3, retention=7 * 24 * 3600, purge_interval=3600):
+        self.queue = queue
+        self.handler = handler
+        self.workers = workers
+        self.batch_size = batch_size
+        self.poll_interval = poll_interval
+        self.stale_after = stale_after
+        self.max_attempts = max_attempts
+        self.retention = retention
+        self.purge_interval = purge_interval
+        self.purge_lock = threading.Lock()
+        self.last_purge = 0.0
+        self.last_requeue = 0.0
+        self.stop_event = threading.Event()
+        self.threads = []
+
+    def start(self):
+        if self.threads:
+            return
+        for i in range(self.workers):
+            thread = threading.Thread(target=self._run, name=f"analysis-worker-{i}", daemon=True)
+            thread.start()
+            self.threads.append(thread)
+        print(f"👷 Started {self.workers} analysis workers (batch size {self.batch_size})")
+
+    def stop(self, timeout=5):
+        self.stop_event.set()
+        for thread in self.threads:
+            thread.join(timeout)
+        self.threads = []
+
+    def _maybe_purge(self):
+        """Periodic housekeeping, shared by the worker threads
+
+        Every stale_after seconds (and on the first pass) jobs stuck in
+        processing are requeued or, past max_attempts, failed; finished jobs
+        older than retention are deleted at most once per purge_interval.
+        """
+        if not self.purge_lock.acquire(blocking=False):
+            return
+        try:
+            if time.time() - self.last_requeue >= self.stale_after:
+                self.last_requeue = time.time()
+                requeued, given_up = self.queue.requeue_stale(self.stale_after, self.max_attempts)
+                if requeued:
+                    print(f"♻️ Requeued {requeued} stale analysis jobs")
+                if given_up:
+                    print(f"🪦 Failed {given_up} analysis jobs after {self.max_attempts} attempts")
+            if self.retention and time.time() - self.last_purge >= self.purge_interval:
+                self.last_purge = time.time()
+                purged = self.queue.purge_finished(self.retention)
+                if purged:
+                    print(f"🧹 Purged {purged} finished analysis jobs")
+        except Exception as e:
+            print(f"❌ Job housekeeping error: {e}")
+        finally:
+            self.purge_lock.release()
+
+    def _run(self):
+        while not self.stop_event.is_set():
+            self._maybe_purge()
+            try:
+                jobs = self.queue.claim_batch(self.batch_size)
+            except Exception as e:
+                print(f"❌ Job claim error: {e}")
+                jobs = []
+
+            if not jobs:
+                self.stop_event.wait(self.poll_interval)
+                continue
+
+            try:
+                self.handler(jobs)
+            except Exception as e:
+                print(f"❌ Job batch error: {e}")
+                for job in jobs:
+                    self.queue.fail(job['id'], e)
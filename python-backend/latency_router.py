@@ -0,0 +1,121 @@
+import threading
+import time
+from contextlib import contextmanager
+
+# Prediction tiers, most accurate / most expensive first
+TIERS = ('ai', 'smart_fallback', 'simple_fallback')
+
+TIER_ANALYSIS_METHODS = {
+    'ai': 'OpenCV + Hugging Face AI',
+    'smart_fallback': 'OpenCV + Color Heuristics',
+    'simple_fallback': 'OpenCV + Simple Fallback',
+}
+
+class LatencyRouter:
+    """
+    Picks the cheapest tier that still fits a request's latency budget.
+
+    Keeps an EWMA of measured latency per tier and the number of in-flight
+    model calls, so a busy model is estimated as slower than an idle one.
+    """
+
+    def __init__(self, default_budget_ms=0, model_concurrency=1, alpha=0.2,
+                 prior_ms=None, probe_interval=10.0):
+        self.default_budget_ms = default_budget_ms
+        self.model_concurrency = max(1, model_concurrency)
+        self.alpha = alpha
+        self.lock = threading.Lock()
+        self.latency_ms = dict(prior_ms or {'ai': 300.0, 'smart_fallback': 20.0, 'simple_fallback': 1.0})
+        self.observations = {tier: 0 for tier in TIERS}
+        self.inflight = {tier: 0 for tier in TIERS}
+        self.decisions = {}
+        # While degraded, let one request through to the model every
+        # probe_interval seconds so a stale high estimate can recover
+        self.probe_interval = probe_interval
+        self.last_ai_at = 0.0
+
+    def deadline_for(self, budget_ms, started_at):
+        """Absolute deadline (time.time()) for a budget, or None if unbounded"""
+        if budget_ms is None:
+            budget_ms = self.default_budget_ms
+        if not budget_ms or budget_ms <= 0:
+            return None
+        return started_at + budget_ms / 1000.0
+
+    def estimate_ms(self, tier, images=1):
+        """Expected latency if a call on this tier for images images started now"""
+        with self.lock:
+            return self._estimate_ms(tier, images)
+
+    def _estimate_ms(self, tier, images=1):
+        queued = self.inflight[tier] / self.model_concurrency if tier == 'ai' else 0
+        return self.latency_ms[tier] * images * (1 + queued)
+
+    def choose_tier(self, deadline, model_available=True, images=1):
+        """Return (tier, reason) for a call on images images that must finish by deadline"""
+        with self.lock:
+            remaining_ms = None if deadline is None else (deadline - time.time()) * 1000
+
+            if remaining_ms is not None and remaining_ms < self._estimate_ms('smart_fallback', images):
+                tier, reason = 'simple_fallback', 'budget_exceeded'
+            elif not model_available:
+                tier, reason = 'smart_fallback', 'model_unavailable'
+            elif remaining_ms is None:
+                tier, reason = 'ai', 'no_budget'
+            elif remaining_ms >= self._estimate_ms('ai', images):
+                tier, reason = 'ai', 'within_budget'
+            elif time.time() - self.last_ai_at >= self.probe_interval and self.inflight['ai'] == 0:
+                tier, reason = 'ai', 'probe'
+            else:
+                tier, reason = 'smart_fallback', 'budget_exceeded'
+
+            if tier == 'ai':
+                self.last_ai_at = time.time()
+            key = (tier, reason)
+            self.decisions[key] = self.decisions.get(key, 0) + 1
+        return tier, reason
+
+    def reroute(self, tier, reason, new_tier, new_reason):
+        """Move a decision choose_tier already counted to the tier actually served"""
+        with self.lock:
+            self.decisions[(tier, reason)] -= 1
+            if not self.decisions[(tier, reason)]:
+                del self.decisions[(tier, reason)]
+            key = (new_tier, new_reason)
+            self.decisions[key] = self.decisions.get(key, 0) + 1
+        return new_tier, new_reason
+
+    def observe(self, tier, elapsed_ms, images=1):
+        """Fold a measured call into the per-image EWMA for its tier"""
+        elapsed_ms /= max(1, images)
+        with self.lock:
+            if self.observations[tier] == 0:
+                self.latency_ms[tier] = elapsed_ms
+            else:
+                self.latency_ms[tier] += self.alpha * (elapsed_ms - self.latency_ms[tier])
+            self.observations[tier] += 1
+
+    @contextmanager
+    def track(self, tier):
+        """Count a call as in flight while it runs"""
+        with self.lock:
+            self.inflight[tier] += 1
+        try:
+            yield
+        finally:
+            with self.lock:
+                self.inflight[tier] -= 1
+
+    def stats(self):
+        with self.lock:
+            decisions = {}
+            for (tier, reason), count in self.decisions.items():
+                decisions.setdefault(tier, {})[reason] = count
+            return {
+                'default_budget_ms': self.default_budget_ms,
+                'model_concurrency': self.model_concurrency,
+                'latency_ewma_ms': {tier: round(ms, 2) for tier, ms in self.latency_ms.items()},
+                'observations': dict(self.observations),
+                'inflight': dict(self.inflight),
+                'decisions': decisions,
+            }
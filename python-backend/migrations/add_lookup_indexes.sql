@@ -0,0 +1,95 @@
+-- Index audit for login / register / profile / reward lookups
+-- Safe to run more than once: every index is only added if no index with the
+-- same columns (and uniqueness) exists yet.
+--
+-- Queries these indexes serve (python-backend/app.py):
+--   login / register        users WHERE email = ?  and  users WHERE username = ?
+--                           (UNION ALL of two point lookups instead of OR)
+--   profile GET / POST      user_profiles WHERE user_id = ?
+--   check-nutritionist      EXISTS (user_rewards WHERE user_id = ? AND reward_id = ?)
+
+DELIMITER $$
+
+DROP PROCEDURE IF EXISTS add_index_if_missing$$
+CREATE PROCEDURE add_index_if_missing(
+    IN p_table VARCHAR(64),
+    IN p_index VARCHAR(64),
+    IN p_columns VARCHAR(255),   -- comma separated, no spaces, in index order
+    IN p_unique BOOLEAN
+)
+BEGIN
+    DECLARE existing INT DEFAULT 0;
+
+    SELECT COUNT(*) INTO existing
+    FROM (
+        SELECT INDEX_NAME,
+               MIN(NON_UNIQUE) AS non_unique,
+               GROUP_CONCAT(COLUMN_NAME ORDER BY SEQ_IN_INDEX) AS cols
+        FROM information_schema.STATISTICS
+        WHERE TABLE_SCHEMA = DATABASE() AND TABLE_NAME = p_table
+        GROUP BY INDEX_NAME
+    ) idx
+    WHERE idx.cols = p_columns AND (NOT p_unique OR idx.non_unique = 0);
+
+    IF existing = 0 THEN
+        SET @ddl = CONCAT('ALTER TABLE `', p_table, '` ADD ',
+                          IF(p_unique, 'UNIQUE ', ''), 'INDEX `', p_index, '` (',
+                          REPLACE(p_columns, ',', ', '), ')');
+        PREPARE stmt FROM @ddl;
+        EXECUTE stmt;
+        DEALLOCATE PREPARE stmt;
+    END IF;
+END$$
+
+-- Only drops non-unique indexes, so a unique index that happens to share the
+-- name is never removed
+DROP PROCEDURE IF EXISTS drop_index_if_exists$$
+CREATE PROCEDURE drop_index_if_exists(IN p_table VARCHAR(64), IN p_index VARCHAR(64))
+BEGIN
+    IF EXISTS (
+        SELECT 1 FROM information_schema.STATISTICS
+        WHERE TABLE_SCHEMA = DATABASE() AND TABLE_NAME = p_table AND INDEX_NAME = p_index
+          AND NON_UNIQUE = 1
+    ) THEN
+        SET @ddl = CONCAT('ALTER TABLE `', p_table, '` DROP INDEX `', p_index, '`');
+        PREPARE stmt FROM @ddl;
+        EXECUTE stmt;
+        DEALLOCATE PREPARE stmt;
+    END IF;
+END$$
+
+DELIMITER ;
+
+-- Step 1: users - one unique index per login identifier
+CALL add_index_if_missing('users', 'uq_users_email', 'email', TRUE);
+CALL add_index_if_missing('users', 'uq_users_username', 'username', TRUE);
+
+-- database.sql also created plain duplicates of the UNIQUE column indexes;
+-- they cost a write per INSERT and are never chosen over the unique ones
+CALL drop_index_if_exists('users', 'idx_users_email');
+CALL drop_index_if_exists('users', 'idx_users_username');
+
+-- Step 2: user_profiles - one profile per user, looked up by user_id.
+-- Fails with a duplicate key error if a user already has several profiles;
+-- find them with:
+--   SELECT user_id, COUNT(*) FROM user_profiles GROUP BY user_id HAVING COUNT(*) > 1;
+-- and keep the newest row per user before re-running.
+CALL add_index_if_missing('user_profiles', 'uq_user_profiles_user_id', 'user_id', TRUE);
+
+-- The FOREIGN KEY (user_id) in database.sql created a plain index named
+-- user_id. The unique index now enforces the foreign key, so the plain one
+-- only costs writes. MySQL usually drops it by itself; this covers the rest.
+CALL drop_index_if_exists('user_profiles', 'user_id');
+
+-- Step 3: user_rewards - ownership checks by (user_id, reward_id). The schema
+-- files already declare unique_user_reward; this only fills it in on databases
+-- created without it
+CALL add_index_if_missing('user_rewards', 'unique_user_reward', 'user_id,reward_id', TRUE);
+
+DROP PROCEDURE add_index_if_missing;
+DROP PROCEDURE drop_index_if_exists;
+
+-- Step 4: Verify
+SHOW INDEX FROM users;
+SHOW INDEX FROM user_profiles;
+SHOW INDEX FROM user_rewards;
@@ -48,6 +48,11 @@ def get_rewards_shop():
     return jsonify({'rewards': rewards})
 """
 
+# IMPLEMENTED: app.py serves /api/rewards/shop from rewards_catalog.py, which
+# parses these JSON fields once, precomputes tr/en/all payloads with ETags and
+# rebuilds them only when CHECKSUM TABLE rewards changes. Use ?lang=tr or
+# ?lang=en to receive plain strings instead of {'tr', 'en'} objects.
+
 # Frontend Usage:
 """
 // In React Native component
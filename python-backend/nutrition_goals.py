@@ -0,0 +1,69 @@
+import numpy as np
+
+# Same formulas as lib/calorieCalculator.ts (Mifflin-St Jeor BMR, activity
+# multiplier TDEE, goal offset, 25/45/30 protein/carbs/fat split)
+ACTIVITY_MULTIPLIERS = {
+    'sedentary': 1.2,
+    'light': 1.375,
+    'moderate': 1.55,
+    'active': 1.725,
+    'very_active': 1.9,
+}
+GOAL_CALORIE_OFFSETS = {
+    'lose': -500,
+    'maintain': 0,
+    'gain': 300,
+}
+GENDER_BMR_OFFSETS = {
+    'male': 5,
+    'female': -161,
+}
+PROTEIN_SHARE, CARBS_SHARE, FAT_SHARE = 0.25, 0.45, 0.30
+
+GOAL_COLUMNS = ('daily_calorie_goal', 'daily_protein_goal', 'daily_carbs_goal', 'daily_fat_goal')
+
+def js_round(values):
+    """Math.round semantics (halves go up), unlike numpy's round-half-even"""
+    return np.floor(values + 0.5)
+
+def map_column(values, mapping, default=np.nan):
+    """Map a column of category strings to floats without a per-row dict lookup"""
+    categories, inverse = np.unique(np.asarray(values, dtype=object).astype(str), return_inverse=True)
+    lookup = np.array([mapping.get(category, default) for category in categories], dtype=np.float64)
+    return lookup[inverse]
+
+def calculate_goals(age, gender, height, weight, activity_level, goal):
+    """
+    Daily calorie and macro goals for whole columns of profiles at once.
+
+    Arguments are equal-length sequences (numpy arrays or lists). Returns a
+    dict of float arrays keyed like the user_profiles goal columns plus
+    'bmr' and 'tdee'; rows with unknown gender/activity/goal or missing
+    numbers come back as NaN and should be skipped.
+    """
+    age = np.asarray(age, dtype=np.float64)
+    height = np.asarray(height, dtype=np.float64)
+    weight = np.asarray(weight, dtype=np.float64)
+
+    bmr = 10 * weight + 6.25 * height - 5 * age + map_column(gender, GENDER_BMR_OFFSETS)
+    tdee = js_round(bmr * map_column(activity_level, ACTIVITY_MULTIPLIERS))
+    calories = js_round(tdee + map_column(goal, GOAL_CALORIE_OFFSETS))
+
+    return {
+        'bmr': bmr,
+        'tdee': tdee,
+        'daily_calorie_goal': calories,
+        'daily_protein_goal': js_round(calories * PROTEIN_SHARE / 4),
+        'daily_carbs_goal': js_round(calories * CARBS_SHARE / 4),
+        'daily_fat_goal': js_round(calories * FAT_SHARE / 9),
+    }
+
+def calculate_profile_goals(age, gender, height, weight, activity_level, goal):
+    """Goals for a single profile as ints, or None if the inputs are incomplete"""
+    try:
+        goals = calculate_goals([age], [gender], [height], [weight], [activity_level], [goal])
+    except (TypeError, ValueError):
+        return None
+    if any(np.isnan(goals[column][0]) for column in GOAL_COLUMNS):
+        return None
+    return {column: int(goals[column][0]) for column in GOAL_COLUMNS}
@@ -0,0 +1,85 @@
+import numpy as np
+import cv2
+
+# Regions are searched on a copy no larger than this; boxes are scaled back
+WORK_SIDE = 512
+
+def _overlap(a, b):
+    """(intersection over union, intersection over the smaller box)"""
+    ax, ay, aw, ah = a
+    bx, by, bw, bh = b
+    inter_w = max(0, min(ax + aw, bx + bw) - max(ax, bx))
+    inter_h = max(0, min(ay + ah, by + bh) - max(ay, by))
+    inter = inter_w * inter_h
+    if inter == 0:
+        return 0.0, 0.0
+    return inter / float(aw * ah + bw * bh - inter), inter / float(min(aw * ah, bw * bh))
+
+def _suppress(boxes, iou_threshold=0.4, containment_threshold=0.8):
+    """Drop boxes overlapping, or lying inside, a larger kept box (boxes sorted by area)"""
+    kept = []
+    for box in boxes:
+        overlaps = [_overlap(box, other) for other in kept]
+        if all(iou < iou_threshold and contained < containment_threshold for iou, contained in overlaps):
+            kept.append(box)
+    return kept
+
+def propose_regions(image_array, edges, max_regions=6, min_area=0.02, max_area=0.85,
+                    saturation_threshold=45, padding=0.08):
+    """
+    Candidate food regions on a plate as (x, y, width, height) boxes.
+
+    Builds a mask from the Canny edges of the screening step (food is
+    textured, plates and tables mostly are not) plus strongly saturated
+    pixels (plates and tables are mostly white, grey or wood-brown), closes
+    it into blobs and keeps the largest external contours. Boxes outside
+    [min_area, max_area] of the image are ignored; the plate rim tends to be
+    one huge box. Returns the whole image as a single region if nothing
+    qualifies, so a one-item photo still gets classified.
+    """
+    height, width = image_array.shape[:2]
+    scale = min(1.0, WORK_SIDE / float(max(height, width)))
+    work_w, work_h = max(1, round(width * scale)), max(1, round(height * scale))
+
+    if scale < 1.0:
+        small = cv2.resize(image_array, (work_w, work_h), interpolation=cv2.INTER_AREA)
+        # Any edge pixel inside the downscaled cell keeps the cell marked
+        edge_mask = cv2.resize(edges, (work_w, work_h), interpolation=cv2.INTER_AREA) > 0
+    else:
+        small = image_array
+        edge_mask = edges > 0
+
+    saturation = cv2.cvtColor(small, cv2.COLOR_RGB2HSV)[:, :, 1]
+    mask = (edge_mask | (saturation > saturation_threshold)).astype(np.uint8) * 255
+
+    kernel_size = max(3, (min(work_w, work_h) // 40) | 1)
+    kernel = cv2.getStructuringElement(cv2.MORPH_ELLIPSE, (kernel_size, kernel_size))
+    mask = cv2.morphologyEx(mask, cv2.MORPH_CLOSE, kernel, iterations=2)
+    mask = cv2.morphologyEx(mask, cv2.MORPH_OPEN, kernel)
+
+    contours, _ = cv2.findContours(mask, cv2.RETR_EXTERNAL, cv2.CHAIN_APPROX_SIMPLE)
+    image_area = float(work_w * work_h)
+    boxes = []
+    for contour in contours:
+        x, y, w, h = cv2.boundingRect(contour)
+        if min_area <= (w * h) / image_area <= max_area:
+            boxes.append((x, y, w, h))
+    boxes.sort(key=lambda box: box[2] * box[3], reverse=True)
+    boxes = _suppress(boxes)[:max_regions]
+
+    if not boxes:
+        return [(0, 0, width, height)]
+
+    regions = []
+    for x, y, w, h in boxes:
+        pad_x, pad_y = w * padding, h * padding
+        left = max(0, int((x - pad_x) / scale))
+        top = max(0, int((y - pad_y) / scale))
+        right = min(width, int(np.ceil((x + w + pad_x) / scale)))
+        bottom = min(height, int(np.ceil((y + h + pad_y) / scale)))
+        regions.append((left, top, right - left, bottom - top))
+    return regions
+
+def crop_regions(image_array, regions):
+    """Contiguous RGB crops for the model, one per region"""
+    return [np.ascontiguousarray(image_array[y:y + h, x:x + w]) for x, y, w, h in regions]
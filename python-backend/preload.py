@@ -0,0 +1,34 @@
+import gc
+import os
+
+try:
+    import torch
+    TORCH_AVAILABLE = True
+except ImportError:
+    TORCH_AVAILABLE = False
+
+def preload_model():
+    """
+    Load the food model and nutrition table once in the gunicorn master.
+
+    Workers forked afterwards share the weight pages copy-on-write. gc.freeze()
+    moves everything allocated so far into the permanent generation, so the
+    workers' garbage collector never writes to those objects' headers and
+    the shared pages stay clean.
+    """
+    if TORCH_AVAILABLE:
+        # Keep the master single-threaded: an OpenMP pool started before
+        # fork() is not usable in the children
+        torch.set_num_threads(1)
+
+    from food_model import get_food_model
+    food_model = get_food_model()
+    if food_model.model is not None:
+        # Inference only; no autograd bookkeeping writes into shared tensors
+        for param in food_model.model.parameters():
+            param.requires_grad_(False)
+
+    gc.collect()
+    gc.freeze()
+    print(f"🧊 Model preloaded in master {os.getpid()}, {gc.get_freeze_count()} objects frozen")
+    return food_model
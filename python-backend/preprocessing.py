@@ -0,0 +1,129 @@
+import threading
+import numpy as np
+import cv2
+
+try:
+    import torch
+    TORCH_AVAILABLE = True
+except ImportError:
+    TORCH_AVAILABLE = False
+
+def _size_pair(size, default=224):
+    """Normalize HF size configs (int, dict, tuple) to (height, width)"""
+    if size is None:
+        return default, default
+    if isinstance(size, int):
+        return size, size
+    if isinstance(size, dict):
+        if 'height' in size and 'width' in size:
+            return size['height'], size['width']
+        if 'shortest_edge' in size:
+            return size['shortest_edge'], size['shortest_edge']
+    return tuple(size)
+
+class FastImagePreprocessor:
+    """
+    Resize / center-crop / normalize for the food model on uint8 arrays.
+
+    Opt-in replacement (FAST_PREPROCESSING) for the HF processor: images go
+    through one cv2.resize and one fused multiply-add straight into a
+    preallocated float32 NCHW batch buffer (one per thread, reused across
+    calls), which is handed to the model via torch.from_numpy without a copy.
+    """
+
+    def __init__(self, size=(224, 224), image_mean=(0.5, 0.5, 0.5), image_std=(0.5, 0.5, 0.5),
+                 rescale_factor=1 / 255, shortest_edge=None, crop_size=None, max_batch=8):
+        self.size = size
+        self.shortest_edge = shortest_edge
+        self.crop_size = crop_size
+        self.output_size = tuple(crop_size or size)
+        self.max_batch = max_batch
+        mean = np.asarray(image_mean, dtype=np.float32)
+        std = np.asarray(image_std, dtype=np.float32)
+        # (x * rescale - mean) / std  ==  x * scale + bias
+        self.scale = (rescale_factor / std).reshape(3, 1, 1)
+        self.bias = (-mean / std).reshape(3, 1, 1)
+        self.local = threading.local()
+
+    @classmethod
+    def from_hf_processor(cls, processor, max_batch=8):
+        """Build from a loaded AutoImageProcessor so both paths share one spec
+
+        Returns None for a shortest-edge config without a center crop: HF
+        keeps the aspect ratio there, so images have no common batch shape.
+        """
+        size = getattr(processor, 'size', None)
+        shortest_edge = size.get('shortest_edge') if isinstance(size, dict) else None
+        crop_size = None
+        if getattr(processor, 'do_center_crop', False):
+            crop_size = _size_pair(getattr(processor, 'crop_size', None))
+        if shortest_edge and not crop_size:
+            return None
+
+        do_normalize = getattr(processor, 'do_normalize', True)
+        do_rescale = getattr(processor, 'do_rescale', True)
+        return cls(
+            size=_size_pair(size),
+            image_mean=processor.image_mean if do_normalize else (0.0, 0.0, 0.0),
+            image_std=processor.image_std if do_normalize else (1.0, 1.0, 1.0),
+            rescale_factor=getattr(processor, 'rescale_factor', 1 / 255) if do_rescale else 1.0,
+            shortest_edge=shortest_edge,
+            crop_size=crop_size,
+            max_batch=max_batch,
+        )
+
+    def _buffer(self, n):
+        buffer = getattr(self.local, 'buffer', None)
+        if buffer is None or buffer.shape[0] < n:
+            height, width = self.output_size
+            buffer = np.empty((max(n, self.max_batch), 3, height, width), dtype=np.float32)
+            self.local.buffer = buffer
+        return buffer
+
+    def _resize(self, image):
+        height, width = image.shape[:2]
+        if self.shortest_edge:
+            ratio = self.shortest_edge / min(height, width)
+            target_h, target_w = round(height * ratio), round(width * ratio)
+        else:
+            target_h, target_w = self.size
+
+        # INTER_AREA when shrinking approximates PIL's antialiased bilinear
+        shrinking = target_h < height or target_w < width
+        interpolation = cv2.INTER_AREA if shrinking else cv2.INTER_LINEAR
+        return cv2.resize(image, (target_w, target_h), interpolation=interpolation)
+
+    def _center_crop(self, image):
+        if not self.crop_size:
+            return image
+        crop_h, crop_w = self.crop_size
+        height, width = image.shape[:2]
+        top = max(0, (height - crop_h) // 2)
+        left = max(0, (width - crop_w) // 2)
+        return image[top:top + crop_h, left:left + crop_w]
+
+    def preprocess(self, images):
+        """Fill the batch buffer from RGB uint8 arrays (or PIL images)
+
+        Returns a float32 numpy view of shape (n, 3, H, W). The view is
+        overwritten by the next call on the same thread.
+        """
+        buffer = self._buffer(len(images))
+        for i, image in enumerate(images):
+            array = np.asarray(image, dtype=np.uint8)
+            resized = self._center_crop(self._resize(array))
+            if resized.shape[:2] != self.output_size:
+                raise ValueError(f"Preprocessed image is {resized.shape[1]}x{resized.shape[0]}, "
+                                 f"expected {self.output_size[1]}x{self.output_size[0]}; "
+                                 f"crop_size must not exceed the resize target")
+            # HWC -> CHW happens inside the fused multiply-add
+            np.multiply(resized.transpose(2, 0, 1), self.scale, out=buffer[i])
+            buffer[i] += self.bias
+        return buffer[:len(images)]
+
+    def __call__(self, images):
+        """Preprocess to a torch tensor sharing memory with the batch buffer"""
+        batch = self.preprocess(images)
+        if TORCH_AVAILABLE:
+            return torch.from_numpy(batch)
+        return batch
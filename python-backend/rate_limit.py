@@ -0,0 +1,155 @@
+import os
+import sqlite3
+import threading
+import time
+from collections import Counter
+
+class MemoryBucketBackend:
+    """Token buckets in this process only (each gunicorn worker counts separately)"""
+
+    def __init__(self, prune_every=10000):
+        self.buckets = {}
+        self.lock = threading.Lock()
+        self.prune_every = prune_every
+        self.takes = 0
+
+    def take(self, key, capacity, refill_per_second, cost=1, now=None):
+        """Spend cost tokens if available; returns (allowed, tokens left, retry-after seconds)"""
+        now = time.time() if now is None else now
+        with self.lock:
+            tokens, updated, _ = self.buckets.get(key, (capacity, now, None))
+            tokens, allowed, retry_after = _spend(tokens, updated, now, capacity, refill_per_second, cost)
+            self.buckets[key] = (tokens, now, _full_at(now, capacity, refill_per_second))
+
+            self.takes += 1
+            if self.takes % self.prune_every == 0:
+                self._prune(now)
+        return allowed, tokens, retry_after
+
+    def _prune(self, now):
+        # An idle bucket that has refilled to capacity is the same as no bucket;
+        # each bucket carries its own policy's refill time
+        stale = [key for key, (_, _, full_at) in self.buckets.items() if now >= full_at]
+        for key in stale:
+            del self.buckets[key]
+
+class SQLiteBucketBackend:
+    """
+    Token buckets shared by every process on the host through one SQLite file.
+
+    Local stand-in for a shared store such as Redis: any backend with the
+    same take() signature can be passed to RateLimiter.
+    """
+
+    def __init__(self, db_path, prune_every=10000):
+        os.makedirs(os.path.dirname(os.path.abspath(db_path)), exist_ok=True)
+        self.lock = threading.Lock()
+        self.prune_every = prune_every
+        self.takes = 0
+        self.conn = sqlite3.connect(db_path, timeout=5, check_same_thread=False, isolation_level=None)
+        self.conn.execute("PRAGMA journal_mode=WAL")
+        self.conn.execute("PRAGMA synchronous=NORMAL")
+        self.conn.execute("""
+            CREATE TABLE IF NOT EXISTS rate_buckets (
+                key TEXT PRIMARY KEY,
+                tokens REAL NOT NULL,
+                updated REAL NOT NULL,
+                full_at REAL
+            )
+        """)
+        columns = {row[1] for row in self.conn.execute("PRAGMA table_info(rate_buckets)")}
+        if 'full_at' not in columns:
+            # Buckets written before the column existed are pruned at the next pass
+            self.conn.execute("ALTER TABLE rate_buckets ADD COLUMN full_at REAL DEFAULT 0")
+
+    def take(self, key, capacity, refill_per_second, cost=1, now=None):
+        now = time.time() if now is None else now
+        with self.lock:
+            self.conn.execute("BEGIN IMMEDIATE")
+            try:
+                row = self.conn.execute(
+                    "SELECT tokens, updated FROM rate_buckets WHERE key = ?", (key,)
+                ).fetchone()
+                tokens, updated = row if row else (capacity, now)
+                tokens, allowed, retry_after = _spend(tokens, updated, now, capacity, refill_per_second, cost)
+                full_at = _full_at(now, capacity, refill_per_second)
+                self.conn.execute(
+                    "INSERT OR REPLACE INTO rate_buckets (key, tokens, updated, full_at) VALUES (?, ?, ?, ?)",
+                    (key, tokens, now, None if full_at == float('inf') else full_at)
+                )
+                self.conn.execute("COMMIT")
+            except Exception:
+                self.conn.execute("ROLLBACK")
+                raise
+
+            self.takes += 1
+            if self.takes % self.prune_every == 0:
+                self.conn.execute("DELETE FROM rate_buckets WHERE full_at <= ?", (now,))
+        return allowed, tokens, retry_after
+
+def _full_at(now, capacity, refill_per_second):
+    """When a bucket left untouched from now on would be back at capacity"""
+    return now + capacity / refill_per_second if refill_per_second > 0 else float('inf')
+
+def _spend(tokens, updated, now, capacity, refill_per_second, cost):
+    tokens = min(capacity, tokens + max(0.0, now - updated) * refill_per_second)
+    if tokens >= cost:
+        return tokens - cost, True, 0.0
+    retry_after = (cost - tokens) / refill_per_second if refill_per_second > 0 else float('inf')
+    return tokens, False, retry_after
+
+class RateLimiter:
+    """
+    Named token-bucket policies (e.g. 'inference', 'default') keyed by identity.
+
+    policies maps a name to (burst capacity, tokens refilled per minute).
+    """
+
+    def __init__(self, backend, policies, track_identities=1000):
+        self.backend = backend
+        self.policies = policies
+        self.track_identities = track_identities
+        self.lock = threading.Lock()
+        self.allowed = Counter()
+        self.throttled = Counter()
+        self.throttled_identities = Counter()
+        self.backend_errors = 0
+
+    def check(self, policy, identity, cost=1):
+        """Return (allowed, remaining tokens, retry-after seconds)"""
+        capacity, per_minute = self.policies[policy]
+        try:
+            allowed, remaining, retry_after = self.backend.take(f"{policy}:{identity}", capacity,
+                                                                per_minute / 60.0, cost)
+        except Exception as e:
+            # Fail open: a broken limiter store must not take the API down
+            print(f"❌ Rate limiter backend error: {e}")
+            with self.lock:
+                self.backend_errors += 1
+            return True, None, 0.0
+
+        with self.lock:
+            if allowed:
+                self.allowed[policy] += 1
+            else:
+                self.throttled[policy] += 1
+                self.throttled_identities[(policy, identity)] += 1
+                if len(self.throttled_identities) > 2 * self.track_identities:
+                    self.throttled_identities = Counter(dict(self.throttled_identities.most_common(self.track_identities)))
+        return allowed, remaining, retry_after
+
+    def limit(self, policy):
+        return self.policies[policy][0]
+
+    def stats(self, top=10):
+        with self.lock:
+            return {
+                'backend': type(self.backend).__name__,
+                'policies': {name: {'burst': capacity, 'per_minute': per_minute}
+                             for name, (capacity, per_minute) in self.policies.items()},
+                'allowed': dict(self.allowed),
+                'throttled': dict(self.throttled),
+                'top_throttled': [{'policy': policy, 'identity': identity, 'count': count}
+                                  for (policy, identity), count in self.throttled_identities.most_common(top)],
+                'backend_errors': self.backend_errors,
+            }
@@ -0,0 +1,144 @@
+"""
+Recompute daily calorie / macro goals for every user_profiles row.
+
+Run this after the goal formula in nutrition_goals.py changes. Profiles are
+streamed from MySQL through an unbuffered (server-side) cursor in --chunk
+sized chunks. Each chunk's goals are recomputed with numpy, and only the
+rows whose goals changed are written back with a batched executemany.
+
+    python recompute_goals.py --dry-run                 # show what would change
+    python recompute_goals.py --dry-run --diff-out diff.csv
+    python recompute_goals.py --chunk 5000              # apply
+"""
+import argparse
+import csv
+import os
+import time
+
+import mysql.connector
+import numpy as np
+from dotenv import load_dotenv
+
+from nutrition_goals import GOAL_COLUMNS, calculate_goals
+
+load_dotenv()
+
+PROFILE_COLUMNS = ('id', 'user_id', 'age', 'height', 'weight', 'gender', 'activity_level', 'goal') + GOAL_COLUMNS
+
+def connect():
+    return mysql.connector.connect(
+        host=os.getenv('DB_HOST', 'localhost'),
+        user=os.getenv('DB_USER', 'root'),
+        password=os.getenv('DB_PASSWORD', 'root'),
+        database=os.getenv('DB_NAME', 'caloria_db'),
+    )
+
+def stream_profiles(conn, chunk_size):
+    """Yield lists of profile tuples without loading the table into memory"""
+    cursor = conn.cursor(buffered=False)
+    cursor.execute(f"SELECT {', '.join(PROFILE_COLUMNS)} FROM user_profiles ORDER BY id")
+    try:
+        while True:
+            rows = cursor.fetchmany(chunk_size)
+            if not rows:
+                break
+            yield rows
+    finally:
+        cursor.close()
+
+def recompute_chunk(rows):
+    """Return (ids, user_ids, old goals, new goals, changed mask, valid mask)"""
+    columns = list(zip(*rows))
+    data = dict(zip(PROFILE_COLUMNS, columns))
+
+    new = calculate_goals(data['age'], data['gender'], data['height'], data['weight'],
+                          data['activity_level'], data['goal'])
+    new_goals = np.column_stack([new[column] for column in GOAL_COLUMNS])
+    old_goals = np.column_stack([np.asarray(data[column], dtype=np.float64) for column in GOAL_COLUMNS])
+
+    valid = ~np.isnan(new_goals).any(axis=1)
+    changed = valid & (new_goals != old_goals).any(axis=1)
+    return np.asarray(data['id']), np.asarray(data['user_id']), old_goals, new_goals, changed, valid
+
+class DiffSummary:
+    def __init__(self, diff_out=None):
+        self.changed = 0
+        self.skipped = 0
+        self.abs_delta_sum = np.zeros(len(GOAL_COLUMNS))
+        self.abs_delta_max = np.zeros(len(GOAL_COLUMNS))
+        self.file = open(diff_out, 'w', newline='') if diff_out else None
+        if self.file:
+            self.csv = csv.writer(self.file)
+            self.csv.writerow(['id', 'user_id'] + [f"{c}_{side}" for c in GOAL_COLUMNS for side in ('old', 'new')])
+
+    def add(self, ids, user_ids, old, new, changed, valid):
+        self.skipped += int((~valid).sum())
+        self.changed += int(changed.sum())
+        delta = np.abs(np.nan_to_num(new[changed] - old[changed]))
+        if len(delta):
+            self.abs_delta_sum += delta.sum(axis=0)
+            self.abs_delta_max = np.maximum(self.abs_delta_max, delta.max(axis=0))
+        if self.file:
+            for i in np.flatnonzero(changed):
+                pairs = [value for j in range(len(GOAL_COLUMNS)) for value in (old[i, j], int(new[i, j]))]
+                self.csv.writerow([ids[i], user_ids[i]] + pairs)
+
+    def report(self):
+        print(f"   Changed: {self.changed}, skipped (incomplete profile): {self.skipped}")
+        for j, column in enumerate(GOAL_COLUMNS):
+            mean = self.abs_delta_sum[j] / self.changed if self.changed else 0
+            print(f"   {column:<20} mean |Δ| {mean:8.1f}   max |Δ| {self.abs_delta_max[j]:8.0f}")
+        if self.file:
+            self.file.close()
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--chunk', type=int, default=5000, help='rows per fetch / update batch')
+    parser.add_argument('--dry-run', action='store_true', help='report the diff without writing')
+    parser.add_argument('--diff-out', help='write changed rows (old and new goals) to this CSV')
+    args = parser.parse_args()
+
+    read_conn = connect()
+    write_conn = None if args.dry_run else connect()
+
+    count_cursor = read_conn.cursor()
+    count_cursor.execute("SELECT COUNT(*) FROM user_profiles")
+    total = count_cursor.fetchone()[0]
+    count_cursor.close()
+    print(f"🧮 Recomputing goals for {total} profiles{' (dry run)' if args.dry_run else ''}...")
+
+    summary = DiffSummary(args.diff_out)
+    processed = 0
+    started = time.time()
+    update_sql = f"""
+        UPDATE user_profiles SET {', '.join(f'{c} = %s' for c in GOAL_COLUMNS)}, updated_at = NOW()
+        WHERE id = %s
+    """
+
+    try:
+        for rows in stream_profiles(read_conn, args.chunk):
+            ids, user_ids, old, new, changed, valid = recompute_chunk(rows)
+            summary.add(ids, user_ids, old, new, changed, valid)
+
+            if write_conn is not None and changed.any():
+                params = [tuple(int(v) for v in new[i]) + (int(ids[i]),) for i in np.flatnonzero(changed)]
+                cursor = write_conn.cursor()
+                cursor.executemany(update_sql, params)
+                write_conn.commit()
+                cursor.close()
+
+            processed += len(rows)
+            elapsed = time.time() - started
+            rate = processed / elapsed if elapsed > 0 else 0
+            print(f"   {processed}/{total} ({processed / max(total, 1):.0%}), "
+                  f"{summary.changed} changed, {rate:.0f} rows/s", flush=True)
+    finally:
+        read_conn.close()
+        if write_conn is not None:
+            write_conn.close()
+
+    print(f"✅ {'Dry run complete' if args.dry_run else 'Goals updated'} in {time.time() - started:.1f}s")
+    summary.report()
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,203 @@
+import cProfile
+import io
+import json
+import os
+import pstats
+import shutil
+import sys
+import threading
+import time
+import uuid
+from collections import Counter
+from contextlib import contextmanager, nullcontext
+
+try:
+    from torch.profiler import profile as torch_profile, ProfilerActivity
+    TORCH_PROFILER_AVAILABLE = True
+except ImportError:
+    TORCH_PROFILER_AVAILABLE = False
+
+PROFILE_MODES = ('sample', 'cprofile')
+
+# Session active on the current request thread, if any
+_local = threading.local()
+
+class StackSampler:
+    """Samples one thread's Python stack every interval seconds"""
+
+    def __init__(self, thread_id, interval=0.002):
+        self.thread_id = thread_id
+        self.interval = interval
+        self.stacks = Counter()
+        self.samples = 0
+        self.stop_event = threading.Event()
+        self.thread = threading.Thread(target=self._run, name='request-profiler', daemon=True)
+
+    def start(self):
+        self.thread.start()
+
+    def stop(self):
+        self.stop_event.set()
+        self.thread.join()
+
+    def _run(self):
+        while not self.stop_event.wait(self.interval):
+            frame = sys._current_frames().get(self.thread_id)
+            if frame is None:
+                continue
+            names = []
+            leaf = True
+            while frame is not None:
+                code = frame.f_code
+                location = f"{os.path.basename(code.co_filename)}:{frame.f_lineno if leaf else code.co_firstlineno}"
+                names.append(f"{code.co_name} ({location})")
+                frame = frame.f_back
+                leaf = False
+            self.stacks[';'.join(reversed(names))] += 1
+            self.samples += 1
+
+    def collapsed(self):
+        """Brendan Gregg collapsed-stack format, input for flamegraph.pl / speedscope"""
+        return ''.join(f"{stack} {count}\n" for stack, count in self.stacks.most_common())
+
+class ProfileSession:
+    """Profiling state for one request"""
+
+    def __init__(self, name, mode='sample', interval=0.002, profile_model=False, requested=False):
+        self.started = time.time()
+        # UTC millisecond timestamp first so ids sort chronologically (no DST jumps)
+        self.id = f"{time.strftime('%Y%m%d-%H%M%S', time.gmtime(self.started))}{int(self.started * 1000) % 1000:03d}-{uuid.uuid4().hex[:8]}"
+        self.name = name
+        self.mode = mode
+        # True when an admin asked for this profile; sampled ones stay invisible to the client
+        self.requested = requested
+        self.stages = []
+        self.profile_model = profile_model
+        self.torch_trace = None
+        self.sampler = StackSampler(threading.get_ident(), interval) if mode == 'sample' else None
+        self.cprofile = cProfile.Profile() if mode == 'cprofile' else None
+
+    def start(self):
+        _local.session = self
+        if self.sampler:
+            self.sampler.start()
+        if self.cprofile:
+            self.cprofile.enable()
+        return self
+
+    def finish(self):
+        if self.cprofile:
+            self.cprofile.disable()
+        if self.sampler:
+            self.sampler.stop()
+        _local.session = None
+        self.duration = time.time() - self.started
+        return self
+
+    def pstats_text(self, limit=40):
+        out = io.StringIO()
+        pstats.Stats(self.cprofile, stream=out).sort_stats('cumulative').print_stats(limit)
+        return out.getvalue()
+
+def current_session():
+    return getattr(_local, 'session', None)
+
+@contextmanager
+def profile_stage(name):
+    """Record wall time of a pipeline stage on the active session (no-op otherwise)"""
+    session = current_session()
+    if session is None:
+        yield
+        return
+    started = time.perf_counter()
+    try:
+        yield
+    finally:
+        session.stages.append({'stage': name, 'ms': round((time.perf_counter() - started) * 1000, 3)})
+
+def model_profiling():
+    """torch.profiler around the model step when the active session asks for it"""
+    session = current_session()
+    if session is None or not session.profile_model or not TORCH_PROFILER_AVAILABLE:
+        return nullcontext()
+    return _torch_profile(session)
+
+@contextmanager
+def _torch_profile(session):
+    with torch_profile(activities=[ProfilerActivity.CPU], record_shapes=True) as prof:
+        yield
+    session.torch_trace = prof
+
+class ProfileStore:
+    """Keeps the most recent profiles as directories under a local path"""
+
+    def __init__(self, directory, keep=50):
+        self.directory = directory
+        self.keep = keep
+        self.lock = threading.Lock()
+        os.makedirs(directory, exist_ok=True)
+
+    def save(self, session, extra=None):
+        path = os.path.join(self.directory, session.id)
+        os.makedirs(path, exist_ok=True)
+        artifacts = []
+
+        if session.sampler:
+            with open(os.path.join(path, 'stacks.collapsed'), 'w') as f:
+                f.write(session.sampler.collapsed())
+            artifacts.append('stacks.collapsed')
+        if session.cprofile:
+            session.cprofile.dump_stats(os.path.join(path, 'profile.pstats'))
+            with open(os.path.join(path, 'profile.txt'), 'w') as f:
+                f.write(session.pstats_text())
+            artifacts += ['profile.pstats', 'profile.txt']
+        if session.torch_trace is not None:
+            session.torch_trace.export_chrome_trace(os.path.join(path, 'torch_trace.json'))
+            with open(os.path.join(path, 'torch_ops.txt'), 'w') as f:
+                f.write(session.torch_trace.key_averages().table(sort_by='self_cpu_time_total', row_limit=30))
+            artifacts += ['torch_trace.json', 'torch_ops.txt']
+
+        meta = {
+            'id': session.id,
+            'name': session.name,
+            'mode': session.mode,
+            'started_at': session.started,
+            'duration_ms': round(session.duration * 1000, 3),
+            'samples': session.sampler.samples if session.sampler else None,
+            'stages': session.stages,
+            'artifacts': artifacts,
+            **(extra or {}),
+        }
+        with open(os.path.join(path, 'meta.json'), 'w') as f:
+            json.dump(meta, f, indent=2)
+
+        self._prune()
+        return meta
+
+    def _prune(self):
+        with self.lock:
+            entries = sorted(os.listdir(self.directory))
+            for name in entries[:max(0, len(entries) - self.keep)]:
+                shutil.rmtree(os.path.join(self.directory, name), ignore_errors=True)
+
+    def list(self, limit=50):
+        profiles = []
+        for name in sorted(os.listdir(self.directory), reverse=True)[:limit]:
+            try:
+                with open(os.path.join(self.directory, name, 'meta.json')) as f:
+                    profiles.append(json.load(f))
+            except (OSError, ValueError):
+                continue
+        return profiles
+
+    def artifact_path(self, profile_id, artifact):
+        """Absolute path of a stored artifact, or None (guards against traversal)"""
+        if profile_id in ('.', '..') or artifact in ('.', '..'):
+            return None
+        if os.path.basename(profile_id) != profile_id or os.path.basename(artifact) != artifact:
+            return None
+        root = os.path.realpath(self.directory)
+        path = os.path.realpath(os.path.join(root, profile_id, artifact))
+        if os.path.dirname(os.path.dirname(path)) != root:
+            return None
+        return path if os.path.isfile(path) else None
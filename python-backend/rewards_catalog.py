@@ -0,0 +1,116 @@
+import hashlib
+import json
+import threading
+import time
+from datetime import datetime, timezone
+
+SUPPORTED_LANGUAGES = ('tr', 'en')
+REWARD_CATEGORIES = ['avatar', 'theme', 'badge', 'feature', 'discount']
+
+def parse_localized(value):
+    """Turn a JSON {'tr': ..., 'en': ...} column (or legacy plain text) into a dict"""
+    if isinstance(value, (bytes, bytearray)):
+        value = value.decode('utf-8')
+    if isinstance(value, str):
+        try:
+            parsed = json.loads(value)
+        except ValueError:
+            parsed = value
+    else:
+        parsed = value
+
+    if isinstance(parsed, dict):
+        return parsed
+    text = '' if parsed is None else str(parsed)
+    return {lang: text for lang in SUPPORTED_LANGUAGES}
+
+def localize(values, lang):
+    return values.get(lang) or values.get('tr') or next(iter(values.values()), '')
+
+class RewardsCatalog:
+    """
+    Precomputed /api/rewards/shop payloads, one per language plus 'all'.
+
+    The rewards table is read and its JSON name/description fields parsed
+    once; every payload is serialized up front together with its ETag.
+    After ttl seconds the next request checks CHECKSUM TABLE rewards and
+    rebuilds only if the table actually changed. Writers in this process can
+    call invalidate() to force a rebuild.
+    """
+
+    def __init__(self, get_connection, ttl=30):
+        self.get_connection = get_connection
+        self.ttl = ttl
+        self.lock = threading.Lock()
+        self.payloads = None
+        self.checksum = None
+        self.checked_at = 0
+        self.last_modified = None
+
+    def invalidate(self):
+        with self.lock:
+            self.checked_at = 0
+            self.checksum = None
+
+    def get(self, lang='all'):
+        """Return (body bytes, etag, last_modified) for lang ('tr', 'en' or 'all')"""
+        if self.payloads is None or time.time() - self.checked_at >= self.ttl:
+            self._refresh()
+        return self.payloads[lang]
+
+    def _refresh(self):
+        with self.lock:
+            # Another thread may have refreshed while we waited for the lock
+            if self.payloads is not None and time.time() - self.checked_at < self.ttl:
+                return
+
+            conn = self.get_connection()
+            try:
+                cursor = conn.cursor(dictionary=True)
+                cursor.execute("CHECKSUM TABLE rewards")
+                checksum = cursor.fetchone()['Checksum']
+                if self.payloads is None or checksum != self.checksum:
+                    cursor.execute("""
+                        SELECT id, name, description, category, icon, xp_cost
+                        FROM rewards
+                        WHERE is_active = TRUE
+                        ORDER BY category, xp_cost
+                    """)
+                    self.payloads = self._build(cursor.fetchall())
+                    self.checksum = checksum
+                    print(f"🎁 Rewards catalog rebuilt (checksum {checksum})")
+                cursor.close()
+            finally:
+                conn.close()
+            self.checked_at = time.time()
+
+    def _build(self, rows):
+        self.last_modified = datetime.now(timezone.utc).replace(microsecond=0)
+        rewards = []
+        for row in rows:
+            rewards.append({
+                **row,
+                'name': parse_localized(row['name']),
+                'description': parse_localized(row['description']),
+            })
+
+        payloads = {'all': self._serialize(rewards)}
+        for lang in SUPPORTED_LANGUAGES:
+            localized = [
+                {
+                    **reward,
+                    'name': localize(reward['name'], lang),
+                    'description': localize(reward['description'], lang),
+                }
+                for reward in rewards
+            ]
+            payloads[lang] = self._serialize(localized, lang)
+        return payloads
+
+    def _serialize(self, rewards, lang=None):
+        payload = {'rewards': rewards, 'categories': REWARD_CATEGORIES}
+        if lang:
+            payload['language'] = lang
+        body = json.dumps(payload, ensure_ascii=False, separators=(',', ':'), default=str).encode('utf-8')
+        etag = hashlib.sha1(body).hexdigest()
+        return body, etag, self.last_modified
@@ -0,0 +1,285 @@
+"""
+Offline bulk scoring of archived meal photos.
+
+Runs the same pipeline as /api/analyze-food (detect_image_content ->
+FoodRecognitionModel.predict_food -> get_nutrition_info) over a directory or
+a manifest file, without going through HTTP:
+
+    python score_images.py photos/ -o scores.jsonl
+    python score_images.py --manifest paths.txt -o scores.csv --processes 8 --batch-size 32
+
+Images are decoded and screened by OpenCV in a process pool, classified in
+batched forward passes, and rows are appended to the output as they finish.
+Re-running with the same output file resumes: paths already scored are
+skipped, and rows that ended in an error are dropped and retried.
+"""
+import argparse
+import csv
+import json
+import multiprocessing
+import os
+import random
+import sys
+import time
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor
+from latency_router import TIER_ANALYSIS_METHODS
+
+IMAGE_EXTENSIONS = {'.jpg', '.jpeg', '.png', '.webp', '.bmp', '.heic'}
+
+# Same thresholds as analyze_image in app.py
+MIN_AI_CONFIDENCE = 0.4
+# Decoded images are shrunk to this before being sent back to the main
+# process; the model only sees 224x224 anyway
+MODEL_INPUT_MAX_SIDE = 448
+
+OUTPUT_FIELDS = [
+    'path', 'is_food', 'category', 'name', 'food_label', 'calories', 'protein',
+    'carbs', 'fat', 'confidence', 'analysis_method', 'error',
+]
+
+def iter_directory(root):
+    """Yield image paths under root without listing everything up front"""
+    stack = [root]
+    while stack:
+        directory = stack.pop()
+        with os.scandir(directory) as entries:
+            for entry in sorted(entries, key=lambda e: e.name):
+                if entry.is_dir(follow_symlinks=False):
+                    stack.append(entry.path)
+                elif os.path.splitext(entry.name)[1].lower() in IMAGE_EXTENSIONS:
+                    yield entry.path
+
+def iter_manifest(manifest):
+    with open(manifest) as f:
+        for line in f:
+            path = line.strip()
+            if path and not path.startswith('#'):
+                yield path
+
+def count_inputs(args):
+    source = iter_manifest(args.manifest) if args.manifest else iter_directory(args.input)
+    return sum(1 for _ in source)
+
+def init_decode_worker():
+    # One process per core already; keep OpenCV single-threaded inside each
+    import cv2
+    cv2.setNumThreads(1)
+
+def decode_and_screen(path):
+    """Pool worker: decode, run the OpenCV non-food screen, shrink for the model"""
+    import numpy as np
+    from image_analysis import detect_image_content, load_rgb_image
+    try:
+        with open(path, 'rb') as f:
+            image = load_rgb_image(f.read())
+        classification = detect_image_content(np.array(image))
+        model_input = None
+        if classification['is_food']:
+            image.thumbnail((MODEL_INPUT_MAX_SIDE, MODEL_INPUT_MAX_SIDE))
+            model_input = np.array(image)
+        return path, classification, model_input, None
+    except Exception as e:
+        return path, None, None, str(e)
+
+def build_row(path, classification, prediction, food_model, error=None):
+    """Mirror the analyze_image decisions as a flat output row"""
+    row = dict.fromkeys(OUTPUT_FIELDS)
+    row['path'] = path
+    if error is not None:
+        row['error'] = error
+        return row
+
+    if not classification['is_food']:
+        row.update(is_food=False, category=classification['category'], name=classification['category'].title(),
+                   calories=0, protein=0, carbs=0, fat=0, confidence=classification['confidence'],
+                   analysis_method='OpenCV Computer Vision')
+        return row
+
+    tier = prediction.get('tier', 'ai')
+    row['food_label'] = prediction['food_name']
+    row['analysis_method'] = TIER_ANALYSIS_METHODS[tier]
+    if not prediction['is_food'] or prediction['confidence'] < MIN_AI_CONFIDENCE:
+        name = 'Analiz Edilemedi' if tier == 'simple_fallback' else 'Bilinmeyen Nesne'
+        row.update(is_food=False, category='unknown', name=name,
+                   calories=0, protein=0, carbs=0, fat=0, confidence=prediction['confidence'])
+        return row
+
+    nutrition = food_model.get_nutrition_info(prediction['food_name'], prediction['confidence'])
+    row.update(is_food=True, category='food', name=nutrition['name'], calories=nutrition['calories'],
+               protein=nutrition['protein'], carbs=nutrition['carbs'], fat=nutrition['fat'],
+               confidence=nutrition['confidence'])
+    return row
+
+class OutputWriter:
+    """Append-only JSONL/CSV writer that doubles as the resume checkpoint"""
+
+    def __init__(self, path, fmt):
+        self.path = path
+        self.fmt = fmt
+        self.done = set()
+        if os.path.exists(path):
+            self._truncate_partial_line()
+            self.done = self._drop_errors()
+        new_file = not os.path.exists(path) or os.path.getsize(path) == 0
+        self.file = open(path, 'a', newline='', encoding='utf-8')
+        if fmt == 'csv':
+            self.csv = csv.DictWriter(self.file, fieldnames=OUTPUT_FIELDS)
+            if new_file:
+                self.csv.writeheader()
+
+    def _truncate_partial_line(self):
+        # An interrupted run can leave half a row at the end of the file
+        with open(self.path, 'rb+') as f:
+            data = f.read()
+            if data and not data.endswith(b'\n'):
+                f.truncate(data.rfind(b'\n') + 1)
+
+    def _read_rows(self):
+        with open(self.path, newline='', encoding='utf-8') as f:
+            if self.fmt == 'csv':
+                return list(csv.DictReader(f))
+            return [json.loads(line) for line in f if line.strip()]
+
+    def _drop_errors(self):
+        """Paths scored without error; errored rows are removed so they get retried"""
+        rows = self._read_rows()
+        kept = [row for row in rows if not row.get('error')]
+        if len(kept) < len(rows):
+            print(f"🔁 Retrying {len(rows) - len(kept)} images that failed last time")
+            tmp_path = self.path + '.tmp'
+            with open(tmp_path, 'w', newline='', encoding='utf-8') as f:
+                if self.fmt == 'csv':
+                    out = csv.DictWriter(f, fieldnames=OUTPUT_FIELDS)
+                    out.writeheader()
+                    out.writerows(kept)
+                else:
+                    f.writelines(json.dumps(row, ensure_ascii=False) + '\n' for row in kept)
+                f.flush()
+                os.fsync(f.fileno())
+            os.replace(tmp_path, self.path)
+        return {row['path'] for row in kept}
+
+    def write(self, rows):
+        for row in rows:
+            if self.fmt == 'csv':
+                self.csv.writerow(row)
+            else:
+                self.file.write(json.dumps(row, ensure_ascii=False) + '\n')
+        self.file.flush()
+        os.fsync(self.file.fileno())
+
+    def close(self):
+        self.file.close()
+
+class Progress:
+    def __init__(self, total, already_done, interval):
+        self.total = total
+        self.already_done = already_done
+        self.interval = interval
+        self.processed = 0
+        self.started = time.time()
+        self.last_report = 0
+
+    def update(self, n, force=False):
+        self.processed += n
+        now = time.time()
+        if not force and now - self.last_report < self.interval:
+            return
+        self.last_report = now
+        elapsed = now - self.started
+        rate = self.processed / elapsed if elapsed > 0 else 0
+        line = f"📊 {self.processed} scored ({rate:.1f} img/s)"
+        if self.total is not None:
+            remaining = max(0, self.total - self.already_done - self.processed)
+            eta = remaining / rate if rate > 0 else float('inf')
+            line += f", {self.already_done + self.processed}/{self.total} total, ETA {format_eta(eta)}"
+        print(line, flush=True)
+
+def format_eta(seconds):
+    if seconds == float('inf'):
+        return '?'
+    minutes, seconds = divmod(int(seconds), 60)
+    hours, minutes = divmod(minutes, 60)
+    return f"{hours}h{minutes:02d}m{seconds:02d}s" if hours else f"{minutes}m{seconds:02d}s"
+
+def bounded_map(executor, fn, items, window):
+    """Ordered executor.map that keeps at most window tasks in flight"""
+    pending = deque()
+    for item in items:
+        pending.append(executor.submit(fn, item))
+        if len(pending) >= window:
+            yield pending.popleft().result()
+    while pending:
+        yield pending.popleft().result()
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('input', nargs='?', help='directory of images (scanned recursively)')
+    parser.add_argument('--manifest', help='text file with one image path per line')
+    parser.add_argument('-o', '--output', required=True, help='output .jsonl or .csv')
+    parser.add_argument('--format', choices=['jsonl', 'csv'], help='defaults to the output extension')
+    parser.add_argument('--processes', type=int, default=os.cpu_count() or 1)
+    parser.add_argument('--batch-size', type=int, default=16)
+    parser.add_argument('--seed', type=int, default=0, help='seed for the nutrition variance')
+    parser.add_argument('--no-count', action='store_true', help='skip the initial count (no ETA)')
+    parser.add_argument('--report-every', type=float, default=10.0, help='seconds between progress lines')
+    args = parser.parse_args()
+
+    if bool(args.input) == bool(args.manifest):
+        parser.error('give either an input directory or --manifest')
+    fmt = args.format or ('csv' if args.output.lower().endswith('.csv') else 'jsonl')
+
+    writer = OutputWriter(args.output, fmt)
+    if writer.done:
+        print(f"♻️ Resuming: {len(writer.done)} images already scored")
+    total = None if args.no_count else count_inputs(args)
+    source = iter_manifest(args.manifest) if args.manifest else iter_directory(args.input)
+    todo = (path for path in source if path not in writer.done)
+
+    # Workers come from a forkserver started now, before torch is imported,
+    # so a worker spawned later never inherits the model or torch's threads
+    methods = multiprocessing.get_all_start_methods()
+    context = multiprocessing.get_context('forkserver' if 'forkserver' in methods else 'spawn')
+    executor = ProcessPoolExecutor(max_workers=args.processes, mp_context=context,
+                                   initializer=init_decode_worker)
+    list(executor.map(int, range(args.processes)))
+
+    import numpy as np
+    from food_model import get_food_model
+    random.seed(args.seed)
+    np.random.seed(args.seed)
+    food_model = get_food_model()
+
+    progress = Progress(total, len(writer.done), args.report_every)
+    batch = []
+
+    def flush(batch):
+        food_items = [item for item in batch if item[2] is not None]
+        predictions = food_model.predict_food_batch([item[2] for item in food_items])
+        by_path = {item[0]: prediction for item, prediction in zip(food_items, predictions)}
+        rows = [build_row(path, classification, by_path.get(path), food_model, error)
+                for path, classification, _, error in batch]
+        writer.write(rows)
+        progress.update(len(rows))
+
+    try:
+        for result in bounded_map(executor, decode_and_screen, todo, window=args.processes * 4):
+            batch.append(result)
+            if len(batch) >= args.batch_size:
+                flush(batch)
+                batch = []
+        if batch:
+            flush(batch)
+    except KeyboardInterrupt:
+        print("\n⏸️ Interrupted; re-run the same command to resume")
+        sys.exit(130)
+    finally:
+        executor.shutdown(cancel_futures=True)
+        writer.close()
+
+    progress.update(0, force=True)
+    print(f"✅ Done: {args.output}")
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,110 @@
+import math
+import os
+
+# Native thread pools that read their size from the environment at import
+BLAS_ENV_VARS = (
+    'OMP_NUM_THREADS',
+    'MKL_NUM_THREADS',
+    'OPENBLAS_NUM_THREADS',
+    'NUMEXPR_NUM_THREADS',
+    'VECLIB_MAXIMUM_THREADS',
+)
+
+# Plan applied in this process, reported on /model-info
+current_plan = None
+
+def affinity_cpus():
+    """CPUs this process may run on (respects taskset / cpusets)"""
+    try:
+        return len(os.sched_getaffinity(0))
+    except AttributeError:
+        return os.cpu_count() or 1
+
+def cgroup_cpu_quota():
+    """CPU limit from the cgroup (v2 cpu.max or v1 CFS quota), or None"""
+    try:
+        with open('/sys/fs/cgroup/cpu.max') as f:
+            quota, period = f.read().split()
+        if quota != 'max':
+            return int(quota) / int(period)
+        return None
+    except (OSError, ValueError):
+        pass
+
+    try:
+        with open('/sys/fs/cgroup/cpu/cpu.cfs_quota_us') as f:
+            quota = int(f.read())
+        with open('/sys/fs/cgroup/cpu/cpu.cfs_period_us') as f:
+            period = int(f.read())
+        if quota > 0 and period > 0:
+            return quota / period
+    except (OSError, ValueError):
+        pass
+    return None
+
+def plan_threads(workers=1, worker_threads=1, job_threads=0, torch_threads=None):
+    """
+    Split the usable cores between every thread that can run the model.
+
+    Each gunicorn worker runs worker_threads request threads plus
+    job_threads async analysis threads (ANALYZE_WORKERS), and any of them
+    may be inside torch, OpenCV or BLAS at once. Each gets an equal share
+    of the cores so workers x (worker_threads + job_threads) x share does
+    not exceed the cores the container is allowed to use. torch_threads
+    overrides the computed share.
+    """
+    affinity = affinity_cpus()
+    quota = cgroup_cpu_quota()
+    effective = affinity if quota is None else max(1, min(affinity, math.ceil(quota)))
+
+    concurrent = max(1, workers) * max(1, worker_threads + job_threads)
+    share = torch_threads or max(1, effective // concurrent)
+    return {
+        'affinity_cpus': affinity,
+        'cgroup_quota_cpus': quota,
+        'effective_cpus': effective,
+        'workers': workers,
+        'worker_threads': worker_threads,
+        'job_threads': job_threads,
+        'torch_intraop_threads': share,
+        'torch_interop_threads': 1,
+        'opencv_threads': share,
+        'blas_threads': share,
+        'oversubscription': round(concurrent * share / effective, 2),
+    }
+
+def apply_env(plan):
+    """Export BLAS/OMP thread counts; call before numpy/torch/cv2 are imported"""
+    for name in BLAS_ENV_VARS:
+        os.environ[name] = str(plan['blas_threads'])
+
+def apply_runtime(plan):
+    """Size torch and OpenCV thread pools in the current process"""
+    global current_plan
+    try:
+        import torch
+        torch.set_num_threads(plan['torch_intraop_threads'])
+        try:
+            torch.set_num_interop_threads(plan['torch_interop_threads'])
+        except RuntimeError:
+            # Inter-op pool already started in this process
+            pass
+    except ImportError:
+        pass
+
+    try:
+        import cv2
+        cv2.setNumThreads(plan['opencv_threads'])
+    except ImportError:
+        pass
+
+    current_plan = plan
+    return plan
+
+def get_current_plan():
+    """Plan applied in this process, or the single-process default"""
+    global current_plan
+    if current_plan is None:
+        current_plan = plan_threads(job_threads=int(os.getenv('ANALYZE_WORKERS', 2)),
+                                    torch_threads=int(os.getenv('TORCH_NUM_THREADS', 0)) or None)
+    return current_plan
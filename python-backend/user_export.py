@@ -0,0 +1,105 @@
+import base64
+import json
+from datetime import datetime
+
+# Exported in this order; rows inside a section are walked by primary key so
+# an interrupted download can resume right after the last record it received
+MYSQL_SECTIONS = [
+    ('user', "SELECT * FROM users WHERE id = %s AND id > %s ORDER BY id"),
+    ('user_profile', "SELECT * FROM user_profiles WHERE user_id = %s AND id > %s ORDER BY id"),
+    ('user_reward', "SELECT * FROM user_rewards WHERE user_id = %s AND id > %s ORDER BY id"),
+    ('meal', "SELECT * FROM meals WHERE user_id = %s AND id > %s ORDER BY id"),
+]
+SECTIONS = [name for name, _ in MYSQL_SECTIONS] + ['analysis_job', 'meal_embedding']
+
+# Never leave the server, even in the owner's own export
+EXCLUDED_FIELDS = {'password'}
+
+FETCH_SIZE = 500
+
+def encode_cursor(section, last_id):
+    raw = json.dumps({'s': section, 'id': last_id}, separators=(',', ':')).encode()
+    return base64.urlsafe_b64encode(raw).decode().rstrip('=')
+
+def decode_cursor(token):
+    """Return (section index, last id) for a resume token; raises ValueError"""
+    if not token:
+        return 0, 0
+    padded = token + '=' * (-len(token) % 4)
+    try:
+        data = json.loads(base64.urlsafe_b64decode(padded))
+        section = SECTIONS.index(data['s'])
+        return section, int(data['id'])
+    except Exception:
+        raise ValueError('Geçersiz cursor')
+
+def _line(record):
+    return json.dumps(record, ensure_ascii=False, default=str, separators=(',', ':')) + '\n'
+
+def _mysql_rows(get_connection, query, user_id, after_id):
+    """Stream rows from an unbuffered (server-side) cursor"""
+    conn = get_connection()
+    cursor = conn.cursor(dictionary=True, buffered=False)
+    try:
+        cursor.execute(query, (user_id, after_id))
+        while True:
+            rows = cursor.fetchmany(FETCH_SIZE)
+            if not rows:
+                break
+            for row in rows:
+                yield row
+    finally:
+        # Abandoned mid-stream (client went away): drop the unread result
+        try:
+            cursor.close()
+        except Exception:
+            pass
+        try:
+            conn.close()
+        except Exception:
+            pass
+
+def _embedding_rows(embedding_store, user_id, after_id):
+    """Stored meal embeddings, numbered oldest first (new rows only append)"""
+    for number, row in enumerate(embedding_store.user_rows(user_id), start=1):
+        if number <= after_id:
+            continue
+        row['embedding'] = [round(float(value), 6) for value in row['embedding']]
+        row['_cursor_id'] = number
+        yield row
+
+def export_user_data(user_id, get_connection, job_queue=None, cursor_token=None, embedding_store=None):
+    """
+    Generate a user's data as NDJSON lines.
+
+    Every record line carries a `cursor`; passing it back as cursor_token
+    resumes the export right after that record.
+    """
+    start_section, start_id = decode_cursor(cursor_token)
+    yield _line({
+        'type': 'export',
+        'user_id': user_id,
+        'generated_at': datetime.utcnow().isoformat() + 'Z',
+        'resumed_from': cursor_token,
+    })
+
+    records = 0
+    for index, section in enumerate(SECTIONS):
+        if index < start_section:
+            continue
+        after_id = start_id if index == start_section else 0
+
+        if section == 'analysis_job':
+            rows = job_queue.iter_user_jobs(user_id, after_id) if job_queue is not None else ()
+        elif section == 'meal_embedding':
+            rows = _embedding_rows(embedding_store, user_id, after_id) if embedding_store is not None else ()
+        else:
+            rows = _mysql_rows(get_connection, MYSQL_SECTIONS[index][1], user_id, after_id)
+
+        for row in rows:
+            row_id = row.pop('_cursor_id', None) or row['id']
+            data = {key: value for key, value in row.items() if key not in EXCLUDED_FIELDS}
+            records += 1
+            yield _line({'type': section, 'cursor': encode_cursor(section, row_id), 'data': data})
+
+    yield _line({'type': 'end', 'records': records})